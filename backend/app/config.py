@@ -40,6 +40,22 @@ class Settings(BaseModel):
     # ChromaDB Configuration
     chroma_persist_dir: str = "./chroma_data"
     
+    # History storage: "log" (in memory, replayed at startup) or "sqlite" (indexed, on disk)
+    storage_backend: str = "log"
+    storage_db_path: str = ""  # empty: vector_store.db in chroma_persist_dir
+    
+    # Approximate (IVF) vector search for collections of at least ann_min_records (0: off)
+    ann_min_records: int = 20000
+    ann_nlist: int = 0
+    ann_nprobe: int = 0  # 0: tuned per index to reach ann_target_recall
+    ann_rebuild_fraction: float = 0.2
+    ann_target_recall: float = 0.9
+    
+    # Embedding Configuration (hashing or ollama)
+    embedding_provider: str = "hashing"
+    embedding_dim: int = 512
+    ollama_embedding_model: str = "nomic-embed-text"
+    
     # Application Configuration
     app_name: str = "Automotive Image Generator"
     debug: bool = True
@@ -55,6 +71,75 @@ class Settings(BaseModel):
     image_num_inference_steps: int = 30
     image_guidance_scale: float = 7.5
     
+    # Generated image storage (content-addressed, served as static files)
+    image_dir: str = "./generated_images"
+    image_url_prefix: str = "/api/images"
+    
+    # Image result cache (generation parameters + explicit seed -> stored image)
+    image_cache_enabled: bool = True
+    image_cache_db_path: str = "./image_cache.db"
+    image_cache_max_entries: int = 10000
+    
+    # Prompt enhancement cache (in-process LRU + on-disk store)
+    prompt_cache_enabled: bool = True
+    prompt_cache_path: str = "./prompt_cache.db"
+    prompt_cache_ttl_seconds: int = 86400
+    prompt_cache_max_entries: int = 1024
+    
+    # UnifiedClient methods whose identical concurrent calls share one upstream request
+    singleflight_methods: str = "generate_narrative,generate_image,enhance_prompt,chat"
+    
+    # Provider retries: jittered exponential backoff under a per-request time budget
+    retry_max_attempts: int = 3
+    retry_base_delay: float = 0.5
+    retry_max_delay: float = 20.0
+    retry_budget_seconds: float = 30.0
+    
+    # Client-side rate limits per provider (0 disables a bucket)
+    groq_requests_per_minute: int = 30
+    groq_tokens_per_minute: int = 6000
+    ollama_requests_per_minute: int = 0
+    stability_requests_per_minute: int = 150
+    
+    # Concurrency caps: "name=concurrent:queue" per provider or provider.method
+    bulkhead_limits: str = "ollama=2:8,groq=16:32,openai=16:32,stability=4:16"
+    bulkhead_queue_timeout: float = 30.0
+    
+    # Request deadlines in seconds (clients may ask for less or more via X-Request-Timeout)
+    request_timeout_default: float = 120.0
+    request_timeout_max: float = 600.0
+    
+    # Admission control: "class=max_in_flight:max_wait_seconds" per endpoint class
+    admission_enabled: bool = True
+    admission_limits: str = "chat=16:10,narrative=8:15,image=4:30,storage=32:2"
+    
+    # Circuit breakers for text providers
+    breaker_failure_threshold: int = 3
+    breaker_reset_timeout: float = 30.0
+    breaker_probe_interval: float = 10.0
+    
+    # Adaptive text provider routing
+    router_enabled: bool = True
+    router_ewma_alpha: float = 0.2
+    router_explore_fraction: float = 0.05
+    router_preferred_bias: float = 0.8
+    
+    # Hedged requests: text methods that race a second provider when the first is slow
+    hedge_methods: str = ""
+    hedge_percentile: float = 0.95
+    hedge_min_delay: float = 0.25
+    hedge_default_delay: float = 2.0
+    
+    # Background generation jobs
+    job_db_path: str = "./jobs.db"
+    job_workers: int = 2
+    job_max_pending: int = 100
+    job_timeout: float = 600.0
+    job_retention: float = 604800.0  # seconds a finished job is kept (0: forever)
+    
+    # Negotiate HTTP/2 with Stability AI (requires the optional h2 package)
+    stability_http2: bool = False
+    
     @classmethod
     def from_env(cls):
         """Create settings from .env file only."""
@@ -68,6 +153,59 @@ class Settings(BaseModel):
             host=os.getenv("HOST", "0.0.0.0"),
             port=int(os.getenv("PORT", "8000")),
             chroma_persist_dir=os.getenv("CHROMA_PERSIST_DIR", "./chroma_data"),
+            storage_backend=os.getenv("STORAGE_BACKEND", "log"),
+            storage_db_path=os.getenv("STORAGE_DB_PATH", ""),
+            ann_min_records=int(os.getenv("ANN_MIN_RECORDS", "20000")),
+            ann_nlist=int(os.getenv("ANN_NLIST", "0")),
+            ann_nprobe=int(os.getenv("ANN_NPROBE", "0")),
+            ann_rebuild_fraction=float(os.getenv("ANN_REBUILD_FRACTION", "0.2")),
+            ann_target_recall=float(os.getenv("ANN_TARGET_RECALL", "0.9")),
+            embedding_provider=os.getenv("EMBEDDING_PROVIDER", "hashing"),
+            embedding_dim=int(os.getenv("EMBEDDING_DIM", "512")),
+            ollama_embedding_model=os.getenv("OLLAMA_EMBEDDING_MODEL", "nomic-embed-text"),
+            image_dir=os.getenv("IMAGE_DIR", "./generated_images"),
+            image_url_prefix=os.getenv("IMAGE_URL_PREFIX", "/api/images"),
+            image_cache_enabled=os.getenv("IMAGE_CACHE_ENABLED", "true").lower() == "true",
+            image_cache_db_path=os.getenv("IMAGE_CACHE_DB_PATH", "./image_cache.db"),
+            image_cache_max_entries=int(os.getenv("IMAGE_CACHE_MAX_ENTRIES", "10000")),
+            prompt_cache_enabled=os.getenv("PROMPT_CACHE_ENABLED", "true").lower() == "true",
+            prompt_cache_path=os.getenv("PROMPT_CACHE_PATH", "./prompt_cache.db"),
+            prompt_cache_ttl_seconds=int(os.getenv("PROMPT_CACHE_TTL_SECONDS", "86400")),
+            prompt_cache_max_entries=int(os.getenv("PROMPT_CACHE_MAX_ENTRIES", "1024")),
+            singleflight_methods=os.getenv(
+                "SINGLEFLIGHT_METHODS", "generate_narrative,generate_image,enhance_prompt,chat"
+            ),
+            retry_max_attempts=int(os.getenv("RETRY_MAX_ATTEMPTS", "3")),
+            retry_base_delay=float(os.getenv("RETRY_BASE_DELAY", "0.5")),
+            retry_max_delay=float(os.getenv("RETRY_MAX_DELAY", "20")),
+            retry_budget_seconds=float(os.getenv("RETRY_BUDGET_SECONDS", "30")),
+            groq_requests_per_minute=int(os.getenv("GROQ_REQUESTS_PER_MINUTE", "30")),
+            groq_tokens_per_minute=int(os.getenv("GROQ_TOKENS_PER_MINUTE", "6000")),
+            ollama_requests_per_minute=int(os.getenv("OLLAMA_REQUESTS_PER_MINUTE", "0")),
+            stability_requests_per_minute=int(os.getenv("STABILITY_REQUESTS_PER_MINUTE", "150")),
+            bulkhead_limits=os.getenv("BULKHEAD_LIMITS", "ollama=2:8,groq=16:32,openai=16:32,stability=4:16"),
+            bulkhead_queue_timeout=float(os.getenv("BULKHEAD_QUEUE_TIMEOUT", "30")),
+            request_timeout_default=float(os.getenv("REQUEST_TIMEOUT_DEFAULT", "120")),
+            request_timeout_max=float(os.getenv("REQUEST_TIMEOUT_MAX", "600")),
+            admission_enabled=os.getenv("ADMISSION_ENABLED", "true").lower() == "true",
+            admission_limits=os.getenv("ADMISSION_LIMITS", "chat=16:10,narrative=8:15,image=4:30,storage=32:2"),
+            breaker_failure_threshold=int(os.getenv("BREAKER_FAILURE_THRESHOLD", "3")),
+            breaker_reset_timeout=float(os.getenv("BREAKER_RESET_TIMEOUT", "30")),
+            breaker_probe_interval=float(os.getenv("BREAKER_PROBE_INTERVAL", "10")),
+            router_enabled=os.getenv("ROUTER_ENABLED", "true").lower() == "true",
+            router_ewma_alpha=float(os.getenv("ROUTER_EWMA_ALPHA", "0.2")),
+            router_explore_fraction=float(os.getenv("ROUTER_EXPLORE_FRACTION", "0.05")),
+            router_preferred_bias=float(os.getenv("ROUTER_PREFERRED_BIAS", "0.8")),
+            hedge_methods=os.getenv("HEDGE_METHODS", ""),
+            hedge_percentile=float(os.getenv("HEDGE_PERCENTILE", "0.95")),
+            hedge_min_delay=float(os.getenv("HEDGE_MIN_DELAY", "0.25")),
+            hedge_default_delay=float(os.getenv("HEDGE_DEFAULT_DELAY", "2.0")),
+            job_db_path=os.getenv("JOB_DB_PATH", "./jobs.db"),
+            job_workers=int(os.getenv("JOB_WORKERS", "2")),
+            job_max_pending=int(os.getenv("JOB_MAX_PENDING", "100")),
+            job_timeout=float(os.getenv("JOB_TIMEOUT", "600")),
+            job_retention=float(os.getenv("JOB_RETENTION", "604800")),
+            stability_http2=os.getenv("STABILITY_HTTP2", "false").lower() == "true",
             debug=True
         )
 
@@ -1,9 +1,12 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Callable, AsyncIterator, Awaitable, Optional, TypeVar
+import asyncio
+import json
 import logging
 import os
 from pathlib import Path
@@ -13,9 +16,16 @@ from app.models import (
     GenerateNarrativeRequest, GenerateImageRequest, GenerateBothRequest,
     ChatRequest, SearchRequest, EnhancePromptRequest,
     NarrativeResponse, ImageResponse, GenerationResponse, ChatResponse,
-    HistoryResponse, SearchResponse, EnhancePromptResponse, HealthResponse
+    HistoryResponse, SearchResponse, EnhancePromptResponse, HealthResponse,
+    HistoryItem, SearchResult, JobResponse
 )
-from app.services import UnifiedClient, VectorStore
+from app.services import UnifiedClient, VectorStore, ImageStore
+from app.services.embeddings import create_embedder
+from app.services.storage_backend import SQLiteBackend
+from app.services.pipeline import Stage, run_pipeline
+from app.services.admission import AdmissionController, AdmissionMiddleware, parse_admission_limits
+from app.services.deadline import DeadlineExceeded, DeadlineMiddleware
+from app.services.job_queue import JobQueue, QueueFull, FAILED, QUEUED
 
 # Configure logging
 logging.basicConfig(
@@ -33,6 +43,18 @@ app = FastAPI(
     redoc_url="/api/redoc"
 )
 
+# Shed excess load per endpoint class; added before CORS so 503s still carry CORS headers
+admission = AdmissionController(parse_admission_limits(settings.admission_limits))
+if settings.admission_enabled:
+    app.add_middleware(AdmissionMiddleware, controller=admission)
+
+# Per-request deadline from X-Request-Timeout, or the server default
+app.add_middleware(
+    DeadlineMiddleware,
+    default_timeout=settings.request_timeout_default,
+    max_timeout=settings.request_timeout_max
+)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -42,9 +64,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Serve content-addressed generated images
+Path(settings.image_dir).mkdir(parents=True, exist_ok=True)
+app.mount(settings.image_url_prefix, StaticFiles(directory=settings.image_dir), name="images")
+
 # Initialize services
 unified_client: UnifiedClient = None
 vector_store: VectorStore = None
+job_queue: JobQueue = None
 
 # Collection name for history
 HISTORY_COLLECTION = "automotive_generations"
@@ -58,14 +85,92 @@ def get_unified_client() -> UnifiedClient:
     return unified_client
 
 
+def create_vector_store() -> VectorStore:
+    """Create the vector store with the configured embedder."""
+    embedder = create_embedder(
+        provider=settings.embedding_provider,
+        dim=settings.embedding_dim,
+        ollama_base_url=settings.ollama_base_url,
+        ollama_model=settings.ollama_embedding_model
+    )
+    image_store = ImageStore(settings.image_dir, url_prefix=settings.image_url_prefix)
+    backend = None
+    if settings.storage_backend == "sqlite":
+        backend = SQLiteBackend(settings.storage_db_path
+                                or os.path.join(settings.chroma_persist_dir, "vector_store.db"))
+    return VectorStore(
+        settings.chroma_persist_dir, embedder=embedder, image_store=image_store, backend=backend,
+        ann_min_records=settings.ann_min_records,
+        ann_nlist=settings.ann_nlist,
+        ann_nprobe=settings.ann_nprobe,
+        ann_rebuild_fraction=settings.ann_rebuild_fraction,
+        ann_target_recall=settings.ann_target_recall
+    )
+
+
 def get_vector_store() -> VectorStore:
     """Dependency to get vector store."""
     global vector_store
     if not vector_store:
-        vector_store = VectorStore(settings.chroma_persist_dir)
+        vector_store = create_vector_store()
     return vector_store
 
 
+T = TypeVar("T")
+
+# Status logged for requests abandoned by the client (nginx convention); nobody reads the body
+CLIENT_CLOSED_REQUEST = 499
+
+
+class ClientDisconnected(Exception):
+    """The HTTP client went away before the response was ready."""
+
+
+async def until_disconnect(http_request: Request, awaitable: Awaitable[T]) -> T:
+    """
+    Await work, cancelling it if the HTTP client disconnects first.
+    Cancellation reaches the upstream provider calls, closing their connections
+    (which also stops Ollama generating).
+    
+    Raises:
+        ClientDisconnected: If the client went away first
+    """
+    async def wait_for_disconnect():
+        while True:
+            message = await http_request.receive()
+            if message["type"] == "http.disconnect":
+                return
+    
+    work = asyncio.ensure_future(awaitable)
+    watcher = asyncio.ensure_future(wait_for_disconnect())
+    try:
+        await asyncio.wait({work, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watcher.cancel()
+        if not work.done():
+            work.cancel()
+    
+    if not work.done() or work.cancelled():
+        # Let the cancellation unwind upstream calls before the slot is released
+        await asyncio.wait({work})
+        raise ClientDisconnected()
+    return work.result()
+
+
+@app.exception_handler(ClientDisconnected)
+async def client_disconnected_handler(request, exc):
+    """Log and drop requests whose client has gone away."""
+    logger.info(f"Client disconnected, cancelled {request.method} {request.url.path}")
+    return Response(status_code=CLIENT_CLOSED_REQUEST)
+
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request, exc):
+    """Answer requests that ran out of their time budget with 504."""
+    logger.warning(f"Deadline exceeded for {request.method} {request.url.path}: {exc}")
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
+
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize services on startup."""
@@ -74,12 +179,26 @@ async def startup_event():
     logger.info("Starting Automotive Image Generator...")
     
     # Initialize vector store
-    vector_store = VectorStore(settings.chroma_persist_dir)
+    vector_store = create_vector_store()
     logger.info("Vector store initialized")
     
     # Initialize unified client
     unified_client = UnifiedClient()
     logger.info("Unified client initialized")
+    
+    # Start background jobs (resumes any left queued by the last run)
+    await start_job_queue()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop job workers and release upstream connections and storage on shutdown."""
+    if job_queue:
+        await job_queue.stop()
+    if unified_client:
+        await unified_client.aclose()
+    if vector_store:
+        vector_store.close()
 
 
 @app.get("/", tags=["Root"])
@@ -101,72 +220,212 @@ async def health_check():
     )
 
 
+@app.get("/api/metrics", tags=["Health"])
+async def get_metrics(client: UnifiedClient = Depends(get_unified_client)):
+    """Cache, upstream call and admission control metrics."""
+    metrics = client.metrics()
+    metrics["admission"] = admission.stats() if settings.admission_enabled else None
+    metrics["jobs"] = job_queue.stats() if job_queue else None
+    metrics["ann_indexes"] = vector_store.ann_stats() if vector_store else None
+    return metrics
+
+
 @app.post("/api/narrative", tags=["Narrative"], response_model=NarrativeResponse)
 async def generate_narrative(
     request: GenerateNarrativeRequest,
+    http_request: Request,
     client: UnifiedClient = Depends(get_unified_client)
 ):
     """
     Generate an automotive narrative/description.
     """
     try:
-        result = client.generate_narrative(
+        result = await until_disconnect(http_request, client.generate_narrative(
             prompt=request.prompt,
             context=request.context
-        )
+        ))
         
         return NarrativeResponse(
             success=True,
             narrative=result
         )
             
+    except (ClientDisconnected, DeadlineExceeded):
+        raise
     except Exception as e:
         logger.error(f"Error generating narrative: {str(e)}")
         return NarrativeResponse(success=False, error=str(e))
 
 
+def sse_event(data: Dict[str, Any], event: str = None) -> str:
+    """Format one Server-Sent Event."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def sse_stream(open_stream: Callable[[], AsyncIterator[str]]) -> StreamingResponse:
+    """
+    Relay a token iterator as SSE: one 'data' event per token, then 'done',
+    or an 'error' event if generation fails.
+    """
+    async def events():
+        try:
+            async for token in open_stream():
+                yield sse_event({"token": token})
+            yield sse_event({}, event="done")
+        except asyncio.CancelledError:
+            # Client disconnected: closing the token iterator closes the upstream stream
+            logger.info("Client disconnected, stream cancelled")
+            raise
+        except Exception as e:
+            logger.error(f"Error while streaming: {str(e)}")
+            yield sse_event({"error": str(e)}, event="error")
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/api/narrative/stream", tags=["Narrative"])
+async def stream_narrative(
+    request: GenerateNarrativeRequest,
+    client: UnifiedClient = Depends(get_unified_client)
+):
+    """
+    Stream an automotive narrative as Server-Sent Events.
+    """
+    return sse_stream(lambda: client.stream_narrative(
+        prompt=request.prompt,
+        context=request.context
+    ))
+
+
+async def create_image(request: GenerateImageRequest, client: UnifiedClient) -> ImageResponse:
+    """Enhance the prompt if requested, then generate the image."""
+    final_prompt = request.prompt
+    
+    # Enhance prompt if requested
+    if request.enhance_prompt:
+        enhanced = await client.enhance_prompt(request.prompt)
+        final_prompt = enhanced
+    
+    result = await client.generate_image(
+        prompt=final_prompt,
+        size=request.size,
+        quality=request.quality,
+        style=request.style,
+        seed=request.seed
+    )
+    
+    if result:
+        return ImageResponse(
+            success=True,
+            image_url=result,
+            revised_prompt=final_prompt
+        )
+    else:
+        return ImageResponse(
+            success=False,
+            error="Image generation failed"
+        )
+
+
 @app.post("/api/image", tags=["Image"], response_model=ImageResponse)
 async def generate_image(
     request: GenerateImageRequest,
+    http_request: Request,
     client: UnifiedClient = Depends(get_unified_client)
 ):
     """
     Generate a car image using Stability AI.
     """
     try:
-        # Enhance prompt if requested
-        final_prompt = request.prompt
-        if request.enhance_prompt:
-            enhanced = client.enhance_prompt(request.prompt)
-            final_prompt = enhanced
-        
-        result = client.generate_image(
-            prompt=final_prompt,
-            size=request.size,
-            quality=request.quality,
-            style=request.style
-        )
-        
-        if result:
-            return ImageResponse(
-                success=True,
-                image_url=result,
-                revised_prompt=final_prompt
-            )
-        else:
-            return ImageResponse(
-                success=False,
-                error="Image generation failed"
-            )
+        return await until_disconnect(http_request, create_image(request, client))
             
+    except (ClientDisconnected, DeadlineExceeded):
+        raise
     except Exception as e:
         logger.error(f"Error generating image: {str(e)}")
         return ImageResponse(success=False, error=str(e))
 
 
+async def run_generation(request: GenerateBothRequest, client: UnifiedClient):
+    """
+    Narrative and enhance -> image as concurrent branches; if one branch
+    fails the other's result is still returned.
+    """
+    async def narrative_stage(_):
+        return await client.generate_narrative(
+            prompt=request.prompt,
+            context=request.context
+        )
+    
+    async def enhance_stage(_):
+        if not request.enhance_prompt:
+            return request.prompt
+        try:
+            return await client.enhance_prompt(request.prompt)
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.warning(f"Prompt enhancement failed, using original prompt: {str(e)}")
+            return request.prompt
+    
+    async def image_stage(inputs):
+        image_url = await client.generate_image(
+            prompt=inputs["enhance"],
+            size=request.image_size,
+            quality=request.image_quality,
+            style=request.image_style,
+            seed=request.image_seed
+        )
+        if not image_url:
+            raise Exception("Image generation failed")
+        return image_url
+    
+    return await run_pipeline([
+        Stage("narrative", narrative_stage),
+        Stage("enhance", enhance_stage),
+        Stage("image", image_stage, depends_on=["enhance"])
+    ])
+
+
+async def finish_generation(request: GenerateBothRequest, result, store: VectorStore) -> GenerationResponse:
+    """Save a pipeline result to history (if requested) and build the response."""
+    narrative = result.get("narrative")
+    image_url = result.get("image")
+    final_prompt = result.get("enhance", request.prompt)
+    
+    record_id = None
+    if request.save_to_history and image_url:
+        record_id = await run_in_threadpool(
+            store.add_generation,
+            collection_name=HISTORY_COLLECTION,
+            prompt=request.prompt,
+            narrative=narrative or "",
+            image_url=image_url
+        )
+    
+    errors = result.errors
+    return GenerationResponse(
+        success=bool(narrative or image_url),
+        prompt=request.prompt,
+        narrative=narrative,
+        image_url=image_url,
+        revised_prompt=final_prompt,
+        record_id=record_id,
+        error="; ".join(f"{name}: {error}" for name, error in errors.items()) or None,
+        errors=errors or None,
+        timings=result.timings
+    )
+
+
 @app.post("/api/generate", tags=["Generation"], response_model=GenerationResponse)
 async def generate_both(
     request: GenerateBothRequest,
+    http_request: Request,
     client: UnifiedClient = Depends(get_unified_client),
     store: VectorStore = Depends(get_vector_store)
 ):
@@ -174,51 +433,129 @@ async def generate_both(
     Generate both narrative and image.
     """
     try:
-        # Generate narrative
-        narrative = client.generate_narrative(
-            prompt=request.prompt,
-            context=request.context
-        )
-        
-        # Generate image
-        final_prompt = request.prompt
-        if request.enhance_prompt:
-            final_prompt = client.enhance_prompt(request.prompt)
-        
-        image_url = client.generate_image(
-            prompt=final_prompt,
-            size=request.image_size,
-            quality=request.image_quality,
-            style=request.image_style
-        )
+        result = await until_disconnect(http_request, run_generation(request, client))
         
-        # Save to history if requested
-        record_id = None
-        if request.save_to_history and image_url:
-            record_id = store.add_generation(
-                collection_name=HISTORY_COLLECTION,
-                prompt=request.prompt,
-                narrative=narrative,
-                image_url=image_url
-            )
-        
-        return GenerationResponse(
-            success=True,
-            prompt=request.prompt,
-            narrative=narrative,
-            image_url=image_url,
-            revised_prompt=final_prompt,
-            record_id=record_id
-        )
+        # Only save to history if someone is still there to see it
+        if await http_request.is_disconnected():
+            raise ClientDisconnected()
+        return await finish_generation(request, result, store)
         
+    except (ClientDisconnected, DeadlineExceeded):
+        raise
     except Exception as e:
         logger.error(f"Error in generate both: {str(e)}")
         return GenerationResponse(success=False, prompt=request.prompt, error=str(e))
 
 
+async def run_image_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Job handler for queued image generations."""
+    response = await create_image(GenerateImageRequest(**payload), get_unified_client())
+    if not response.success:
+        raise Exception(response.error)
+    return response.model_dump()
+
+
+async def run_generate_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Job handler for queued narrative + image generations."""
+    request = GenerateBothRequest(**payload)
+    result = await run_generation(request, get_unified_client())
+    response = await finish_generation(request, result, get_vector_store())
+    if not response.success:
+        raise Exception(response.error)
+    return response.model_dump()
+
+
+async def start_job_queue():
+    """Create the job queue, register handlers and start its workers."""
+    global job_queue
+    job_queue = JobQueue(
+        settings.job_db_path,
+        workers=settings.job_workers,
+        max_pending=settings.job_max_pending,
+        job_timeout=settings.job_timeout,
+        retention=settings.job_retention
+    )
+    job_queue.register("image", run_image_job)
+    job_queue.register("generate", run_generate_job)
+    await job_queue.start()
+
+
+def job_response(job: Dict[str, Any]) -> JobResponse:
+    return JobResponse(
+        success=job["status"] != FAILED,
+        job_id=job["id"],
+        kind=job["kind"],
+        status=job["status"],
+        priority=job["priority"],
+        position=job_queue.position(job["id"]) if job["status"] == QUEUED else None,
+        result=job["result"],
+        created_at=job["created_at"],
+        started_at=job["started_at"],
+        finished_at=job["finished_at"],
+        error=job["error"]
+    )
+
+
+async def submit_job(kind: str, payload: Dict[str, Any], priority: int) -> JobResponse:
+    try:
+        job = await job_queue.submit(kind, payload, priority=priority)
+    except QueueFull as e:
+        logger.warning(f"Rejecting {kind} job: {str(e)}")
+        raise HTTPException(status_code=503, detail="Job queue is full, please retry later")
+    return job_response(job)
+
+
+@app.post("/api/jobs/image", tags=["Jobs"], response_model=JobResponse, status_code=202)
+async def submit_image_job(request: GenerateImageRequest, priority: int = 0):
+    """
+    Queue an image generation and return its job id immediately.
+    Poll GET /api/jobs/{job_id} or subscribe to /api/jobs/{job_id}/events for the result.
+    """
+    return await submit_job("image", request.model_dump(), priority)
+
+
+@app.post("/api/jobs/generate", tags=["Jobs"], response_model=JobResponse, status_code=202)
+async def submit_generate_job(request: GenerateBothRequest, priority: int = 0):
+    """
+    Queue a narrative + image generation and return its job id immediately.
+    """
+    return await submit_job("generate", request.model_dump(), priority)
+
+
+@app.get("/api/jobs/{job_id}", tags=["Jobs"], response_model=JobResponse)
+async def get_job(job_id: str):
+    """
+    Get a job's status, and its result once finished.
+    """
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_response(job)
+
+
+@app.get("/api/jobs/{job_id}/events", tags=["Jobs"])
+async def stream_job(job_id: str):
+    """
+    Stream a job's status changes as Server-Sent Events, ending when it finishes.
+    """
+    if await job_queue.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def events():
+        async for job in job_queue.subscribe(job_id):
+            yield sse_event(job_response(job).model_dump(), event=job["status"])
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.post("/api/chat", tags=["Chat"], response_model=ChatResponse)
 async def chat(
     request: ChatRequest,
+    http_request: Request,
     client: UnifiedClient = Depends(get_unified_client)
 ):
     """
@@ -227,37 +564,57 @@ async def chat(
     try:
         messages = [{"role": m.role, "content": m.content} for m in request.messages]
         
-        response = client.chat(
+        response = await until_disconnect(http_request, client.chat(
             messages=messages,
             context=request.context
-        )
+        ))
         
         return ChatResponse(
             success=True,
             response=response
         )
         
+    except (ClientDisconnected, DeadlineExceeded):
+        raise
     except Exception as e:
         logger.error(f"Error in chat: {str(e)}")
         return ChatResponse(success=False, response="", error=str(e))
 
 
+@app.post("/api/chat/stream", tags=["Chat"])
+async def stream_chat(
+    request: ChatRequest,
+    client: UnifiedClient = Depends(get_unified_client)
+):
+    """
+    Stream a chat response as Server-Sent Events.
+    """
+    messages = [{"role": m.role, "content": m.content} for m in request.messages]
+    return sse_stream(lambda: client.stream_chat(
+        messages=messages,
+        context=request.context
+    ))
+
+
 @app.post("/api/prompt/enhance", tags=["Tools"], response_model=EnhancePromptResponse)
 async def enhance_prompt(
     request: EnhancePromptRequest,
+    http_request: Request,
     client: UnifiedClient = Depends(get_unified_client)
 ):
     """
     Enhance a prompt for better image generation results.
     """
     try:
-        enhanced = client.enhance_prompt(request.prompt)
+        enhanced = await until_disconnect(http_request, client.enhance_prompt(request.prompt))
         
         return EnhancePromptResponse(
             success=True,
             enhanced_prompt=enhanced
         )
             
+    except (ClientDisconnected, DeadlineExceeded):
+        raise
     except Exception as e:
         logger.error(f"Error in enhance_prompt: {str(e)}")
         return EnhancePromptResponse(success=False, enhanced_prompt=request.prompt, error=str(e))
@@ -266,13 +623,23 @@ async def enhance_prompt(
 @app.get("/api/history", tags=["History"], response_model=HistoryResponse)
 async def get_history(
     limit: int = 20,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
     store: VectorStore = Depends(get_vector_store)
 ):
     """
-    Get generation history.
+    Get generation history, newest first.
+    Page backwards with before=next_cursor and forwards with after=prev_cursor;
+    either also accepts an ISO timestamp.
     """
     try:
-        history = store.get_history(HISTORY_COLLECTION, limit)
+        # One extra record tells us whether another page exists in that direction
+        history = await run_in_threadpool(
+            store.get_history, HISTORY_COLLECTION, limit + 1, before=before, after=after
+        )
+        has_more = len(history) > limit
+        if has_more:
+            history = history[1:] if after is not None else history[:limit]
         
         history_items = []
         for item in history:
@@ -285,10 +652,14 @@ async def get_history(
                 created_at=meta.get("created_at", "")
             ))
         
+        has_older = has_more if after is None else bool(history_items)
+        has_newer = has_more if after is not None else before is not None and bool(history_items)
         return HistoryResponse(
             success=True,
             history=history_items,
-            count=len(history_items)
+            count=len(history_items),
+            next_cursor=history_items[-1].id if has_older else None,
+            prev_cursor=history_items[0].id if has_newer else None
         )
         
     except Exception as e:
@@ -305,10 +676,13 @@ async def search_similar(
     Search for similar generations based on a query.
     """
     try:
-        results = store.search_similar(
+        results = await run_in_threadpool(
+            store.search_similar,
             collection_name=HISTORY_COLLECTION,
             query=request.query,
-            n_results=request.n_results
+            n_results=request.n_results,
+            mode=request.mode,
+            nprobe=request.nprobe
         )
         
         search_results = []
@@ -340,7 +714,7 @@ async def delete_history_item(
     Delete a history item.
     """
     try:
-        success = store.delete_record(HISTORY_COLLECTION, record_id)
+        success = await run_in_threadpool(store.delete_record, HISTORY_COLLECTION, record_id)
         if success:
             return {"success": True, "message": "Record deleted"}
         else:
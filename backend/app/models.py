@@ -18,6 +18,7 @@ class GenerateImageRequest(BaseModel):
     quality: Optional[str] = Field("standard", description="Image quality: standard or hd")
     style: Optional[str] = Field("vivid", description="Image style: vivid or natural")
     enhance_prompt: Optional[bool] = Field(True, description="Whether to enhance the prompt using AI")
+    seed: Optional[int] = Field(None, description="Explicit seed for reproducible, cacheable images")
 
 
 class GenerateBothRequest(BaseModel):
@@ -28,6 +29,7 @@ class GenerateBothRequest(BaseModel):
     image_size: Optional[str] = Field("1024x1024", description="Image size")
     image_quality: Optional[str] = Field("standard", description="Image quality")
     image_style: Optional[str] = Field("vivid", description="Image style")
+    image_seed: Optional[int] = Field(None, description="Explicit seed for reproducible, cacheable images")
     save_to_history: Optional[bool] = Field(True, description="Whether to save to history")
 
 
@@ -47,6 +49,8 @@ class SearchRequest(BaseModel):
     """Request model for searching history."""
     query: str = Field(..., description="Search query")
     n_results: Optional[int] = Field(5, description="Number of results to return")
+    mode: Optional[str] = Field("vector", description="Ranking: vector (embedding similarity) or text (keyword relevance)")
+    nprobe: Optional[int] = Field(None, description="IVF lists scanned on large collections; higher improves recall at some latency", ge=1)
 
 
 class EnhancePromptRequest(BaseModel):
@@ -84,6 +88,8 @@ class GenerationResponse(BaseModel):
     revised_prompt: Optional[str] = None
     record_id: Optional[str] = None
     error: Optional[str] = None
+    errors: Optional[Dict[str, str]] = Field(None, description="Per-stage errors when a branch failed")
+    timings: Optional[Dict[str, float]] = Field(None, description="Per-stage wall-clock timings in milliseconds")
 
 
 class ChatResponse(BaseModel):
@@ -108,6 +114,8 @@ class HistoryResponse(BaseModel):
     success: bool
     history: List[HistoryItem]
     count: int
+    next_cursor: Optional[str] = Field(None, description="Pass as 'before' to get the next older page")
+    prev_cursor: Optional[str] = Field(None, description="Pass as 'after' to get the next newer page")
 
 
 class SearchResult(BaseModel):
@@ -132,6 +140,21 @@ class EnhancePromptResponse(BaseModel):
     error: Optional[str] = None
 
 
+class JobResponse(BaseModel):
+    """Response model for a background generation job."""
+    success: bool
+    job_id: Optional[str] = None
+    kind: Optional[str] = None
+    status: Optional[str] = Field(None, description="queued, running, succeeded or failed")
+    priority: Optional[int] = None
+    position: Optional[int] = Field(None, description="Jobs ahead of this one while queued")
+    result: Optional[Dict[str, Any]] = Field(None, description="ImageResponse or GenerationResponse fields once succeeded")
+    created_at: Optional[float] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+
+
 class HealthResponse(BaseModel):
     """Response model for health check."""
     status: str
@@ -1,6 +1,10 @@
 from .openai_client import OpenAIClient
 from .stabilityai_client import StabilityAIImageClient, generate_image as stability_generate_image
 from .vector_store import VectorStore
+from .embeddings import HashingEmbedder, OllamaEmbedder
+from .image_store import ImageStore
+from .image_cache import ImageCache
+from .prompt_cache import PromptCache
 from .unified_client import UnifiedClient
 from .ollama_client import OllamaClient
 from .groq_client import GroqClient
@@ -10,6 +14,11 @@ __all__ = [
     "StabilityAIImageClient",
     "stability_generate_image",
     "VectorStore",
+    "HashingEmbedder",
+    "OllamaEmbedder",
+    "ImageStore",
+    "ImageCache",
+    "PromptCache",
     "UnifiedClient",
     "OllamaClient",
     "GroqClient"
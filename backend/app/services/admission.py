@@ -0,0 +1,201 @@
+"""
+Admission control and load shedding for the HTTP API.
+
+Requests are grouped into endpoint classes (chat, narrative, image,
+storage). Each class has its own concurrency limit and maximum queueing
+delay. Because the classes do not share slots, cheap history/search calls
+always have reserved capacity however many images are being generated.
+When a request's estimated wait exceeds its class deadline it is shed
+immediately with 503 and a Retry-After instead of queueing behind work that
+would time out anyway.
+"""
+
+import asyncio
+import json
+import logging
+import math
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.bulkhead import acquire_within
+
+logger = logging.getLogger(__name__)
+
+# (method, path prefix, class); first match wins
+ENDPOINT_CLASSES: List[Tuple[str, str, str]] = [
+    ("POST", "/api/chat", "chat"),
+    ("POST", "/api/narrative", "narrative"),
+    ("POST", "/api/prompt/enhance", "narrative"),
+    ("POST", "/api/image", "image"),
+    ("POST", "/api/generate", "image"),
+    ("*", "/api/history", "storage"),
+    ("POST", "/api/search", "storage"),
+]
+
+
+def classify_request(method: str, path: str) -> Optional[str]:
+    """Endpoint class for a request, or None if it is not admission-controlled."""
+    for cls_method, prefix, name in ENDPOINT_CLASSES:
+        if (cls_method == "*" or cls_method == method) and path.startswith(prefix):
+            return name
+    return None
+
+
+def parse_admission_limits(spec: str) -> Dict[str, Tuple[int, float]]:
+    """Parse "chat=16:10,image=4:30" into {class: (max_in_flight, max_wait_seconds)}."""
+    limits = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        name, value = item.split("=", 1)
+        concurrent, _, wait = value.partition(":")
+        try:
+            limits[name.strip()] = (int(concurrent), float(wait or 0))
+        except ValueError:
+            logger.warning(f"Ignoring malformed admission limit: {item.strip()}")
+    return limits
+
+
+class ShedRequest(Exception):
+    """The request should be rejected now; retry_after is a hint in seconds."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"shed, retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class EndpointClass:
+    """In-flight limit, wait queue and service-time estimate for one endpoint class."""
+
+    ALPHA = 0.2
+
+    def __init__(self, name: str, max_in_flight: int, max_wait: float):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.max_wait = max_wait
+
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+        self.waiting = 0
+        self.service_time: Optional[float] = None
+        self.admitted = 0
+        self.shed = 0
+
+    def estimated_wait(self) -> float:
+        """Expected queueing delay for a request arriving now."""
+        if self.in_flight + self.waiting < self.max_in_flight:
+            return 0.0
+        ahead = self.in_flight + self.waiting - self.max_in_flight + 1
+        return ahead * (self.service_time or 0.0) / self.max_in_flight
+
+    async def acquire(self):
+        """Take a slot, queueing if the estimate fits the deadline; raises ShedRequest otherwise."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+
+        estimate = self.estimated_wait()
+        if estimate > self.max_wait:
+            self.shed += 1
+            raise ShedRequest(estimate)
+
+        self.waiting += 1
+        try:
+            await acquire_within(self._semaphore, self.max_wait or None)
+        except asyncio.TimeoutError:
+            self.shed += 1
+            raise ShedRequest(self.service_time or self.max_wait or 1.0)
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        self.admitted += 1
+
+    def release(self, service_time: float):
+        self.in_flight -= 1
+        self._semaphore.release()
+        if self.service_time is None:
+            self.service_time = service_time
+        else:
+            self.service_time += self.ALPHA * (service_time - self.service_time)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_in_flight": self.max_in_flight,
+            "max_wait_seconds": self.max_wait,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "ewma_service_seconds": round(self.service_time, 3) if self.service_time is not None else None,
+            "estimated_wait_seconds": round(self.estimated_wait(), 3),
+            "admitted": self.admitted,
+            "shed": self.shed
+        }
+
+
+class AdmissionController:
+    """Per-class admission state shared by the middleware and /api/metrics."""
+
+    def __init__(self, limits: Dict[str, Tuple[int, float]]):
+        self.classes = {
+            name: EndpointClass(name, concurrent, wait)
+            for name, (concurrent, wait) in limits.items() if concurrent > 0
+        }
+
+    def get(self, method: str, path: str) -> Optional[EndpointClass]:
+        name = classify_request(method, path)
+        return self.classes.get(name) if name else None
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: c.stats() for name, c in self.classes.items()}
+
+
+class AdmissionMiddleware:
+    """
+    Pure ASGI middleware enforcing AdmissionController limits.
+    The slot is held until the response body has been sent, so streaming
+    responses count as in flight for their whole duration.
+    """
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        endpoint_class = self.controller.get(scope["method"], scope["path"])
+        if endpoint_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await endpoint_class.acquire()
+        except ShedRequest as e:
+            logger.warning(f"Shedding {scope['method']} {scope['path']} "
+                           f"({endpoint_class.name}): estimated wait {e.retry_after:.1f}s")
+            await self._reject(send, e.retry_after)
+            return
+
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            endpoint_class.release(time.monotonic() - started)
+
+    @staticmethod
+    async def _reject(send, retry_after: float):
+        seconds = max(1, math.ceil(retry_after))
+        body = json.dumps({
+            "detail": "Server is busy, please retry later",
+            "retry_after": seconds
+        }).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("ascii")),
+                (b"retry-after", str(seconds).encode("ascii")),
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
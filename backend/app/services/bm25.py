@@ -0,0 +1,126 @@
+"""
+Inverted index with BM25 ranking for keyword search over a collection.
+
+Documents are split with the embedders' tokenizer into case-folded word
+tokens ("carbon" is one token, so "car" does not match it).
+Each term keeps a postings map of document id -> term frequency, so a query
+only visits the postings of its own terms and costs O(matching postings),
+not O(collection). Each document also keeps its distinct terms, so adds,
+replacements and removes update exactly its own postings in place.
+"""
+
+import heapq
+import json
+import logging
+import math
+import os
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.embeddings import tokenize
+
+logger = logging.getLogger(__name__)
+
+
+class BM25Index:
+    """Incrementally maintained BM25 (Okapi) index."""
+
+    # Bumped when tokenization changes, so snapshots of older postings are rebuilt
+    FORMAT = 2
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        """
+        Args:
+            k1: Term frequency saturation
+            b: Document length normalization (0: none, 1: full)
+        """
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.lengths: Dict[str, int] = {}
+        # Distinct terms of each document, to find its postings again
+        self.terms: Dict[str, List[str]] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def add(self, doc_id: str, text: str):
+        """Index a document, replacing any earlier version with the same id."""
+        self.remove(doc_id)
+        terms = tokenize(text)
+        counts = Counter(terms)
+        for term, count in counts.items():
+            self.postings.setdefault(term, {})[doc_id] = count
+        self.terms[doc_id] = list(counts)
+        self.lengths[doc_id] = len(terms)
+        self.total_length += len(terms)
+
+    def remove(self, doc_id: str) -> bool:
+        """Drop a document and its postings."""
+        length = self.lengths.pop(doc_id, None)
+        if length is None:
+            return False
+        self.total_length -= length
+        for term in self.terms.pop(doc_id, []):
+            docs = self.postings.get(term)
+            if docs is not None:
+                docs.pop(doc_id, None)
+                if not docs:
+                    del self.postings[term]
+        return True
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """Top k (doc_id, BM25 score) pairs, best first."""
+        count = len(self.lengths)
+        if not count or k <= 0:
+            return []
+        average_length = self.total_length / count or 1.0
+        # norm(doc) = k1 * (1 - b + b * length / average_length), split into constants
+        base = self.k1 * (1 - self.b)
+        per_token = self.k1 * self.b / average_length
+        lengths = self.lengths
+
+        scores: Dict[str, float] = {}
+        get_score = scores.get
+        for term in set(tokenize(query)):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+            weight = idf * (self.k1 + 1)
+            for doc_id, frequency in docs.items():
+                scores[doc_id] = get_score(doc_id, 0.0) + weight * frequency / (
+                    frequency + base + per_token * lengths[doc_id])
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def save(self, path: str, version: Any = None):
+        """Write a snapshot atomically; version lets the loader detect a stale file."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"format": self.FORMAT, "version": version,
+                       "postings": self.postings, "lengths": self.lengths}, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, version: Any = None, **kwargs) -> Optional["BM25Index"]:
+        """Read a snapshot, or None if it is missing, unreadable or for another version."""
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable BM25 snapshot {path}: {e}")
+            return None
+        if data.get("format") != cls.FORMAT or data.get("version") != version:
+            return None
+        index = cls(**kwargs)
+        index.postings = data["postings"]
+        index.lengths = data["lengths"]
+        index.total_length = sum(index.lengths.values())
+        # The per-document terms are implied by the postings, so they are not stored
+        for term, docs in index.postings.items():
+            for doc_id in docs:
+                index.terms.setdefault(doc_id, []).append(term)
+        return index
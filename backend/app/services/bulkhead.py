@@ -0,0 +1,188 @@
+"""
+Per-provider concurrency limits (bulkheads).
+
+Each bulkhead admits up to max_concurrent calls at once and lets at most
+max_queue more wait for a slot. When the queue is full, or a waiter's turn
+does not come within queue_timeout, BulkheadFull is raised so the caller
+can fall back to another provider instead of piling onto a saturated one.
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from app.services import deadline
+
+logger = logging.getLogger(__name__)
+
+
+class BulkheadFull(Exception):
+    """A bulkhead had no free slot and no room (or time) left to wait."""
+
+
+async def acquire_within(semaphore: asyncio.Semaphore, timeout: Optional[float]):
+    """
+    Acquire a semaphore, giving up after timeout seconds (asyncio.TimeoutError).
+
+    asyncio.wait_for(semaphore.acquire(), timeout) can drop a permit when the
+    timeout fires just as the acquire succeeds (before Python 3.12). Here the
+    acquire runs as its own task, and if we stop waiting for it (timeout or
+    cancellation) any permit it still obtains is handed straight back.
+    """
+    if timeout is None:
+        await semaphore.acquire()
+        return
+
+    def release_if_acquired(task: "asyncio.Future"):
+        if not task.cancelled() and task.exception() is None:
+            semaphore.release()
+
+    acquire = asyncio.ensure_future(semaphore.acquire())
+    try:
+        await asyncio.wait_for(asyncio.shield(acquire), timeout)
+    except BaseException:
+        acquire.cancel()
+        acquire.add_done_callback(release_if_acquired)
+        raise
+
+
+class Bulkhead:
+    """Concurrency cap with a bounded FIFO wait queue."""
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int = 0,
+                 queue_timeout: Optional[float] = None):
+        """
+        Args:
+            name: Bulkhead name, e.g. "ollama" or "ollama.chat"
+            max_concurrent: Calls allowed in flight at once
+            max_queue: Calls allowed to wait for a slot
+            queue_timeout: Longest a caller waits for a slot (None: no limit)
+        """
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+
+    async def acquire(self):
+        """Take a slot, waiting in line if allowed; raises BulkheadFull otherwise."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+
+        # Count callers synchronously so a burst sees its own queue before any await
+        occupied = self.active + self.waiting
+        if occupied >= self.max_concurrent + self.max_queue:
+            self.rejected += 1
+            raise BulkheadFull(f"{self.name} at capacity "
+                               f"({self.active} active, {self.waiting} queued)")
+        if occupied >= self.max_concurrent:
+            self.queued += 1
+
+        # Never queue past the request deadline
+        timeout = self.queue_timeout
+        left = deadline.remaining()
+        if left is not None:
+            timeout = max(min(timeout, left) if timeout is not None else left, 0.0)
+
+        started = time.monotonic()
+        self.waiting += 1
+        try:
+            await acquire_within(self._semaphore, timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise BulkheadFull(f"{self.name}: no slot within {timeout:.1f}s")
+        finally:
+            self.waiting -= 1
+
+        self.total_wait += time.monotonic() - started
+        self.active += 1
+        self.admitted += 1
+
+    def release(self):
+        self.active -= 1
+        self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "avg_wait_seconds": round(self.total_wait / self.admitted, 4) if self.admitted else 0.0
+        }
+
+
+def parse_bulkhead_limits(spec: str) -> Dict[str, Tuple[int, int]]:
+    """
+    Parse "ollama=2:8,groq=16:32,ollama.enhance_prompt=1:4" into
+    {name: (max_concurrent, max_queue)}. The queue size defaults to 0.
+    """
+    limits = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        name, value = item.split("=", 1)
+        concurrent, _, queue = value.partition(":")
+        try:
+            limits[name.strip()] = (int(concurrent), int(queue or 0))
+        except ValueError:
+            logger.warning(f"Ignoring malformed bulkhead limit: {item.strip()}")
+    return limits
+
+
+class Bulkheads:
+    """Provider-level and provider.method-level bulkheads, looked up by name."""
+
+    def __init__(self, limits: Dict[str, Tuple[int, int]], queue_timeout: Optional[float] = None):
+        self.bulkheads = {
+            name: Bulkhead(name, concurrent, queue, queue_timeout)
+            for name, (concurrent, queue) in limits.items() if concurrent > 0
+        }
+
+    async def acquire(self, provider: str, method: Optional[str] = None) -> List[Bulkhead]:
+        """
+        Take a slot in the method-level bulkhead (if any), then the provider-level one.
+
+        Returns:
+            The bulkheads held; pass to release()
+        """
+        held = []
+        names = ([f"{provider}.{method}"] if method else []) + [provider]
+        try:
+            for name in names:
+                bulkhead = self.bulkheads.get(name)
+                if bulkhead:
+                    await bulkhead.acquire()
+                    held.append(bulkhead)
+        except BaseException:
+            self.release(held)
+            raise
+        return held
+
+    def release(self, held: List[Bulkhead]):
+        for bulkhead in reversed(held):
+            bulkhead.release()
+
+    @asynccontextmanager
+    async def slot(self, provider: str, method: Optional[str] = None) -> AsyncIterator[None]:
+        """Hold a slot for the duration of the block."""
+        held = await self.acquire(provider, method)
+        try:
+            yield
+        finally:
+            self.release(held)
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: b.stats() for name, b in self.bulkheads.items()}
@@ -0,0 +1,130 @@
+"""
+Per-provider circuit breaker.
+
+closed     -> requests flow; consecutive retryable failures are counted
+open       -> requests are skipped instantly
+half-open  -> one trial request is let through; success closes, failure re-opens
+
+When a health probe is supplied, an open breaker is only moved to half-open
+by a successful background probe, so real traffic never pays for discovering
+that a provider is still down. Without a probe, the breaker half-opens after
+reset_timeout seconds.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker with optional background recovery probe."""
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 30.0,
+                 probe: Optional[Callable[[], Awaitable[bool]]] = None,
+                 probe_interval: float = 10.0):
+        """
+        Args:
+            name: Provider name, for logging
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: Seconds before an open circuit half-opens (no probe)
+            probe: Async health check returning True when the provider is reachable
+            probe_interval: Seconds between background probes while open
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.probe = probe
+        self.probe_interval = probe_interval
+
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+        self._trial_in_flight = False
+        self._probe_task: Optional[asyncio.Task] = None
+
+    def allow_request(self) -> bool:
+        """Whether a request may be sent to the provider now."""
+        if self.state == OPEN and not self.probe:
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                self._set_state(HALF_OPEN)
+
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+
+        self.rejected += 1
+        return False
+
+    def record_success(self):
+        """Record a successful call."""
+        self.failures = 0
+        self._trial_in_flight = False
+        if self.state != CLOSED:
+            self._set_state(CLOSED)
+
+    def record_failure(self):
+        """Record a retryable failure; opens the circuit past the threshold."""
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self._open()
+
+    def release(self):
+        """Release a half-open trial slot without recording an outcome."""
+        self._trial_in_flight = False
+
+    def _set_state(self, state: str):
+        logger.info(f"Circuit for {self.name}: {self.state} -> {state}")
+        self.state = state
+
+    def _open(self):
+        if self.state != OPEN:
+            self._set_state(OPEN)
+            self.times_opened += 1
+        self.opened_at = time.monotonic()
+        if self.probe:
+            self._start_probe()
+
+    def _start_probe(self):
+        if self._probe_task and not self._probe_task.done():
+            return
+        try:
+            self._probe_task = asyncio.get_running_loop().create_task(self._probe_loop())
+        except RuntimeError:
+            # No running loop: fall back to time-based recovery
+            self.probe = None
+
+    async def _probe_loop(self):
+        while self.state == OPEN:
+            await asyncio.sleep(self.probe_interval)
+            try:
+                healthy = await self.probe()
+            except Exception as e:
+                logger.debug(f"Probe for {self.name} failed: {e}")
+                healthy = False
+            if healthy and self.state == OPEN:
+                self._set_state(HALF_OPEN)
+
+    def close(self):
+        """Stop the background probe."""
+        if self._probe_task and not self._probe_task.done():
+            self._probe_task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected
+        }
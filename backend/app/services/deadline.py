@@ -0,0 +1,126 @@
+"""
+Per-request deadlines.
+
+The deadline is an absolute monotonic time held in a context variable, so
+it follows the request through UnifiedClient, the provider clients and any
+tasks they spawn without being threaded through every signature. Upstream
+timeouts are clipped to the remaining budget, retry loops stop when it runs
+out, and run() abandons work that is still going at the deadline.
+
+Clients set the budget with the X-Request-Timeout header (seconds); the
+server default and maximum come from settings.
+"""
+
+import asyncio
+import contextvars
+import time
+from typing import Awaitable, Optional, TypeVar
+
+T = TypeVar("T")
+
+DEADLINE_HEADER = b"x-request-timeout"
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "request_deadline", default=None
+)
+
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed before the work finished."""
+
+
+def set_deadline(seconds: Optional[float]) -> contextvars.Token:
+    """Start a deadline this many seconds from now (None clears it); returns a reset token."""
+    return _deadline.set(time.monotonic() + seconds if seconds is not None else None)
+
+
+def reset_deadline(token: contextvars.Token):
+    _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the deadline, or None when no deadline is set."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def check():
+    """Raise DeadlineExceeded if the deadline has passed."""
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+
+
+def clip_timeout(timeout: float) -> float:
+    """Clip an upstream timeout to the remaining budget; raises if none is left."""
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return min(timeout, left)
+
+
+async def run(awaitable: Awaitable[T]) -> T:
+    """Await with the remaining budget as a timeout, cancelling the work when it runs out."""
+    left = remaining()
+    if left is None:
+        return await awaitable
+    if left <= 0:
+        # Close the coroutine so it is not reported as never awaited
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise DeadlineExceeded("Request deadline exceeded")
+    try:
+        return await asyncio.wait_for(awaitable, left)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(f"Request deadline exceeded after waiting {left:.1f}s")
+
+
+async def unbounded(awaitable: Awaitable[T]) -> T:
+    """
+    Await with no deadline. For work shared by callers with different budgets
+    (run it in its own task); each caller bounds its own wait with run().
+    """
+    token = set_deadline(None)
+    try:
+        return await awaitable
+    finally:
+        reset_deadline(token)
+
+
+class DeadlineMiddleware:
+    """Pure ASGI middleware that sets each HTTP request's deadline."""
+
+    def __init__(self, app, default_timeout: float, max_timeout: float):
+        """
+        Args:
+            app: Wrapped ASGI app
+            default_timeout: Budget in seconds when the client does not send one
+            max_timeout: Upper bound on a client-requested budget
+        """
+        self.app = app
+        self.default_timeout = default_timeout
+        self.max_timeout = max_timeout
+
+    def _budget(self, scope) -> float:
+        for name, value in scope.get("headers", []):
+            if name == DEADLINE_HEADER:
+                try:
+                    requested = float(value.decode("latin-1"))
+                except ValueError:
+                    break
+                if requested > 0:
+                    return min(requested, self.max_timeout)
+                break
+        return self.default_timeout
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = set_deadline(self._budget(scope))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            reset_deadline(token)
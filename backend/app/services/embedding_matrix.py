@@ -0,0 +1,209 @@
+"""
+Embedding matrix used for brute-force similarity search.
+
+MappedEmbeddingMatrix keeps a collection's unit-length embeddings in
+fixed-width binary files opened with numpy.memmap, so they survive restarts
+without re-embedding or parsing, opening one costs the same at any size,
+and scans page rows in from the OS cache. A version stamp in the header lets
+the owner check in O(1) that the files match its records.
+"""
+
+import logging
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first (argpartition, then sort k)."""
+    count = scores.shape[0]
+    k = min(k, count)
+    if k < count:
+        top = np.argpartition(-scores, k - 1)[:k]
+    else:
+        top = np.arange(count)
+    return top[np.argsort(-scores[top])]
+
+
+class MappedEmbeddingMatrix:
+    """
+    Contiguous float32 matrix of record embeddings stored in two memory-mapped files:
+
+        <path>.vecs   float32 rows of `dim` values
+        <path>.ids    32-byte header (row count, dim, version, magic) then fixed-width ids
+
+    Appends write one row in place (files double when full) and removals
+    swap the last row in, so the files stay dense. The id -> row index is
+    only built when a removal needs it.
+
+    `version` is opaque to the matrix: the owner stamps it after bringing the
+    matrix in step with its records and sets it to 0 while a change is in
+    progress, so a crash mid-change is detected on the next open.
+    """
+
+    ID_BYTES = 36  # a str(uuid4())
+    HEADER_BYTES = 32
+    MAGIC = 0x31584D42454D  # "MEBMX1"
+
+    def __init__(self, path: str, dim: Optional[int] = None, capacity: int = 1024):
+        """
+        Args:
+            path: File prefix for the .vecs and .ids files
+            dim: Embedding dimension; existing files with another dimension are discarded
+                (None: take it from existing files, or from the first vector added)
+            capacity: Initial rows allocated for new files
+        """
+        self.vec_path = f"{path}.vecs"
+        self.id_path = f"{path}.ids"
+        self.initial_capacity = capacity
+        self.dim: Optional[int] = None
+        self.header = None
+        self.id_rows = None
+        self.vectors = None
+        self._rows: Optional[Dict[str, int]] = None
+
+        if os.path.exists(self.id_path) and os.path.exists(self.vec_path):
+            try:
+                self._map()
+            except Exception as e:
+                logger.warning(f"Discarding unreadable embedding files {path}: {e}")
+                self._unmap()
+            if self.dim is not None and dim is not None and self.dim != dim:
+                logger.info(f"Embedding dimension changed ({self.dim} -> {dim}), resetting {path}")
+                self._unmap()
+        if self.dim is None and dim is not None:
+            self._create(dim)
+
+    def _create(self, dim: int):
+        capacity = self.initial_capacity
+        with open(self.id_path, "wb") as f:
+            f.write(np.array([0, dim, 0, self.MAGIC], dtype=np.uint64).tobytes())
+            f.truncate(self.HEADER_BYTES + capacity * self.ID_BYTES)
+        with open(self.vec_path, "wb") as f:
+            f.truncate(capacity * dim * 4)
+        self._map()
+
+    def _map(self):
+        self.header = np.memmap(self.id_path, dtype=np.uint64, mode="r+", shape=(4,))
+        if int(self.header[3]) != self.MAGIC:
+            raise ValueError("unrecognized header")
+        self.dim = int(self.header[1])
+        capacity = (os.path.getsize(self.id_path) - self.HEADER_BYTES) // self.ID_BYTES
+        capacity = min(capacity, os.path.getsize(self.vec_path) // (self.dim * 4))
+        if len(self) > capacity:
+            raise ValueError(f"row count {len(self)} exceeds file capacity {capacity}")
+        self.id_rows = np.memmap(self.id_path, dtype=f"S{self.ID_BYTES}", mode="r+",
+                                 offset=self.HEADER_BYTES, shape=(capacity,))
+        self.vectors = np.memmap(self.vec_path, dtype=np.float32, mode="r+",
+                                 shape=(capacity, self.dim))
+
+    def _unmap(self):
+        self.header = self.id_rows = self.vectors = None
+        self.dim = None
+        self._rows = None
+
+    def _grow(self):
+        """Double both files and remap them."""
+        capacity = max(2 * self.vectors.shape[0], 1)
+        self.flush()
+        os.truncate(self.id_path, self.HEADER_BYTES + capacity * self.ID_BYTES)
+        os.truncate(self.vec_path, capacity * self.dim * 4)
+        self._map()
+
+    def __len__(self) -> int:
+        return int(self.header[0]) if self.header is not None else 0
+
+    @property
+    def version(self) -> int:
+        return int(self.header[2]) if self.header is not None else 0
+
+    @version.setter
+    def version(self, value: int):
+        if self.header is not None:
+            self.header[2] = value
+
+    @classmethod
+    def check_id(cls, record_id: str):
+        """Raise ValueError if an id cannot be stored; call before persisting the record."""
+        try:
+            encoded = record_id.encode("ascii")
+        except UnicodeEncodeError:
+            raise ValueError(f"Record id is not ASCII: {record_id!r}")
+        if len(encoded) > cls.ID_BYTES:
+            raise ValueError(f"Record id longer than {cls.ID_BYTES} bytes: {record_id}")
+
+    @property
+    def ids(self) -> List[str]:
+        """Every id in row order (decodes the whole id file)."""
+        return [record_id.decode("ascii") for record_id in self.id_rows[:len(self)]] if len(self) else []
+
+    @property
+    def rows(self) -> Dict[str, int]:
+        if self._rows is None:
+            self._rows = {record_id: row for row, record_id in enumerate(self.ids)}
+        return self._rows
+
+    def add(self, record_id: str, vector: np.ndarray):
+        """Write a row in place; the count is bumped last so a torn append is ignored."""
+        self.check_id(record_id)
+        encoded = record_id.encode("ascii")
+        if self.dim is None:
+            self._create(vector.shape[0])
+        count = len(self)
+        if count == self.vectors.shape[0]:
+            self._grow()
+        self.vectors[count] = vector
+        self.id_rows[count] = encoded
+        self.header[0] = count + 1
+        if self._rows is not None:
+            self._rows[record_id] = count
+
+    def remove(self, record_id: str) -> bool:
+        """Remove a vector by moving the last row into its slot."""
+        row = self.rows.pop(record_id, None)
+        if row is None:
+            return False
+        last = len(self) - 1
+        if row != last:
+            moved_id = self.id_rows[last].decode("ascii")
+            self.vectors[row] = self.vectors[last]
+            self.id_rows[row] = self.id_rows[last]
+            self._rows[moved_id] = row
+        self.header[0] = last
+        return True
+
+    def clear(self):
+        if self.header is not None:
+            self.header[0] = 0
+        self._rows = {}
+
+    def reset(self, dim: int):
+        """Drop every row and start over with a new dimension."""
+        self._unmap()
+        self._create(dim)
+        self._rows = {}
+
+    def search(self, query: np.ndarray, k: int) -> List[tuple]:
+        """
+        Return up to k (record_id, similarity) pairs, best first.
+        Only the top k ids are decoded.
+        """
+        # Read the count before the maps: they only ever grow past it
+        count = len(self)
+        vectors, id_rows = self.vectors, self.id_rows
+        if count == 0 or k <= 0:
+            return []
+        scores = vectors[:count] @ query
+        return [(id_rows[i].decode("ascii"), float(scores[i])) for i in top_k(scores, k)]
+
+    def flush(self):
+        for mapped in (self.header, self.id_rows, self.vectors):
+            if mapped is not None:
+                mapped.flush()
+
+    def close(self):
+        self.flush()
+        self._unmap()
@@ -0,0 +1,130 @@
+"""
+Text embedders for the vector store.
+
+Provides a dependency-free hashing embedder (default) and an Ollama-backed
+embedder that uses the local server's embeddings endpoint when available.
+"""
+
+import hashlib
+import logging
+import re
+from typing import List, Optional
+
+import numpy as np
+import requests
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Case-fold and split text into word tokens, keeping non-ASCII letters ("café", "東京")."""
+    return TOKEN_PATTERN.findall((text or "").casefold())
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize each row in place, leaving all-zero rows untouched."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+
+class HashingEmbedder:
+    """
+    Local embedder using the hashing trick over word unigrams and bigrams.
+    Deterministic, needs no model download, and works offline.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def _bucket(self, feature: str) -> tuple:
+        """Map a feature to a (bucket, sign) pair."""
+        digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        return value % self.dim, 1.0 if (value >> 63) & 1 else -1.0
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed a batch of texts.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            float32 array of shape (len(texts), dim) with unit-length rows
+        """
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+            for feature in features:
+                bucket, sign = self._bucket(feature)
+                vectors[row, bucket] += sign
+        # Sublinear term frequency dampens repeated words
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        return normalize_rows(vectors.astype(np.float32, copy=False))
+
+
+class OllamaEmbedder:
+    """Embedder backed by the Ollama /api/embeddings endpoint."""
+
+    name = "ollama"
+
+    def __init__(self, base_url: str, model: str = "nomic-embed-text", timeout: int = 30):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.timeout = timeout
+        self.dim: Optional[int] = None
+
+    def _embed_one(self, text: str) -> List[float]:
+        response = requests.post(
+            f"{self.base_url}/api/embeddings",
+            json={"model": self.model, "prompt": text},
+            timeout=self.timeout
+        )
+        if response.status_code != 200:
+            raise Exception(f"Ollama embeddings error: {response.status_code} - {response.text[:200]}")
+        embedding = response.json().get("embedding")
+        if not embedding:
+            raise Exception("Ollama returned an empty embedding")
+        return embedding
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed a batch of texts, one request per text."""
+        vectors = np.asarray([self._embed_one(text) for text in texts], dtype=np.float32)
+        if vectors.ndim != 2:
+            raise Exception("Unexpected embedding shape from Ollama")
+        self.dim = vectors.shape[1]
+        return normalize_rows(vectors)
+
+
+def create_embedder(provider: str = "hashing", dim: int = 512,
+                    ollama_base_url: Optional[str] = None,
+                    ollama_model: Optional[str] = None):
+    """
+    Create the configured embedder, falling back to hashing if Ollama is unreachable.
+
+    Args:
+        provider: "hashing" or "ollama"
+        dim: Dimension for the hashing embedder
+        ollama_base_url: Ollama server URL
+        ollama_model: Ollama embedding model name
+
+    Returns:
+        An embedder exposing embed(texts) -> np.ndarray and a dim attribute
+    """
+    if provider == "ollama" and ollama_base_url:
+        embedder = OllamaEmbedder(ollama_base_url, model=ollama_model or "nomic-embed-text")
+        try:
+            embedder.embed(["probe"])
+            logger.info(f"Using Ollama embeddings ({embedder.model}, dim={embedder.dim})")
+            return embedder
+        except Exception as e:
+            logger.warning(f"Ollama embeddings unavailable, using hashing embedder: {e}")
+
+    return HashingEmbedder(dim=dim)
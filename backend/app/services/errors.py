@@ -0,0 +1,165 @@
+"""
+Typed errors for upstream provider failures.
+
+Provider clients raise these instead of bare Exceptions so callers can
+decide on retries, fallback and circuit breaking from the status code,
+server retry hints and quota information rather than from message text.
+"""
+
+import email.utils
+import re
+import time
+from typing import Any, Dict, Mapping, Optional
+
+
+class ProviderError(Exception):
+    """Base class for a failed call to an upstream provider."""
+
+    #: Whether retrying the same provider may succeed
+    retryable = False
+    #: Whether the failure is a quota/billing limit (retrying soon will not help)
+    quota = False
+
+    def __init__(self, provider: str, message: str, status_code: Optional[int] = None,
+                 retry_after: Optional[float] = None,
+                 rate_limit: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            provider: Provider name, e.g. "groq"
+            message: Human-readable description
+            status_code: HTTP status, if the provider answered
+            retry_after: Seconds the server asked us to wait, if given
+            rate_limit: Parsed rate-limit headers (remaining, reset times)
+        """
+        super().__init__(message)
+        self.provider = provider
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.rate_limit = rate_limit or {}
+
+
+class ProviderTimeoutError(ProviderError):
+    """The provider did not answer in time."""
+    retryable = True
+
+
+class ProviderConnectionError(ProviderError):
+    """The provider could not be reached."""
+    retryable = True
+
+
+class ProviderUnavailableError(ProviderError):
+    """The provider answered with a 5xx status."""
+    retryable = True
+
+
+class RateLimitError(ProviderError):
+    """The provider throttled the request (429)."""
+    retryable = True
+
+
+class QuotaExceededError(ProviderError):
+    """The account's quota, credits or plan limit is exhausted."""
+    quota = True
+
+
+class AuthenticationError(ProviderError):
+    """The provider rejected the credentials (401/403)."""
+
+
+class InvalidRequestError(ProviderError):
+    """The provider rejected the request itself (other 4xx)."""
+
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+_QUOTA_MARKERS = ("quota", "insufficient_balance", "insufficient credits", "billing")
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delta seconds or HTTP date) into seconds."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(when.timestamp() - time.time(), 0.0)
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse durations like "7.66s", "2m59.56s" or "120ms" into seconds."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(n) * _DURATION_UNITS[unit] for n, unit in parts)
+
+
+def parse_rate_limit_headers(headers: Mapping[str, str]) -> Dict[str, Any]:
+    """Extract x-ratelimit-* remaining/reset values (OpenAI-style, as used by Groq)."""
+    info: Dict[str, Any] = {}
+    for kind in ("requests", "tokens"):
+        remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+        if remaining is not None:
+            try:
+                info[f"remaining_{kind}"] = int(float(remaining))
+            except ValueError:
+                pass
+        reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+        if reset is not None:
+            info[f"reset_{kind}"] = reset
+    return info
+
+
+def error_from_response(provider: str, status_code: int, text: str,
+                        headers: Optional[Mapping[str, str]] = None) -> ProviderError:
+    """
+    Build the typed error for a non-success HTTP response.
+
+    Args:
+        provider: Provider name
+        status_code: HTTP status code
+        text: Response body (truncated in the message)
+        headers: Response headers, for Retry-After and rate-limit hints
+
+    Returns:
+        ProviderError subclass matching the status
+    """
+    headers = headers or {}
+    rate_limit = parse_rate_limit_headers(headers)
+    retry_after = parse_retry_after(headers.get("retry-after"))
+    if retry_after is None and status_code == 429:
+        # Without Retry-After, the soonest reset of an exhausted limit is the best hint
+        resets = [
+            rate_limit[f"reset_{kind}"] for kind in ("requests", "tokens")
+            if f"reset_{kind}" in rate_limit and rate_limit.get(f"remaining_{kind}", 1) == 0
+        ]
+        retry_after = min(resets) if resets else None
+
+    message = f"{provider} API error {status_code}: {text[:200]}"
+    lowered = text.lower()
+
+    if status_code == 402 or (status_code == 429 and any(m in lowered for m in _QUOTA_MARKERS)):
+        cls = QuotaExceededError
+    elif status_code == 429:
+        cls = RateLimitError
+    elif status_code in (401, 403):
+        cls = AuthenticationError
+    elif status_code >= 500:
+        cls = ProviderUnavailableError
+    else:
+        cls = InvalidRequestError
+    return cls(provider, message, status_code=status_code,
+               retry_after=retry_after, rate_limit=rate_limit)
@@ -2,10 +2,18 @@
 Groq API Client for text generation.
 Fast LLM inference with low latency.
 """
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, AsyncIterator
+import json
 import logging
-import requests
-import time
+
+import httpx
+
+from app.services.errors import (
+    ProviderConnectionError, ProviderTimeoutError, error_from_response
+)
+from app.services.http_transport import clipped_timeout, get_http_client
+from app.services.rate_limiter import estimate_tokens, get_rate_limiter
+from app.services.retry import RetryPolicy
 
 logger = logging.getLogger(__name__)
 
@@ -34,8 +42,16 @@ class GroqClient:
         # Verify API key is set
         if not api_key:
             raise ValueError("Groq API key is required")
+        
+        self.headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        self.http = get_http_client("groq", base_url=self.base_url, timeout=self.timeout)
+        self.retry = RetryPolicy.from_settings(max_attempts=3)
+        self.limiter = get_rate_limiter("groq")
     
-    def _call_api(self, endpoint: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    async def _call_api(self, endpoint: str, payload: Dict[str, Any]) -> Dict[str, Any]:
         """
         Make API call to Groq with retries.
         
@@ -45,57 +61,91 @@ class GroqClient:
             
         Returns:
             Response JSON
+            
+        Raises:
+            ProviderError: If the call fails after retries
         """
-        url = f"{self.base_url}/{endpoint}"
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
+        reserved = self._estimate_tokens(payload)
         
-        max_retries = 3
-        retry_delay = 2
-        
-        for attempt in range(max_retries):
+        async def attempt() -> Dict[str, Any]:
+            await self.limiter.acquire(reserved)
             try:
-                logger.info(f"Groq API call attempt {attempt + 1}/{max_retries}: {endpoint}")
-                
-                response = requests.post(
-                    url, 
-                    json=payload, 
-                    headers=headers, 
-                    timeout=self.timeout
-                )
+                logger.info(f"Groq API call: {endpoint}")
+                try:
+                    response = await self.http.post(
+                        f"/{endpoint}", 
+                        json=payload, 
+                        headers=self.headers,
+                        timeout=clipped_timeout(self.timeout)
+                    )
+                except httpx.TimeoutException:
+                    raise ProviderTimeoutError("groq", "Groq request timeout")
+                except httpx.RequestError as e:
+                    raise ProviderConnectionError("groq", f"Groq request failed: {str(e)}")
                 
-                if response.status_code == 200:
-                    return response.json()
-                elif response.status_code == 429:
-                    # Rate limited
-                    logger.warning(f"Groq rate limited, attempt {attempt + 1}")
-                    if attempt < max_retries - 1:
-                        time.sleep(retry_delay * (attempt + 1))
-                        continue
-                    raise Exception(f"Groq rate limit exceeded: {response.text}")
-                elif response.status_code == 401:
-                    raise Exception(f"Groq authentication failed: {response.text}")
-                else:
-                    raise Exception(f"Groq API error {response.status_code}: {response.text}")
-                    
-            except requests.exceptions.Timeout:
-                logger.warning(f"Groq timeout, attempt {attempt + 1}")
-                if attempt < max_retries - 1:
-                    time.sleep(retry_delay * (attempt + 1))
-                    continue
-                raise Exception("Groq request timeout")
-            except requests.exceptions.RequestException as e:
-                logger.warning(f"Groq request error: {e}")
-                if attempt < max_retries - 1:
-                    time.sleep(retry_delay * (attempt + 1))
-                    continue
-                raise Exception(f"Groq request failed: {str(e)}")
-        
-        raise Exception("Groq max retries exceeded")
+                self.limiter.update_from_headers(response.headers)
+                if response.status_code != 200:
+                    error = error_from_response("groq", response.status_code, response.text, response.headers)
+                    if error.retry_after:
+                        self.limiter.pause(error.retry_after)
+                    raise error
+            except BaseException:
+                # A failed attempt generated nothing; refund it so retries do not drain the bucket
+                self.limiter.settle(reserved, 0)
+                raise
+            
+            result = response.json()
+            used = result.get("usage", {}).get("total_tokens")
+            if used is not None:
+                self.limiter.settle(reserved, used)
+            return result
+        
+        return await self.retry.run("groq", attempt)
     
-    def generate_chat_response(self, messages: List[Dict[str, str]], 
+    def _estimate_tokens(self, payload: Dict[str, Any]) -> int:
+        """Tokens to reserve for a request; settled against reported usage afterwards."""
+        prompt = "".join(m.get("content", "") for m in payload.get("messages", []))
+        return estimate_tokens(prompt) + min(payload.get("max_tokens", 0), 512)
+    
+    async def health_check(self) -> bool:
+        """Check that the Groq API is reachable and the key is accepted."""
+        try:
+            response = await self.http.get("/models", headers=self.headers, timeout=5.0)
+            return response.status_code == 200
+        except httpx.HTTPError:
+            return False
+    
+    def _build_chat_payload(self, messages: List[Dict[str, str]], 
+                            context: Optional[str] = None, stream: bool = False) -> Dict[str, Any]:
+        """Build the chat/completions payload."""
+        # Build system message with context
+        system_content = "You are a helpful automotive AI assistant."
+        if context:
+            system_content += f"\n\nContext: {context}"
+        
+        # Build messages for API
+        api_messages = [{"role": "system", "content": system_content}]
+        
+        # Add user messages (limit to last 10 for context window)
+        for msg in messages[-10:]:
+            api_messages.append({
+                "role": msg.get("role", "user"),
+                "content": msg.get("content", "")
+            })
+        
+        payload = {
+            "model": self.model,
+            "messages": api_messages,
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature,
+            "stream": stream
+        }
+        if stream:
+            # Ask for a final usage chunk so the rate limiter can be settled
+            payload["stream_options"] = {"include_usage": True}
+        return payload
+    
+    async def generate_chat_response(self, messages: List[Dict[str, str]], 
                                 context: Optional[str] = None) -> Dict[str, Any]:
         """
         Generate chat response using Groq.
@@ -108,30 +158,9 @@ class GroqClient:
             Dict with success status and response
         """
         try:
-            # Build system message with context
-            system_content = "You are a helpful automotive AI assistant."
-            if context:
-                system_content += f"\n\nContext: {context}"
-            
-            # Build messages for API
-            api_messages = [{"role": "system", "content": system_content}]
+            payload = self._build_chat_payload(messages, context)
             
-            # Add user messages (limit to last 10 for context window)
-            for msg in messages[-10:]:
-                api_messages.append({
-                    "role": msg.get("role", "user"),
-                    "content": msg.get("content", "")
-                })
-            
-            payload = {
-                "model": self.model,
-                "messages": api_messages,
-                "max_tokens": self.max_tokens,
-                "temperature": self.temperature,
-                "stream": False
-            }
-            
-            result = self._call_api("chat/completions", payload)
+            result = await self._call_api("chat/completions", payload)
             
             # Extract response
             choices = result.get("choices", [])
@@ -155,20 +184,76 @@ class GroqClient:
             return {
                 "success": False,
                 "error": str(e),
+                "exception": e,
                 "response": ""
             }
     
-    def generate_narrative(self, prompt: str, context: Optional[str] = None) -> Dict[str, Any]:
+    async def generate_chat_response_stream(self, messages: List[Dict[str, str]], 
+                                             context: Optional[str] = None) -> AsyncIterator[str]:
         """
-        Generate an automotive narrative.
+        Stream a chat response, yielding content deltas from Groq's SSE stream.
         
         Args:
-            prompt: The prompt for narrative generation
-            context: Optional context
+            messages: List of message dicts with 'role' and 'content'
+            context: Optional context to prepend
             
-        Returns:
-            Dict with success status and narrative
+        Yields:
+            Response text fragments as they arrive
         """
+        payload = self._build_chat_payload(messages, context, stream=True)
+        reserved = self._estimate_tokens(payload)
+        await self.limiter.acquire(reserved)
+        accepted = False
+        used = None
+        streamed = []
+        
+        try:
+            logger.info("Groq streaming API call: chat/completions")
+            
+            async with self.http.stream("POST", "/chat/completions", json=payload, headers=self.headers,
+                                        timeout=clipped_timeout(self.timeout)) as response:
+                self.limiter.update_from_headers(response.headers)
+                if response.status_code != 200:
+                    text = (await response.aread()).decode("utf-8", "replace")
+                    error = error_from_response("groq", response.status_code, text, response.headers)
+                    if error.retry_after:
+                        self.limiter.pause(error.retry_after)
+                    raise error
+                
+                accepted = True
+                async for line in response.aiter_lines():
+                    if not line or not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    chunk = json.loads(data)
+                    usage = chunk.get("usage") or chunk.get("x_groq", {}).get("usage")
+                    if usage:
+                        used = usage.get("total_tokens", used)
+                    choices = chunk.get("choices", [])
+                    if choices:
+                        token = choices[0].get("delta", {}).get("content")
+                        if token:
+                            streamed.append(token)
+                            yield token
+                            
+        except httpx.TimeoutException:
+            raise ProviderTimeoutError("groq", "Groq request timeout")
+        except httpx.RequestError as e:
+            raise ProviderConnectionError("groq", f"Groq request failed: {str(e)}")
+        finally:
+            # Settle like the non-streaming path: refund a rejected or unsent request,
+            # and estimate the usage of a stream that ended without reporting it
+            if not accepted:
+                used = 0
+            elif used is None:
+                prompt = "".join(m.get("content", "") for m in payload["messages"])
+                used = estimate_tokens(prompt) + estimate_tokens("".join(streamed))
+            self.limiter.settle(reserved, used)
+    
+    def _build_narrative_messages(self, prompt: str, context: Optional[str] = None) -> List[Dict[str, str]]:
+        """Build the messages for narrative generation."""
         # Build the full prompt for narrative
         full_prompt = f"""Generate a detailed automotive narrative or description based on the following:
         
@@ -179,11 +264,37 @@ Provide an engaging, descriptive narrative about the vehicle or concept."""
         if context:
             full_prompt += f"\n\nAdditional context: {context}"
         
-        messages = [{"role": "user", "content": full_prompt}]
+        return [{"role": "user", "content": full_prompt}]
+    
+    async def generate_narrative(self, prompt: str, context: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Generate an automotive narrative.
         
-        return self.generate_chat_response(messages, context=None)
+        Args:
+            prompt: The prompt for narrative generation
+            context: Optional context
+            
+        Returns:
+            Dict with success status and narrative
+        """
+        messages = self._build_narrative_messages(prompt, context)
+        return await self.generate_chat_response(messages, context=None)
+    
+    def generate_narrative_stream(self, prompt: str, context: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Stream an automotive narrative.
+        
+        Args:
+            prompt: The prompt for narrative generation
+            context: Optional context
+            
+        Yields:
+            Narrative text fragments as they arrive
+        """
+        messages = self._build_narrative_messages(prompt, context)
+        return self.generate_chat_response_stream(messages, context=None)
     
-    def enhance_prompt(self, prompt: str) -> Dict[str, Any]:
+    async def enhance_prompt(self, prompt: str) -> Dict[str, Any]:
         """
         Enhance a prompt for better image generation.
         
@@ -207,7 +318,7 @@ Provide an enhanced version that includes:
 Enhanced prompt:"""
         
         messages = [{"role": "user", "content": enhancement_prompt}]
-        result = self.generate_chat_response(messages)
+        result = await self.generate_chat_response(messages)
         
         if result.get("success"):
             return {
@@ -218,6 +329,7 @@ Enhanced prompt:"""
             return {
                 "success": False,
                 "error": result.get("error"),
+                "exception": result.get("exception"),
                 "enhanced_prompt": prompt
             }
 
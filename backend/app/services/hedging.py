@@ -0,0 +1,87 @@
+"""
+Hedged request policy for text providers.
+
+A hedged call sends the request to the primary provider and, if it has not
+answered within a delay taken from that provider's recent latency
+percentile, sends the same request to the next provider as well. The first
+success wins and the other call is cancelled. This module tracks the latency
+samples that set the delay and the counters used to tune it.
+"""
+
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Tuple
+
+
+class Hedger:
+    """Percentile-based hedge delays and hedge/win counters per method."""
+
+    def __init__(self, percentile: float = 0.95, min_delay: float = 0.25,
+                 default_delay: float = 2.0, window: int = 200, min_samples: int = 10):
+        """
+        Args:
+            percentile: Latency percentile (0-1) of the primary after which to hedge
+            min_delay: Lower bound on the hedge delay in seconds
+            default_delay: Delay used until a provider has min_samples latencies
+            window: Recent latencies kept per provider and method
+            min_samples: Samples needed before the percentile is trusted
+        """
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.default_delay = default_delay
+        self.window = window
+        self.min_samples = min_samples
+
+        self._lock = threading.Lock()
+        self._latencies: Dict[Tuple[str, str], Deque[float]] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def record_latency(self, provider: str, method: str, latency: float):
+        """Add a successful call's latency to the provider's window."""
+        with self._lock:
+            samples = self._latencies.get((provider, method))
+            if samples is None:
+                samples = self._latencies[(provider, method)] = deque(maxlen=self.window)
+            samples.append(latency)
+
+    def delay(self, provider: str, method: str) -> float:
+        """Seconds to wait for the provider before hedging."""
+        with self._lock:
+            samples = self._latencies.get((provider, method))
+            if not samples or len(samples) < self.min_samples:
+                return self.default_delay
+            ordered = sorted(samples)
+        index = min(int(self.percentile * len(ordered)), len(ordered) - 1)
+        return max(ordered[index], self.min_delay)
+
+    def _count(self, method: str, field: str):
+        with self._lock:
+            stats = self._stats.setdefault(method, {"calls": 0, "hedged": 0, "hedge_wins": 0})
+            stats[field] += 1
+
+    def note_call(self, method: str):
+        self._count(method, "calls")
+
+    def note_hedge(self, method: str):
+        self._count(method, "hedged")
+
+    def note_hedge_win(self, method: str):
+        self._count(method, "hedge_wins")
+
+    def stats(self) -> Dict[str, Any]:
+        """Hedge rate and hedge win rate per method, plus current delays."""
+        with self._lock:
+            methods = {}
+            for method, counts in self._stats.items():
+                calls, hedged = counts["calls"], counts["hedged"]
+                methods[method] = {
+                    **counts,
+                    "hedge_rate": round(hedged / calls, 3) if calls else 0.0,
+                    "hedge_win_rate": round(counts["hedge_wins"] / hedged, 3) if hedged else 0.0
+                }
+            keys = list(self._latencies)
+        return {
+            "percentile": self.percentile,
+            "methods": methods,
+            "delays": {f"{p}:{m}": round(self.delay(p, m), 4) for p, m in keys}
+        }
@@ -0,0 +1,103 @@
+"""
+Shared async HTTP transport for upstream providers.
+
+One pooled httpx.AsyncClient is kept per provider so connections (and TLS
+sessions) are reused across requests instead of opened per call.
+"""
+
+import logging
+from typing import Dict, Optional
+
+import httpx
+
+from app.services import deadline
+
+logger = logging.getLogger(__name__)
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def http2_available() -> bool:
+    """Whether the optional h2 dependency for HTTP/2 is installed."""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def create_http_client(
+    base_url: str = "",
+    timeout: float = 60.0,
+    max_connections: int = 20,
+    max_keepalive: int = 10,
+    headers: Optional[Dict[str, str]] = None,
+    http2: bool = False
+) -> httpx.AsyncClient:
+    """
+    Create a pooled async client.
+
+    Args:
+        base_url: Base URL for relative request paths
+        timeout: Default read/write timeout in seconds
+        max_connections: Pool size
+        max_keepalive: Idle keep-alive connections to retain
+        headers: Default headers sent with every request
+        http2: Negotiate HTTP/2 if the optional h2 package is installed
+
+    Returns:
+        New httpx.AsyncClient; the caller owns its lifecycle
+    """
+    if http2 and not http2_available():
+        logger.warning("HTTP/2 requested but h2 is not installed; using HTTP/1.1")
+        http2 = False
+    return httpx.AsyncClient(
+        http2=http2,
+        base_url=base_url,
+        timeout=httpx.Timeout(timeout, connect=10.0),
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive
+        ),
+        headers=headers
+    )
+
+
+def clipped_timeout(timeout: float) -> httpx.Timeout:
+    """
+    Per-request timeout clipped to the current request deadline.
+    
+    Raises:
+        DeadlineExceeded: If no time is left
+    """
+    timeout = deadline.clip_timeout(timeout)
+    return httpx.Timeout(timeout, connect=min(10.0, timeout))
+
+
+def get_http_client(provider: str, **kwargs) -> httpx.AsyncClient:
+    """
+    Get (or create) the shared pooled client for a provider.
+
+    Args:
+        provider: Provider key, e.g. "groq", "ollama"
+        **kwargs: Options for create_http_client when the client is first built
+
+    Returns:
+        Shared httpx.AsyncClient
+    """
+    client = _clients.get(provider)
+    if client is None or client.is_closed:
+        client = create_http_client(**kwargs)
+        _clients[provider] = client
+        logger.info(f"Created pooled HTTP client for {provider}")
+    return client
+
+
+async def close_http_clients():
+    """Close every shared provider client (call on app shutdown)."""
+    for provider, client in list(_clients.items()):
+        try:
+            await client.aclose()
+        except Exception as e:
+            logger.warning(f"Error closing HTTP client for {provider}: {e}")
+    _clients.clear()
@@ -0,0 +1,115 @@
+"""
+Deterministic image result cache for Stability AI generations.
+
+Entries are keyed on the normalized request payload (prompt, size, steps,
+cfg_scale, style preset, seed) and map to the filename of the image in the
+content-addressed ImageStore, so image bytes are only ever stored once.
+The index lives in SQLite and is bounded by entry count; the least recently
+used entries are evicted first. Evicting an entry never deletes the image,
+which history records may still reference.
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ImageCache:
+    """Persistent LRU map from generation parameters to stored image filenames."""
+
+    def __init__(self, db_path: str = "./image_cache.db", max_entries: int = 10000):
+        self.db_path = db_path
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS image_cache ("
+            "key TEXT PRIMARY KEY, filename TEXT NOT NULL, used_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS image_cache_used ON image_cache (used_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def cacheable(payload: Dict[str, Any]) -> bool:
+        """Only requests with an explicit seed are deterministic; others must stay random."""
+        return payload.get("seed") is not None
+
+    @staticmethod
+    def make_key(payload: Dict[str, Any]) -> str:
+        """
+        Build a cache key from a Stability request payload.
+        Prompt whitespace is collapsed so trivially different prompts share an entry.
+        """
+        normalized = dict(payload)
+        normalized["text_prompts"] = [
+            {"text": " ".join(str(p.get("text", "")).split()), "weight": p.get("weight", 1.0)}
+            for p in payload.get("text_prompts", [])
+        ]
+        normalized.setdefault("seed", None)
+        encoded = json.dumps(normalized, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached image filename and mark the entry as recently used."""
+        with self._lock:
+            row = self._conn.execute("SELECT filename FROM image_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE image_cache SET used_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, filename: str):
+        """Remember the stored image for a key, evicting least recently used entries."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO image_cache (key, filename, used_at) VALUES (?, ?, ?)",
+                (key, filename, time.time())
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM image_cache").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM image_cache WHERE key IN "
+                    "(SELECT key FROM image_cache ORDER BY used_at LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+                self.evictions += count - self.max_entries
+            self._conn.commit()
+
+    def discard(self, key: str):
+        """Drop an entry whose image is gone from the store."""
+        with self._lock:
+            self._conn.execute("DELETE FROM image_cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": self._conn.execute("SELECT COUNT(*) FROM image_cache").fetchone()[0],
+                "max_entries": self.max_entries
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
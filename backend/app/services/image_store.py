@@ -0,0 +1,80 @@
+"""
+Content-addressed on-disk image store.
+
+Images are written once under their SHA-256 digest, so identical images are
+stored a single time and history records only need to keep a short URL.
+"""
+
+import base64
+import hashlib
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+DATA_URL_PATTERN = re.compile(r"^data:image/(?P<ext>[a-z0-9+]+);base64,(?P<data>.+)$", re.DOTALL)
+
+
+class ImageStore:
+    """Hash-named, deduplicated blob directory for generated images."""
+
+    def __init__(self, root: str = "./generated_images", url_prefix: str = "/api/images"):
+        self.root = Path(root)
+        self.url_prefix = url_prefix.rstrip("/")
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, filename: str) -> Path:
+        """Absolute path of a stored blob."""
+        return self.root / filename
+
+    def url_for(self, filename: str) -> str:
+        """Public URL of a stored blob."""
+        return f"{self.url_prefix}/{filename}"
+
+    def save_bytes(self, data: bytes, ext: str = "png") -> str:
+        """
+        Store image bytes under their content hash.
+
+        Args:
+            data: Raw image bytes
+            ext: File extension
+
+        Returns:
+            Filename of the stored blob
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        filename = f"{digest}.{ext}"
+        path = self.path_for(filename)
+
+        if path.exists():
+            logger.info(f"Image already stored: {filename}")
+            return filename
+
+        # Write to a temp file and rename so readers never see partial images
+        tmp_path = path.with_suffix(f".{ext}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        logger.info(f"Stored image {filename} ({len(data)} bytes)")
+        return filename
+
+    def save_base64(self, img_b64: str, ext: str = "png") -> str:
+        """Decode base64 image data and store it."""
+        return self.save_bytes(base64.b64decode(img_b64), ext=ext)
+
+    def save_data_url(self, data_url: str) -> Optional[str]:
+        """
+        Store a data:image/...;base64 URL.
+
+        Returns:
+            Filename of the stored blob, or None if the string is not a data URL
+        """
+        match = DATA_URL_PATTERN.match(data_url or "")
+        if not match:
+            return None
+        ext = match.group("ext").replace("jpeg", "jpg")
+        return self.save_base64(match.group("data"), ext=ext)
@@ -0,0 +1,330 @@
+"""
+Persistent background job queue for slow generations.
+
+Submitting a job returns its id at once; a bounded pool of worker tasks
+runs jobs in priority order (higher first, FIFO within a priority). Job
+state lives in SQLite, so queued jobs survive a restart and jobs that were
+running when the process stopped are queued again. Finished jobs are kept
+for a retention period and pruned on start. Subscribers receive each status
+change as it happens.
+"""
+
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.services import deadline
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+TERMINAL_STATES = (SUCCEEDED, FAILED)
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+class QueueFull(Exception):
+    """Too many jobs are already waiting."""
+
+
+class JobQueue:
+    """Priority job queue with a worker pool and SQLite-backed job state."""
+
+    def __init__(self, db_path: str = "./jobs.db", workers: int = 2,
+                 max_pending: int = 100, job_timeout: Optional[float] = 600.0,
+                 retention: float = 7 * 86400.0):
+        """
+        Args:
+            db_path: SQLite file holding job state
+            workers: Jobs processed concurrently
+            max_pending: Queued jobs allowed before submit() raises QueueFull
+            job_timeout: Deadline in seconds for each job (None: no deadline)
+            retention: Seconds a finished job is kept before start() deletes it (0: forever)
+        """
+        self.db_path = db_path
+        self.workers = workers
+        self.max_pending = max_pending
+        self.job_timeout = job_timeout
+        self.retention = retention
+
+        self.handlers: Dict[str, JobHandler] = {}
+        # Heap of (-priority, seq, id) keys; entries no longer in _waiting are skipped on pop
+        self._order: List[Tuple[int, int, str]] = []
+        self._waiting: Dict[str, Tuple[int, int, str]] = {}
+        # One permit per waiting job; None until start()
+        self._available: Optional[asyncio.Semaphore] = None
+        # Submits between the max_pending check and the enqueue
+        self._reserved = 0
+        self._seq = itertools.count()
+        self._tasks: List[asyncio.Task] = []
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._lock = threading.Lock()
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, "
+            "priority INTEGER NOT NULL, payload TEXT NOT NULL, result TEXT, error TEXT, "
+            "created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_finished_at ON jobs (finished_at)")
+        self._conn.commit()
+
+    def register(self, kind: str, handler: JobHandler):
+        """Register the coroutine that runs jobs of a kind; it returns the job result."""
+        self.handlers[kind] = handler
+
+    # Persistence
+
+    def _row_to_job(self, row) -> Dict[str, Any]:
+        return {
+            "id": row[0],
+            "kind": row[1],
+            "status": row[2],
+            "priority": row[3],
+            "payload": json.loads(row[4]),
+            "result": json.loads(row[5]) if row[5] else None,
+            "error": row[6],
+            "created_at": row[7],
+            "started_at": row[8],
+            "finished_at": row[9]
+        }
+
+    def _load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, kind, status, priority, payload, result, error, "
+                "created_at, started_at, finished_at FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def _insert(self, job: Dict[str, Any]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, status, priority, payload, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (job["id"], job["kind"], job["status"], job["priority"],
+                 json.dumps(job["payload"]), job["created_at"])
+            )
+            self._conn.commit()
+
+    def _update(self, job_id: str, **fields):
+        if "result" in fields and fields["result"] is not None:
+            fields["result"] = json.dumps(fields["result"])
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?",
+                               (*fields.values(), job_id))
+            self._conn.commit()
+
+    def _pending(self) -> List[tuple]:
+        """Queued jobs plus jobs interrupted mid-run, for recovery on start."""
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET status = ?, started_at = NULL WHERE status = ?",
+                               (QUEUED, RUNNING))
+            self._conn.commit()
+            return self._conn.execute(
+                "SELECT id, priority FROM jobs WHERE status = ? ORDER BY created_at", (QUEUED,)
+            ).fetchall()
+
+    def _prune(self, finished_before: float) -> int:
+        """Delete finished jobs older than a timestamp; returns how many went."""
+        placeholders = ", ".join("?" for _ in TERMINAL_STATES)
+        with self._lock:
+            deleted = self._conn.execute(
+                f"DELETE FROM jobs WHERE status IN ({placeholders}) AND finished_at < ?",
+                (*TERMINAL_STATES, finished_before)
+            ).rowcount
+            self._conn.commit()
+        return deleted
+
+    # Lifecycle
+
+    def _enqueue(self, job_id: str, priority: int):
+        key = (-priority, next(self._seq), job_id)
+        heapq.heappush(self._order, key)
+        self._waiting[job_id] = key
+        self._available.release()
+
+    async def _dequeue(self) -> str:
+        """Wait for and remove the highest-priority waiting job."""
+        await self._available.acquire()
+        while True:
+            key = heapq.heappop(self._order)
+            job_id = key[2]
+            if self._waiting.get(job_id) == key:
+                del self._waiting[job_id]
+                return job_id
+
+    async def start(self):
+        """Requeue persisted jobs and start the workers."""
+        self._order = []
+        self._waiting = {}
+        self._available = asyncio.Semaphore(0)
+        if self.retention > 0:
+            pruned = await run_in_threadpool(self._prune, time.time() - self.retention)
+            if pruned:
+                logger.info(f"Pruned {pruned} finished jobs")
+        pending = await run_in_threadpool(self._pending)
+        for job_id, priority in pending:
+            self._enqueue(job_id, priority)
+        if pending:
+            logger.info(f"Recovered {len(pending)} queued jobs")
+        self._tasks = [asyncio.ensure_future(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"Job queue started with {self.workers} workers")
+
+    async def stop(self):
+        """Stop the workers; interrupted jobs are requeued on the next start."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        with self._lock:
+            self._conn.close()
+
+    # Jobs
+
+    async def submit(self, kind: str, payload: Dict[str, Any], priority: int = 0) -> Dict[str, Any]:
+        """
+        Persist and enqueue a job.
+
+        Args:
+            kind: Registered job kind, e.g. "image"
+            payload: JSON-serializable handler input
+            priority: Higher runs first
+
+        Returns:
+            The new job
+
+        Raises:
+            QueueFull: If max_pending jobs are already waiting
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        if self._available is None:
+            raise RuntimeError("Job queue is not started")
+        waiting = len(self._waiting) + self._reserved
+        if waiting >= self.max_pending:
+            raise QueueFull(f"{waiting} jobs already queued")
+
+        job = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "status": QUEUED,
+            "priority": priority,
+            "payload": payload,
+            "result": None,
+            "error": None,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None
+        }
+        self._reserved += 1
+        try:
+            await run_in_threadpool(self._insert, job)
+        finally:
+            self._reserved -= 1
+        self._enqueue(job["id"], priority)
+        logger.info(f"Queued {kind} job {job['id']} (priority {priority})")
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await run_in_threadpool(self._load, job_id)
+
+    def position(self, job_id: str) -> Optional[int]:
+        """Jobs ahead of a queued job (0 = next), or None if it is not queued."""
+        key = self._waiting.get(job_id)
+        if key is None:
+            return None
+        return sum(1 for other in self._waiting.values() if other < key)
+
+    async def subscribe(self, job_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield the job now and after every status change, ending at a terminal state.
+        """
+        updates: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, set()).add(updates)
+        try:
+            job = await self.get(job_id)
+            if job is None:
+                return
+            yield job
+            while job["status"] not in TERMINAL_STATES:
+                job = await updates.get()
+                yield job
+        finally:
+            subscribers = self._subscribers.get(job_id)
+            if subscribers is not None:
+                subscribers.discard(updates)
+                if not subscribers:
+                    self._subscribers.pop(job_id, None)
+
+    async def _publish(self, job_id: str):
+        subscribers = self._subscribers.get(job_id)
+        if not subscribers:
+            return
+        job = await self.get(job_id)
+        for updates in subscribers:
+            updates.put_nowait(job)
+
+    async def _worker(self, index: int):
+        while True:
+            job_id = await self._dequeue()
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job worker {index} error on {job_id}: {e}")
+
+    async def _run(self, job_id: str):
+        job = await self.get(job_id)
+        if job is None or job["status"] != QUEUED:
+            return
+
+        await run_in_threadpool(self._update, job_id, status=RUNNING, started_at=time.time())
+        await self._publish(job_id)
+        logger.info(f"Running {job['kind']} job {job_id}")
+
+        token = deadline.set_deadline(self.job_timeout)
+        try:
+            result = await deadline.run(self.handlers[job["kind"]](job["payload"]))
+            fields = {"status": SUCCEEDED, "result": result}
+        except asyncio.CancelledError:
+            # Shutting down: leave the job running so it is requeued on start
+            raise
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            fields = {"status": FAILED, "error": str(e)}
+        finally:
+            deadline.reset_deadline(token)
+
+        await run_in_threadpool(self._update, job_id, finished_at=time.time(), **fields)
+        await self._publish(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._conn.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall())
+        return {
+            "workers": self.workers,
+            "queued_in_memory": len(self._waiting),
+            "max_pending": self.max_pending,
+            "by_status": counts
+        }
@@ -5,11 +5,17 @@ This module provides a local LLM interface using Ollama server.
 """
 
 import logging
-import requests
 import json
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, AsyncIterator
+
+import httpx
 
 from app.config import settings
+from app.services.errors import (
+    ProviderConnectionError, ProviderError, ProviderTimeoutError, error_from_response
+)
+from app.services.http_transport import clipped_timeout, get_http_client
+from app.services.rate_limiter import get_rate_limiter
 
 # Configure logging
 logging.basicConfig(
@@ -40,6 +46,8 @@ class OllamaClient:
         self.temperature = settings.temperature
         self.top_p = settings.top_p
         self.timeout = 120
+        self.http = get_http_client("ollama", base_url=self.base_url, timeout=self.timeout)
+        self.limiter = get_rate_limiter("ollama")
         
         logger.info(f"Ollama client initialized")
         logger.info(f"Ollama base URL: {self.base_url}")
@@ -51,60 +59,114 @@ class OllamaClient:
             "Content-Type": "application/json"
         }
     
-    def _make_request(self, payload: Dict[str, Any]) -> str:
+    async def _make_request(self, payload: Dict[str, Any]) -> str:
         """
         Make a request to the Ollama API.
         """
-        url = f"{self.base_url}/api/generate"
-        
+        await self.limiter.acquire()
+        timeout = clipped_timeout(self.timeout)
         try:
             logger.info(f"Making request to Ollama: {self.model}")
             
-            response = requests.post(
-                url,
+            response = await self.http.post(
+                "/api/generate",
                 headers=self._get_headers(),
                 json=payload,
-                timeout=self.timeout
+                timeout=timeout
             )
             
             if response.status_code == 200:
                 result = response.json()
                 return result.get("response", "")
             else:
-                error_msg = f"Ollama API error: {response.status_code} - {response.text}"
-                logger.error(error_msg)
-                raise Exception(error_msg)
+                error = error_from_response("ollama", response.status_code, response.text, response.headers)
+                logger.error(str(error))
+                raise error
                 
-        except requests.exceptions.ConnectionError:
-            raise Exception(f"Cannot connect to Ollama at {self.base_url}. Is Ollama running?")
-        except requests.exceptions.Timeout:
-            raise Exception("Ollama request timeout")
+        except httpx.ConnectError:
+            raise ProviderConnectionError("ollama", f"Cannot connect to Ollama at {self.base_url}. Is Ollama running?")
+        except httpx.TimeoutException:
+            raise ProviderTimeoutError("ollama", "Ollama request timeout")
+        except httpx.RequestError as e:
+            raise ProviderConnectionError("ollama", f"Ollama request failed: {str(e)}")
+        except ProviderError:
+            raise
         except Exception as e:
-            raise Exception(f"Ollama error: {str(e)}")
+            raise ProviderError("ollama", f"Ollama error: {str(e)}")
     
-    def generate(self, prompt: str) -> str:
-        """
-        Generate text from prompt.
-        """
-        payload = {
+    async def health_check(self) -> bool:
+        """Check that the Ollama server is reachable."""
+        try:
+            response = await self.http.get("/api/tags", timeout=2.0)
+            return response.status_code == 200
+        except httpx.HTTPError:
+            return False
+    
+    def _build_payload(self, prompt: str, stream: bool) -> Dict[str, Any]:
+        """Build the /api/generate payload."""
+        return {
             "model": self.model,
             "prompt": prompt,
-            "stream": False,
+            "stream": stream,
             "options": {
                 "num_predict": min(self.max_tokens, 512),
                 "temperature": self.temperature,
                 "top_p": self.top_p,
             }
         }
-        
-        return self._make_request(payload)
     
-    def chat(self, messages: List[Dict[str, str]], context: str = None) -> str:
+    async def generate(self, prompt: str) -> str:
         """
-        Generate a chat response.
+        Generate text from prompt.
         """
-        logger.info(f"Generating chat response ({len(messages)} messages)")
+        return await self._make_request(self._build_payload(prompt, stream=False))
+    
+    async def generate_stream(self, prompt: str) -> AsyncIterator[str]:
+        """
+        Generate text from prompt, yielding tokens as Ollama streams them (NDJSON).
+        Closing the iterator closes the connection, which stops generation upstream.
+        """
+        payload = self._build_payload(prompt, stream=True)
+        await self.limiter.acquire()
+        timeout = clipped_timeout(self.timeout)
         
+        try:
+            logger.info(f"Making streaming request to Ollama: {self.model}")
+            
+            async with self.http.stream(
+                "POST",
+                "/api/generate",
+                headers=self._get_headers(),
+                json=payload,
+                timeout=timeout
+            ) as response:
+                if response.status_code != 200:
+                    text = (await response.aread()).decode("utf-8", "replace")
+                    error = error_from_response("ollama", response.status_code, text, response.headers)
+                    logger.error(str(error))
+                    raise error
+                
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise ProviderError("ollama", chunk["error"])
+                    token = chunk.get("response", "")
+                    if token:
+                        yield token
+                    if chunk.get("done"):
+                        break
+                        
+        except httpx.ConnectError:
+            raise ProviderConnectionError("ollama", f"Cannot connect to Ollama at {self.base_url}. Is Ollama running?")
+        except httpx.TimeoutException:
+            raise ProviderTimeoutError("ollama", "Ollama request timeout")
+        except httpx.RequestError as e:
+            raise ProviderConnectionError("ollama", f"Ollama request failed: {str(e)}")
+    
+    def _build_chat_prompt(self, messages: List[Dict[str, str]], context: str = None) -> str:
+        """Flatten chat messages into a single prompt."""
         # Build conversation context
         conversation = "You are a helpful automotive expert assistant.\n\n"
         if context:
@@ -116,15 +178,24 @@ class OllamaClient:
             conversation += f"{role.capitalize()}: {content}\n"
         
         conversation += "Assistant:"
-        
-        return self.generate(conversation)
+        return conversation
     
-    def generate_narrative(self, prompt: str, context: str = None) -> str:
+    async def chat(self, messages: List[Dict[str, str]], context: str = None) -> str:
         """
-        Generate an automotive narrative.
+        Generate a chat response.
         """
-        logger.info(f"Generating narrative with prompt: {prompt[:50]}...")
-        
+        logger.info(f"Generating chat response ({len(messages)} messages)")
+        return await self.generate(self._build_chat_prompt(messages, context))
+    
+    def chat_stream(self, messages: List[Dict[str, str]], context: str = None) -> AsyncIterator[str]:
+        """
+        Stream a chat response token by token.
+        """
+        logger.info(f"Streaming chat response ({len(messages)} messages)")
+        return self.generate_stream(self._build_chat_prompt(messages, context))
+    
+    def _build_narrative_prompt(self, prompt: str, context: str = None) -> str:
+        """Build the narrative generation prompt."""
         system_prompt = """You are an expert automotive designer and storyteller. 
 Create vivid, detailed descriptions of futuristic vehicle concepts. 
 Focus on innovative design elements, cutting-edge technology, and sustainable materials.
@@ -134,10 +205,23 @@ Make descriptions inspiring and technically accurate."""
             full_prompt = f"{system_prompt}\n\nContext: {context}\n\nPrompt: {prompt}"
         else:
             full_prompt = f"{system_prompt}\n\nPrompt: {prompt}"
-        
-        return self.generate(full_prompt)
+        return full_prompt
+    
+    async def generate_narrative(self, prompt: str, context: str = None) -> str:
+        """
+        Generate an automotive narrative.
+        """
+        logger.info(f"Generating narrative with prompt: {prompt[:50]}...")
+        return await self.generate(self._build_narrative_prompt(prompt, context))
+    
+    def generate_narrative_stream(self, prompt: str, context: str = None) -> AsyncIterator[str]:
+        """
+        Stream an automotive narrative token by token.
+        """
+        logger.info(f"Streaming narrative with prompt: {prompt[:50]}...")
+        return self.generate_stream(self._build_narrative_prompt(prompt, context))
     
-    def enhance_prompt(self, prompt: str) -> str:
+    async def enhance_prompt(self, prompt: str) -> str:
         """
         Enhance a prompt for better image generation.
         """
@@ -152,7 +236,7 @@ Original prompt: {prompt}
 
 Enhanced prompt:"""
 
-        enhanced = self.generate(enhancement_prompt)
+        enhanced = await self.generate(enhancement_prompt)
         return enhanced.strip()
 
 
@@ -1,16 +1,34 @@
-from openai import OpenAI
+import openai
+from openai import AsyncOpenAI
 from typing import Optional, Dict, Any, List
 import logging
 
+from app.services import deadline
+from app.services.errors import (
+    ProviderConnectionError, ProviderError, ProviderTimeoutError, error_from_response
+)
+
 logger = logging.getLogger(__name__)
 
+
+def _provider_error(e: Exception) -> ProviderError:
+    """Map an OpenAI SDK exception onto the typed provider errors."""
+    if isinstance(e, openai.APITimeoutError):
+        return ProviderTimeoutError("openai", f"OpenAI request timeout: {e}")
+    if isinstance(e, openai.APIConnectionError):
+        return ProviderConnectionError("openai", f"OpenAI request failed: {e}")
+    if isinstance(e, openai.APIStatusError):
+        return error_from_response("openai", e.status_code, e.response.text, e.response.headers)
+    return ProviderError("openai", str(e))
+
 class OpenAIClient:
     """Client for interacting with OpenAI API for text generation."""
     
-    def __init__(self, api_key: str):
-        self.client = OpenAI(api_key=api_key)
+    def __init__(self, api_key: str, timeout: float = 60.0):
+        self.client = AsyncOpenAI(api_key=api_key)
+        self.timeout = timeout
     
-    def generate_narrative(self, prompt: str, context: Optional[str] = None) -> Dict[str, Any]:
+    async def generate_narrative(self, prompt: str, context: Optional[str] = None) -> Dict[str, Any]:
         """
         Generate an automotive description/narrative based on the prompt.
         
@@ -30,15 +48,17 @@ and marketing materials."""
         if context:
             system_prompt += f"\n\nPrevious context: {context}"
         
+        timeout = deadline.clip_timeout(self.timeout)
         try:
-            response = self.client.chat.completions.create(
+            response = await self.client.chat.completions.create(
                 model="gpt-3.5-turbo",
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.8,
-                max_tokens=1000
+                max_tokens=1000,
+                timeout=timeout
             )
             
             return {
@@ -55,10 +75,11 @@ and marketing materials."""
             return {
                 "success": False,
                 "error": str(e),
+                "exception": _provider_error(e),
                 "narrative": None
             }
     
-    def generate_chat_response(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+    async def generate_chat_response(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
         """
         Generate a chat response for automotive-related queries.
         
@@ -72,14 +93,16 @@ and marketing materials."""
 Provide helpful, informative responses about car design, automotive history, 
 emerging technologies, and concept vehicles."""
         
+        timeout = deadline.clip_timeout(self.timeout)
         try:
             all_messages = [{"role": "system", "content": system_prompt}] + messages
             
-            response = self.client.chat.completions.create(
+            response = await self.client.chat.completions.create(
                 model="gpt-3.5-turbo",
                 messages=all_messages,
                 temperature=0.7,
-                max_tokens=500
+                max_tokens=500,
+                timeout=timeout
             )
             
             return {
@@ -96,10 +119,11 @@ emerging technologies, and concept vehicles."""
             return {
                 "success": False,
                 "error": str(e),
+                "exception": _provider_error(e),
                 "response": None
             }
     
-    def enhance_prompt(self, user_prompt: str) -> Dict[str, Any]:
+    async def enhance_prompt(self, user_prompt: str) -> Dict[str, Any]:
         """
         Enhance a user prompt for better image generation results.
         
@@ -114,15 +138,17 @@ Your task is to enhance user prompts for DALL-E image generation, especially for
 automotive concepts. Add detailed visual descriptions, lighting, perspective,
 and style elements. Keep the prompt concise but descriptive."""
         
+        timeout = deadline.clip_timeout(self.timeout)
         try:
-            response = self.client.chat.completions.create(
+            response = await self.client.chat.completions.create(
                 model="gpt-3.5-turbo",
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": f"Enhance this prompt for image generation: {user_prompt}"}
                 ],
                 temperature=0.7,
-                max_tokens=200
+                max_tokens=200,
+                timeout=timeout
             )
             
             return {
@@ -134,5 +160,6 @@ and style elements. Keep the prompt concise but descriptive."""
             return {
                 "success": False,
                 "error": str(e),
+                "exception": _provider_error(e),
                 "enhanced_prompt": user_prompt
             }
@@ -0,0 +1,106 @@
+"""
+Minimal async dependency-graph runner for multi-stage generations.
+
+Stages start as soon as their dependencies finish, so independent branches
+(e.g. narrative vs. enhance -> image) run concurrently. A failed stage does
+not abort its siblings; stages that depend on it are skipped. A stage that
+runs out of request deadline (or is cancelled) aborts the whole pipeline
+instead, since nothing after it can finish in time either.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from app.services.deadline import DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+
+class Stage:
+    """A named unit of work with optional dependencies on other stages."""
+
+    def __init__(self, name: str, func: Callable[[Dict[str, Any]], Awaitable[Any]],
+                 depends_on: Sequence[str] = ()):
+        """
+        Args:
+            name: Unique stage name
+            func: Async callable receiving the results of its dependencies by name
+            depends_on: Names of stages that must succeed first
+        """
+        self.name = name
+        self.func = func
+        self.depends_on = list(depends_on)
+
+
+class PipelineResult:
+    """Results, errors and wall-clock timings (ms) per stage."""
+
+    def __init__(self):
+        self.results: Dict[str, Any] = {}
+        self.errors: Dict[str, str] = {}
+        self.timings: Dict[str, float] = {}
+
+    def ok(self, name: str) -> bool:
+        return name in self.results
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return self.results.get(name, default)
+
+
+async def run_pipeline(stages: List[Stage]) -> PipelineResult:
+    """
+    Run stages as a dependency graph.
+
+    Args:
+        stages: Stages to run; dependencies must refer to stages in the list
+
+    Returns:
+        PipelineResult with per-stage results, errors and timings
+    """
+    by_name = {stage.name: stage for stage in stages}
+    for stage in stages:
+        missing = [dep for dep in stage.depends_on if dep not in by_name]
+        if missing:
+            raise ValueError(f"Stage {stage.name} depends on unknown stages: {missing}")
+
+    result = PipelineResult()
+    tasks: Dict[str, asyncio.Task] = {}
+    started = time.perf_counter()
+
+    async def run_stage(stage: Stage):
+        # Wait for dependencies; their failures are recorded, not raised
+        if stage.depends_on:
+            await asyncio.gather(*(tasks[dep] for dep in stage.depends_on))
+        failed = [dep for dep in stage.depends_on if not result.ok(dep)]
+        if failed:
+            result.errors[stage.name] = f"Skipped: {', '.join(failed)} failed"
+            return
+
+        stage_start = time.perf_counter()
+        try:
+            inputs = {dep: result.results[dep] for dep in stage.depends_on}
+            result.results[stage.name] = await stage.func(inputs)
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Stage {stage.name} failed: {str(e)}")
+            result.errors[stage.name] = str(e)
+        finally:
+            result.timings[stage.name] = round((time.perf_counter() - stage_start) * 1000, 1)
+
+    for stage in stages:
+        tasks[stage.name] = asyncio.ensure_future(run_stage(stage))
+
+    try:
+        await asyncio.gather(*tasks.values())
+    except BaseException:
+        # DeadlineExceeded or cancellation: stop the stages still running
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        raise
+    result.timings["total"] = round((time.perf_counter() - started) * 1000, 1)
+    logger.info(f"Pipeline timings (ms): {result.timings}")
+    return result
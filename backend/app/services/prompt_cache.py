@@ -0,0 +1,125 @@
+"""
+Two-level cache for prompt enhancement results.
+
+Level 1 is an in-process LRU bounded by entry count; level 2 is a SQLite
+file that survives restarts. Both levels honour the same TTL.
+"""
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class PromptCache:
+    """In-memory LRU in front of a persistent SQLite store, with TTL."""
+
+    def __init__(self, db_path: str = "./prompt_cache.db", ttl_seconds: float = 86400,
+                 max_entries: int = 1024):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS prompt_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(prompt: str) -> str:
+        """
+        Key on the normalized prompt only. Which provider answers is decided by
+        routing and fallback after the lookup, and any provider's enhancement is
+        an acceptable answer, so the provider is deliberately not part of the key.
+        """
+        normalized = " ".join((prompt or "").lower().split())
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    def _expired(self, created_at: float) -> bool:
+        return time.time() - created_at > self.ttl_seconds
+
+    def get_memory(self, key: str) -> Optional[str]:
+        """Look up the in-process level only (cheap, safe on the event loop)."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            value, created_at = entry
+            if self._expired(created_at):
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            return value
+
+    def get_disk(self, key: str) -> Optional[str]:
+        """Look up the persistent level, promoting hits into memory."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM prompt_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or self._expired(row[1]):
+                if row is not None:
+                    self._conn.execute("DELETE FROM prompt_cache WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, row[0], row[1])
+            return row[0]
+
+    def get(self, key: str) -> Optional[str]:
+        """Look up both levels."""
+        value = self.get_memory(key)
+        return value if value is not None else self.get_disk(key)
+
+    def _remember(self, key: str, value: str, created_at: float):
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def put(self, key: str, value: str):
+        """Store a value in both levels."""
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, value, created_at)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO prompt_cache (key, value, created_at) VALUES (?, ?, ?)",
+                (key, value, created_at)
+            )
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters per level."""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            hits = self.memory_hits + self.disk_hits
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,140 @@
+"""
+Latency-aware adaptive routing across text providers.
+
+Each (provider, method) pair keeps an exponentially weighted moving average
+of latency and error rate. Providers are ordered by expected time per
+successful call (latency / success rate); the preferred provider gets a
+multiplicative bias instead of a fixed first slot, and a small fraction of
+calls is sent to a non-best provider so stale estimates get refreshed.
+"""
+
+import logging
+import random
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class _ProviderStats:
+    def __init__(self):
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.samples = 0
+
+
+class ProviderRouter:
+    """Orders candidate providers per method by EWMA latency and error rate."""
+
+    # Floor on the success rate so a failing provider's score stays finite
+    MIN_SUCCESS_RATE = 0.05
+
+    def __init__(self, alpha: float = 0.2, explore_fraction: float = 0.05,
+                 preferred: Optional[str] = None, preferred_bias: float = 0.8,
+                 rng: Optional[random.Random] = None):
+        """
+        Args:
+            alpha: EWMA smoothing factor (higher reacts faster)
+            explore_fraction: Share of calls routed to a non-best provider
+            preferred: Provider whose score is scaled by preferred_bias
+            preferred_bias: Score multiplier for the preferred provider (<1 favours it)
+            rng: Random source, for reproducible exploration
+        """
+        self.alpha = alpha
+        self.explore_fraction = explore_fraction
+        self.preferred = preferred
+        self.preferred_bias = preferred_bias
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self._stats: Dict[Tuple[str, str], _ProviderStats] = {}
+        self.explorations = 0
+
+    def _get(self, provider: str, method: str) -> _ProviderStats:
+        key = (provider, method)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = _ProviderStats()
+        return stats
+
+    def record(self, provider: str, method: str, latency: float, ok: bool):
+        """
+        Feed one call outcome into the averages.
+
+        Args:
+            provider: Provider that served the call
+            method: Method name, e.g. "chat"
+            latency: Wall time of the call in seconds
+            ok: Whether the call succeeded
+        """
+        with self._lock:
+            stats = self._get(provider, method)
+            stats.samples += 1
+            stats.error_rate += self.alpha * ((0.0 if ok else 1.0) - stats.error_rate)
+            if ok:
+                # Only successful calls say how fast the provider answers
+                if stats.latency is None:
+                    stats.latency = latency
+                else:
+                    stats.latency += self.alpha * (latency - stats.latency)
+
+    def _score(self, provider: str, method: str, default_latency: float) -> float:
+        stats = self._stats.get((provider, method))
+        latency = stats.latency if stats and stats.latency is not None else default_latency
+        error_rate = stats.error_rate if stats else 0.0
+        score = latency / max(1.0 - error_rate, self.MIN_SUCCESS_RATE)
+        if provider == self.preferred:
+            score *= self.preferred_bias
+        return score
+
+    def order(self, method: str, candidates: List[str]) -> List[str]:
+        """
+        Order candidate providers for a method, best first.
+
+        Providers without latency data are scored optimistically (as fast as
+        the best known one) so each gets tried; ties keep the candidate order.
+
+        Args:
+            method: Method name, e.g. "chat"
+            candidates: Providers in their static fallback order
+
+        Returns:
+            Candidates reordered by expected time per successful call
+        """
+        if len(candidates) < 2:
+            return list(candidates)
+
+        with self._lock:
+            known = [
+                s.latency for p in candidates
+                for s in [self._stats.get((p, method))] if s and s.latency is not None
+            ]
+            default_latency = min(known) if known else 1.0
+            scores = {p: self._score(p, method, default_latency) for p in candidates}
+
+            ordered = sorted(candidates, key=lambda p: (scores[p], candidates.index(p)))
+
+            if self.explore_fraction > 0 and self._rng.random() < self.explore_fraction:
+                explored = self._rng.choice(ordered[1:])
+                ordered.remove(explored)
+                ordered.insert(0, explored)
+                self.explorations += 1
+                logger.info(f"Router exploring {explored} for {method}")
+
+        return ordered
+
+    def stats(self) -> Dict[str, Any]:
+        """EWMA latency, error rate and sample count per method and provider."""
+        with self._lock:
+            methods: Dict[str, Dict[str, Any]] = {}
+            for (provider, method), s in self._stats.items():
+                methods.setdefault(method, {})[provider] = {
+                    "ewma_latency": round(s.latency, 4) if s.latency is not None else None,
+                    "ewma_error_rate": round(s.error_rate, 4),
+                    "samples": s.samples
+                }
+            return {
+                "preferred": self.preferred,
+                "explore_fraction": self.explore_fraction,
+                "explorations": self.explorations,
+                "methods": methods
+            }
@@ -0,0 +1,200 @@
+"""
+Client-side rate limiting for upstream providers.
+
+Each provider gets token buckets for requests/min and (optionally)
+tokens/min, sized from config. Callers wait their turn in FIFO order
+before sending, so throughput stays just under the quota instead of
+bursting into 429s. Buckets are corrected from the provider's
+x-ratelimit-* headers, and a 429 pauses the provider for everyone until
+its Retry-After has passed.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Mapping, Optional
+
+from app.services import deadline
+from app.services.errors import parse_rate_limit_headers
+
+logger = logging.getLogger(__name__)
+
+_limiters: Dict[str, "RateLimiter"] = {}
+
+
+class TokenBucket:
+    """Continuous-refill token bucket."""
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        """
+        Args:
+            per_minute: Refill rate per minute
+            capacity: Burst size (default: one minute's worth)
+        """
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount tokens are available."""
+        self._refill()
+        missing = min(amount, self.capacity) - self.tokens
+        return max(missing / self.rate, 0.0) if self.rate > 0 else 0.0
+
+    def take(self, amount: float):
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+    def give(self, amount: float):
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def clamp(self, remaining: float):
+        """Lower the level to what the server says is left."""
+        self._refill()
+        self.tokens = min(self.tokens, remaining)
+
+
+class RateLimiter:
+    """Requests/min and tokens/min buckets for one provider, with a FIFO wait queue."""
+
+    def __init__(self, provider: str, requests_per_minute: float = 0,
+                 tokens_per_minute: float = 0):
+        """
+        Args:
+            provider: Provider name, for logging and metrics
+            requests_per_minute: Request quota; 0 disables the request bucket
+            tokens_per_minute: Token quota; 0 disables the token bucket
+        """
+        self.provider = provider
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.paused_until = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        self.acquired = 0
+        self.delayed = 0
+        self.total_wait = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.requests is not None or self.tokens is not None
+
+    def _wait_time(self, tokens: float) -> float:
+        wait = max(self.paused_until - time.monotonic(), 0.0)
+        if self.requests:
+            wait = max(wait, self.requests.wait_time(1))
+        if self.tokens and tokens:
+            wait = max(wait, self.tokens.wait_time(tokens))
+        return wait
+
+    async def acquire(self, tokens: float = 0):
+        """
+        Wait until one request (and tokens, if tracked) fits the quota, then take it.
+        Waiters are served in arrival order.
+
+        Args:
+            tokens: Estimated tokens the request will consume
+        """
+        if not self.enabled and self.paused_until <= time.monotonic():
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        started = time.monotonic()
+        async with self._lock:
+            while True:
+                wait = self._wait_time(tokens)
+                if wait <= 0:
+                    break
+                left = deadline.remaining()
+                if left is not None and wait >= left:
+                    raise deadline.DeadlineExceeded(
+                        f"{self.provider} rate limit wait of {wait:.1f}s exceeds the request deadline"
+                    )
+                await asyncio.sleep(wait)
+            if self.requests:
+                self.requests.take(1)
+            if self.tokens and tokens:
+                self.tokens.take(tokens)
+
+        waited = time.monotonic() - started
+        self.acquired += 1
+        if waited > 0.001:
+            self.delayed += 1
+            self.total_wait += waited
+            logger.info(f"Rate limiter delayed {self.provider} request by {waited:.2f}s")
+
+    def settle(self, estimated: float, actual: float):
+        """Return over-reserved tokens (or take the shortfall) once usage is known."""
+        if self.tokens:
+            if actual < estimated:
+                self.tokens.give(estimated - actual)
+            elif actual > estimated:
+                self.tokens.take(actual - estimated)
+
+    def update_from_headers(self, headers: Mapping[str, str]):
+        """Sync bucket levels with the provider's x-ratelimit-* headers."""
+        info = parse_rate_limit_headers(headers)
+        for kind, bucket in (("requests", self.requests), ("tokens", self.tokens)):
+            remaining = info.get(f"remaining_{kind}")
+            if remaining is None:
+                continue
+            reset = info.get(f"reset_{kind}")
+            if remaining <= 0 and reset:
+                # Exhausted: hold until the server's window resets rather than
+                # also draining our bucket, which would wait twice
+                self.pause(reset)
+            elif bucket:
+                bucket.clamp(remaining)
+
+    def pause(self, seconds: float):
+        """Hold all requests for this provider for the given time (e.g. Retry-After)."""
+        until = time.monotonic() + seconds
+        if until > self.paused_until:
+            self.paused_until = until
+            logger.warning(f"Rate limiter pausing {self.provider} for {seconds:.2f}s")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests_per_minute": self.requests.rate * 60 if self.requests else None,
+            "tokens_per_minute": self.tokens.rate * 60 if self.tokens else None,
+            "available_requests": round(self.requests.tokens, 2) if self.requests else None,
+            "available_tokens": round(self.tokens.tokens, 1) if self.tokens else None,
+            "acquired": self.acquired,
+            "delayed": self.delayed,
+            "total_wait_seconds": round(self.total_wait, 3),
+            "paused_for": round(max(self.paused_until - time.monotonic(), 0.0), 3)
+        }
+
+
+def get_rate_limiter(provider: str) -> RateLimiter:
+    """
+    Get (or create) the shared limiter for a provider, sized from settings
+    ({provider}_requests_per_minute and {provider}_tokens_per_minute).
+    """
+    limiter = _limiters.get(provider)
+    if limiter is None:
+        from app.config import settings
+        limiter = RateLimiter(
+            provider,
+            requests_per_minute=getattr(settings, f"{provider}_requests_per_minute", 0),
+            tokens_per_minute=getattr(settings, f"{provider}_tokens_per_minute", 0)
+        )
+        _limiters[provider] = limiter
+    return limiter
+
+
+def rate_limiter_stats() -> Dict[str, Any]:
+    """Stats for every provider limiter created so far."""
+    return {provider: limiter.stats() for provider, limiter in _limiters.items()}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for quota reservation (about four characters per token)."""
+    return len(text) // 4 + 1
@@ -0,0 +1,164 @@
+"""
+Append-only record log used as the storage engine for VectorStore collections.
+
+Each line is a JSON entry:
+    {"op": "put", "record": {...}}   insert a record
+    {"op": "del", "id": "..."}       tombstone a record
+    {"op": "clear"}                  drop every record written before it
+
+Compaction rewrites the live records into a fresh log and atomically swaps it in.
+"""
+
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class RecordLog:
+    """Crash-safe append-only JSON-lines log for a single collection."""
+
+    def __init__(self, path: str, fsync: bool = True):
+        self.path = path
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._file = None
+        self.entry_count = 0
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.path, "ab")
+        return self._file
+
+    def close(self):
+        """Close the underlying file handle."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def replay(self) -> List[Dict[str, Any]]:
+        """
+        Read the log and rebuild the list of live records.
+
+        A torn final line (e.g. from a crash mid-write) is truncated away so
+        later appends start from a clean offset. A corrupt line followed by
+        valid entries is skipped with a warning and left for compaction to drop.
+
+        Returns:
+            Live records in insertion order
+        """
+        records: Dict[str, Dict[str, Any]] = {}
+        if not os.path.exists(self.path):
+            return []
+
+        offset = 0
+        entry_count = 0
+        # Offset of the first line in the current run of unreadable lines
+        torn_offset: Optional[int] = None
+        torn_lines = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                entry = None
+                if line.endswith(b"\n"):
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        pass
+                if not isinstance(entry, dict):
+                    if torn_offset is None:
+                        torn_offset = offset
+                    torn_lines += 1
+                else:
+                    if torn_offset is not None:
+                        logger.warning(f"Skipping corrupt entries in {self.path} at byte {torn_offset}")
+                        torn_offset = None
+                        torn_lines = 0
+                    self._apply(records, entry)
+                offset += len(line)
+                entry_count += 1
+
+        if torn_offset is not None:
+            logger.warning(f"Truncating torn tail of {self.path} at byte {torn_offset}")
+            with open(self.path, "r+b") as f:
+                f.truncate(torn_offset)
+            entry_count -= torn_lines
+        self.entry_count = entry_count
+
+        return list(records.values())
+
+    @staticmethod
+    def _apply(records: Dict[str, Dict[str, Any]], entry: Dict[str, Any]):
+        op = entry.get("op")
+        if op == "put":
+            record = entry.get("record") or {}
+            if "id" in record:
+                records[record["id"]] = record
+        elif op == "del":
+            records.pop(entry.get("id"), None)
+        elif op == "clear":
+            records.clear()
+
+    def append(self, entry: Dict[str, Any]):
+        """Append one entry. Cost is proportional to the entry, not the log."""
+        data = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            f = self._open()
+            f.write(data)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+            self.entry_count += 1
+
+    def size(self) -> int:
+        """Current size of the log in bytes."""
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+            return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def compact(self, records: List[Dict[str, Any]], since_offset: Optional[int] = None):
+        """
+        Rewrite the log to contain only the given live records.
+
+        Args:
+            records: Snapshot of live records
+            since_offset: Log size when the snapshot was taken; entries appended
+                after it are carried over so concurrent writes are not lost
+        """
+        tmp_path = f"{self.path}.compact"
+        out = open(tmp_path, "wb")
+        try:
+            for record in records:
+                out.write((json.dumps({"op": "put", "record": record}, ensure_ascii=False) + "\n").encode("utf-8"))
+            carried = 0
+
+            with self._lock:
+                if since_offset is not None and os.path.exists(self.path):
+                    if self._file is not None:
+                        self._file.flush()
+                    with open(self.path, "rb") as src:
+                        src.seek(since_offset)
+                        tail = src.read()
+                    out.write(tail)
+                    carried = tail.count(b"\n")
+                out.flush()
+                os.fsync(out.fileno())
+                out.close()
+
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                os.replace(tmp_path, self.path)
+                self.entry_count = len(records) + carried
+        finally:
+            if not out.closed:
+                out.close()
+
+        logger.info(f"Compacted {self.path}: {len(records)} live records")
@@ -0,0 +1,97 @@
+"""
+Retry policy for provider calls.
+
+Retries use capped exponential backoff with full jitter. A server
+Retry-After hint replaces the computed delay (plus a little jitter so
+callers do not return in lockstep). Every call has a budget of total time;
+a retry whose wait would overrun it, or the request deadline, is not
+attempted, and the last error is raised straight away instead.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from app.services import deadline
+from app.services.errors import ProviderError
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class RetryPolicy:
+    """Jittered exponential backoff that honours server hints, under a time budget."""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5,
+                 max_delay: float = 20.0, budget: float = 30.0,
+                 rng: Optional[random.Random] = None):
+        """
+        Args:
+            max_attempts: Total attempts including the first
+            base_delay: Backoff base in seconds (doubles per attempt)
+            max_delay: Cap on a single computed backoff
+            budget: Total seconds a call may spend, retries and waits included
+            rng: Random source for jitter
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self._rng = rng or random.Random()
+
+    @classmethod
+    def from_settings(cls, max_attempts: Optional[int] = None) -> "RetryPolicy":
+        """Build a policy from the retry settings, optionally overriding attempts."""
+        from app.config import settings
+        return cls(
+            max_attempts=max_attempts or settings.retry_max_attempts,
+            base_delay=settings.retry_base_delay,
+            max_delay=settings.retry_max_delay,
+            budget=settings.retry_budget_seconds
+        )
+
+    def delay(self, attempt: int, error: ProviderError) -> float:
+        """Seconds to wait before retry number attempt (0-based) after error."""
+        if error.retry_after is not None:
+            return error.retry_after + self._rng.uniform(0, min(1.0, 0.1 * error.retry_after + 0.05))
+        cap = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return self._rng.uniform(0, cap)
+
+    async def run(self, provider: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Call fn, retrying retryable ProviderErrors.
+
+        Args:
+            provider: Provider name, for logging
+            fn: Zero-argument coroutine factory performing one attempt
+
+        Returns:
+            fn's result
+
+        Raises:
+            ProviderError: The last error once retries or budget are exhausted
+        """
+        started = time.monotonic()
+        attempts = max(self.max_attempts, 1)
+        for attempt in range(attempts):
+            try:
+                return await fn()
+            except ProviderError as e:
+                if not e.retryable or attempt == attempts - 1:
+                    raise
+                wait = self.delay(attempt, e)
+                elapsed = time.monotonic() - started
+                if elapsed + wait > self.budget:
+                    logger.warning(f"{provider}: retry in {wait:.2f}s would exceed the "
+                                   f"{self.budget:.0f}s budget; giving up")
+                    raise
+                left = deadline.remaining()
+                if left is not None and wait >= left:
+                    logger.warning(f"{provider}: retry in {wait:.2f}s would pass the request deadline; giving up")
+                    raise
+                logger.warning(f"{provider}: {e}; retry {attempt + 1}/{attempts - 1} "
+                               f"in {wait:.2f}s")
+                await asyncio.sleep(wait)
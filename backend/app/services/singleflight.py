@@ -0,0 +1,92 @@
+"""
+Single-flight request coalescing.
+
+Concurrent calls with the same key share one in-flight upstream call and all
+receive its result (or its exception). The shared call is cancelled only when
+every caller waiting on it has gone away.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(value: Any) -> Any:
+    """Collapse whitespace in strings so trivially different arguments coalesce."""
+    if isinstance(value, str):
+        return " ".join(value.split())
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Deduplicates identical concurrent async calls."""
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    @staticmethod
+    def make_key(method: str, *args, **kwargs) -> str:
+        """Build a key from the method name and normalized arguments."""
+        encoded = json.dumps(
+            {"method": method, "args": _normalize(list(args)), "kwargs": _normalize(kwargs)},
+            sort_keys=True, default=str
+        )
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    async def do(self, method: str, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run fn once per key among concurrent callers.
+
+        Args:
+            method: Method name, used for metrics
+            key: Coalescing key (see make_key)
+            fn: Zero-argument coroutine factory performing the upstream call
+
+        Returns:
+            The shared result
+        """
+        stats = self._stats.setdefault(method, {"calls": 0, "coalesced": 0})
+        stats["calls"] += 1
+
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._flights.pop(key, None)
+                                          if self._flights.get(key) is flight else None)
+        else:
+            stats["coalesced"] += 1
+            logger.info(f"Coalesced {method} with an in-flight call")
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            # Abandon the shared call only if nobody else is waiting on it
+            if flight.waiters == 1 and not flight.task.done():
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Calls and coalesced calls per method, plus current in-flight count."""
+        return {
+            "in_flight": len(self._flights),
+            "methods": {method: dict(counts) for method, counts in self._stats.items()}
+        }
@@ -7,13 +7,25 @@ Uses the Stable Diffusion XL 1.0 (SDXL) model.
 API Documentation: https://platform.stability.ai/docs/api
 """
 
-import logging
-import time
 import base64
-import requests
+from collections import OrderedDict
+import logging
 from typing import Optional, Dict, Any
 from pathlib import Path
 
+import httpx
+from starlette.concurrency import run_in_threadpool
+
+from app.services.deadline import DeadlineExceeded
+from app.services.errors import (
+    ProviderConnectionError, ProviderError, ProviderTimeoutError, error_from_response
+)
+from app.services.http_transport import clipped_timeout, create_http_client
+from app.services.image_cache import ImageCache
+from app.services.image_store import ImageStore
+from app.services.rate_limiter import get_rate_limiter
+from app.services.retry import RetryPolicy
+
 logger = logging.getLogger(__name__)
 
 
@@ -32,18 +44,34 @@ class StabilityAIImageClient:
         api_key: Optional[str] = None, 
         out_dir: str = "./generated_images", 
         timeout: int = 180, 
-        retries: int = 3
+        retries: int = 3,
+        url_prefix: str = "/api/images",
+        http2: bool = False,
+        cache: Optional[ImageCache] = None
     ):
         self.api_key = api_key.strip() if api_key else None
         self.out_path = Path(out_dir)
         self.timeout_val = timeout
         self.max_retry_cnt = retries
-        self.out_path.mkdir(parents=True, exist_ok=True)
+        self.retry = RetryPolicy.from_settings(max_attempts=retries)
+        self.limiter = get_rate_limiter("stability")
+        self.image_store = ImageStore(out_dir, url_prefix=url_prefix)
+        self.cache = cache
+        
+        # Headers are fixed for the client's lifetime, so build them once
+        self.headers = self._build_headers()
+        
+        # Long-lived pooled session; keeps TLS connections warm between images
+        self.http = create_http_client(
+            timeout=self.timeout_val,
+            headers=self.headers,
+            http2=http2
+        )
         
         logger.info(f"StabilityAIImageClient initialized with model: {self.MODEL_NAME}")
     
-    def get_headers(self) -> Dict[str, str]:
-        """Get request headers with API key."""
+    def _build_headers(self) -> Dict[str, str]:
+        """Build request headers with API key."""
         headers = {
             "Content-Type": "application/json",
             "Accept": "application/json"
@@ -52,60 +80,70 @@ class StabilityAIImageClient:
             headers["Authorization"] = f"Bearer {self.api_key}"
         return headers
     
-    def _make_request(self, url: str, payload: Dict[str, Any], retry_count: int = 0) -> requests.Response:
+    def get_headers(self) -> Dict[str, str]:
+        """Get request headers with API key."""
+        return self.headers
+    
+    async def aclose(self):
+        """Close the pooled session."""
+        await self.http.aclose()
+    
+    async def _make_request(self, url: str, payload: Dict[str, Any]) -> httpx.Response:
         """
         Make HTTP request with retry logic.
         
         Args:
             url: API endpoint URL
             payload: Request payload
-            retry_count: Current retry attempt
             
         Returns:
             Response object
             
         Raises:
-            Exception: If request fails after all retries
+            ProviderError: If request fails after all retries
         """
-        try:
-            response = requests.post(
-                url, 
-                headers=self.get_headers(), 
-                json=payload, 
-                timeout=self.timeout_val
-            )
+        async def attempt() -> httpx.Response:
+            await self.limiter.acquire()
+            timeout = clipped_timeout(self.timeout_val)
+            try:
+                response = await self.http.post(url, json=payload, timeout=timeout)
+            except httpx.TimeoutException:
+                raise ProviderTimeoutError("stability", "Stability AI request timeout")
+            except httpx.RequestError as e:
+                logger.error(f"Request failed: {str(e)}")
+                raise ProviderConnectionError("stability", f"Stability AI request failed: {str(e)}")
             
             if response.status_code == 200:
                 return response
-            elif response.status_code == 429 and retry_count < self.max_retry_cnt - 1:
-                # Rate limited - wait and retry
-                wait_time = (retry_count + 1) * 10
-                logger.warning(f"Rate limited. Waiting {wait_time}s before retry...")
-                time.sleep(wait_time)
-                return self._make_request(url, payload, retry_count + 1)
-            elif response.status_code >= 500 and retry_count < self.max_retry_cnt - 1:
-                # Server error - wait and retry
-                wait_time = (retry_count + 1) * 5
-                logger.warning(f"Server error {response.status_code}. Waiting {wait_time}s before retry...")
-                time.sleep(wait_time)
-                return self._make_request(url, payload, retry_count + 1)
-            else:
-                error_msg = f"API error {response.status_code}: {response.text[:200]}"
-                logger.error(error_msg)
-                raise Exception(error_msg)
-                
-        except requests.exceptions.Timeout:
-            if retry_count < self.max_retry_cnt - 1:
-                wait_time = (retry_count + 1) * 5
-                logger.warning(f"Timeout. Retrying in {wait_time}s...")
-                time.sleep(wait_time)
-                return self._make_request(url, payload, retry_count + 1)
-            raise Exception("Request timeout after all retries")
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Request failed: {str(e)}")
-            raise
+            error = error_from_response("stability", response.status_code, response.text, response.headers)
+            logger.error(str(error))
+            if error.retry_after:
+                self.limiter.pause(error.retry_after)
+            raise error
+        
+        return await self.retry.run("stability", attempt)
     
-    def generate_image(
+    def _success_result(self, filename: str, prompt: str, 
+                        payload: Dict[str, Any], cached: bool) -> Dict[str, Any]:
+        """Build the success response for a stored image."""
+        return {
+            "success": True,
+            "image_url": self.image_store.url_for(filename),
+            "filename": filename,
+            "error": None,
+            "cached": cached,
+            "metadata": {
+                "model": self.MODEL_NAME,
+                "prompt": prompt,
+                "width": payload["width"],
+                "height": payload["height"],
+                "steps": payload["steps"],
+                "cfg_scale": payload["cfg_scale"],
+                "seed": payload.get("seed")
+            }
+        }
+    
+    async def generate_image(
         self, 
         prompt: str, 
         width: int = 1024, 
@@ -113,7 +151,8 @@ class StabilityAIImageClient:
         num_inference_steps: int = 30, 
         guidance_scale: float = 7.5,
         negative_prompt: Optional[str] = None,
-        style_preset: Optional[str] = None
+        style_preset: Optional[str] = None,
+        seed: Optional[int] = None
     ) -> Dict[str, Any]:
         """
         Generate image using Stability AI Stable Diffusion XL.
@@ -126,6 +165,7 @@ class StabilityAIImageClient:
             guidance_scale: Guidance scale for generation (default: 7.5)
             negative_prompt: Things to avoid in the image
             style_preset: Style preset (e.g., "photorealistic", "anime", "cinematic")
+            seed: Explicit seed; only seeded requests are cached
             
         Returns:
             Dict with success status, image_url, and optional error
@@ -164,10 +204,25 @@ class StabilityAIImageClient:
         if style_preset:
             payload["style_preset"] = style_preset
         
+        # Add seed if provided
+        if seed is not None:
+            payload["seed"] = seed
+        
+        # Serve identical seeded requests from the image cache
+        cache_key = None
+        if self.cache and ImageCache.cacheable(payload):
+            cache_key = ImageCache.make_key(payload)
+            filename = await run_in_threadpool(self.cache.get, cache_key)
+            if filename is not None:
+                if self.image_store.path_for(filename).exists():
+                    logger.info(f"Image cache hit: {cache_key[:12]} -> {filename}")
+                    return self._success_result(filename, prompt, payload, cached=True)
+                await run_in_threadpool(self.cache.discard, cache_key)
+        
         try:
             logger.info(f"Generating image with Stability AI: {prompt[:50]}...")
             
-            response = self._make_request(self.API_URL, payload)
+            response = await self._make_request(self.API_URL, payload)
             
             # Parse the response
             result = response.json()
@@ -177,23 +232,16 @@ class StabilityAIImageClient:
                 artifact = result["artifacts"][0]
                 if artifact.get("base64"):
                     img_b64 = artifact["base64"]
-                    image_url = f"data:image/png;base64,{img_b64}"
                     
-                    logger.info(f"Image generated successfully: {len(img_b64)} bytes (base64)")
+                    # Decode once and keep only a reference to the stored blob
+                    image_bytes = base64.b64decode(img_b64)
+                    filename = await run_in_threadpool(self.image_store.save_bytes, image_bytes)
+                    if cache_key:
+                        await run_in_threadpool(self.cache.put, cache_key, filename)
+                    
+                    logger.info(f"Image generated successfully: {len(img_b64)} bytes (base64) -> {filename}")
                     
-                    return {
-                        "success": True,
-                        "image_url": image_url,
-                        "error": None,
-                        "metadata": {
-                            "model": self.MODEL_NAME,
-                            "prompt": prompt,
-                            "width": payload["width"],
-                            "height": payload["height"],
-                            "steps": payload["steps"],
-                            "cfg_scale": payload["cfg_scale"]
-                        }
-                    }
+                    return self._success_result(filename, prompt, payload, cached=False)
                 else:
                     raise Exception("No base64 image data in response")
             else:
@@ -201,16 +249,51 @@ class StabilityAIImageClient:
                 logger.error(f"API returned error: {error_msg}")
                 raise Exception(f"API error: {error_msg}")
                 
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.error(f"Image generation failed: {str(e)}")
             return {
                 "success": False, 
                 "error": str(e), 
+                "exception": e if isinstance(e, ProviderError) else None,
                 "image_url": None
             }
 
 
-def generate_image(
+# Convenience-function clients by API key, least recently used first
+_default_clients: "OrderedDict[str, StabilityAIImageClient]" = OrderedDict()
+DEFAULT_CLIENTS_MAX = 4
+
+
+async def _get_default_client(api_key: str) -> StabilityAIImageClient:
+    """
+    Reuse one client per API key for the convenience function instead of building
+    one per call. The least recently used client beyond DEFAULT_CLIENTS_MAX is
+    closed, so its pooled connections are released.
+    """
+    from app.config import settings
+    
+    api_key = api_key.strip()
+    client = _default_clients.get(api_key)
+    if client is not None:
+        _default_clients.move_to_end(api_key)
+        return client
+    
+    client = StabilityAIImageClient(
+        api_key=api_key,
+        out_dir=settings.image_dir,
+        url_prefix=settings.image_url_prefix,
+        http2=settings.stability_http2
+    )
+    _default_clients[api_key] = client
+    while len(_default_clients) > DEFAULT_CLIENTS_MAX:
+        _, evicted = _default_clients.popitem(last=False)
+        await evicted.aclose()
+    return client
+
+
+async def generate_image(
     prompt: str, 
     api_token: Optional[str] = None,
     width: int = 1024,
@@ -240,5 +323,5 @@ def generate_image(
             "image_url": None
         }
     
-    client = StabilityAIImageClient(api_key=token)
-    return client.generate_image(prompt, width=width, height=height, **kwargs)
+    client = await _get_default_client(token)
+    return await client.generate_image(prompt, width=width, height=height, **kwargs)
@@ -0,0 +1,443 @@
+"""
+Storage backends for VectorStore collections.
+
+VectorStore handles embedding and image offloading and delegates record
+storage, history paging and search to a StorageBackend. Two implementations
+exist: the in-memory LogBackend (vector_store.py), which replays an
+append-only log at startup, and SQLiteBackend below, which keeps records on
+disk and can grow past RAM.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.embedding_matrix import MappedEmbeddingMatrix
+from app.services.embeddings import tokenize
+
+logger = logging.getLogger(__name__)
+
+
+class StorageBackend(ABC):
+    """Record storage for VectorStore. Records are {"id", "document", "metadata"} dicts."""
+
+    def open_collection(self, name: str):
+        """Prepare a collection for use (load it, create tables...)."""
+
+    @abstractmethod
+    def count(self, name: str) -> int:
+        """Number of records in the collection."""
+
+    @abstractmethod
+    def put(self, name: str, record: Dict[str, Any], vector: np.ndarray):
+        """Insert a record with its unit-length embedding."""
+
+    def put_many(self, name: str, records: List[Dict[str, Any]], vectors: np.ndarray):
+        for record, vector in zip(records, vectors):
+            self.put(name, record, vector)
+
+    @abstractmethod
+    def get(self, name: str, record_id: str) -> Optional[Dict[str, Any]]:
+        """A record by id, or None."""
+
+    @abstractmethod
+    def delete(self, name: str, record_id: str) -> bool:
+        """Remove a record; False if it did not exist."""
+
+    @abstractmethod
+    def clear(self, name: str) -> bool:
+        """Remove every record in the collection."""
+
+    @abstractmethod
+    def history(self, name: str, limit: int, before: Optional[str] = None,
+                after: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Records newest first: the latest `limit`, the `limit` just older than
+        `before`, or the `limit` just newer than `after`. Cursors are record
+        ids or ISO timestamps; an unknown cursor yields no records.
+        """
+
+    @abstractmethod
+    def vector_search(self, name: str, query: np.ndarray, k: int) -> List[Tuple[Dict[str, Any], float]]:
+        """Up to k (record, cosine similarity) pairs, best first."""
+
+    @abstractmethod
+    def text_search(self, name: str, query: str, k: int) -> List[Tuple[Dict[str, Any], float]]:
+        """Up to k (record, relevance score) pairs for a keyword query, best first."""
+
+    def get_many(self, name: str, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Records by id; unknown ids are left out."""
+        records = {}
+        for record_id in ids:
+            record = self.get(name, record_id)
+            if record is not None:
+                records[record_id] = record
+        return records
+
+    @abstractmethod
+    def vectors(self, name: str) -> Tuple[List[str], np.ndarray]:
+        """Snapshot (copy) of every record id and embedding, e.g. to build an ANN index."""
+
+    def close(self):
+        pass
+
+
+def safe_name(collection_name: str) -> str:
+    """Sanitize collection name for filenames."""
+    return "".join(c for c in collection_name if c.isalnum() or c in "_-")
+
+
+def is_timestamp(value: str) -> bool:
+    try:
+        datetime.fromisoformat(value)
+        return True
+    except ValueError:
+        return False
+
+
+class ReadWriteLock:
+    """Any number of readers or one writer; a waiting writer holds off new readers."""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        with self._condition:
+            while self._writing or self._writers_waiting:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._condition:
+            self._writers_waiting += 1
+            while self._writing or self._readers:
+                self._condition.wait()
+            self._writers_waiting -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Records in one SQLite database in WAL mode.
+
+    Rows are indexed by (collection, id) and (collection, created_at, id), so
+    lookups, deletes and history pages are point or range queries. Document
+    text is indexed with FTS5. Embeddings are stored as float32 blobs and
+    mirrored into a memory-mapped matrix per collection, which vector search
+    scans; the matrix is rebuilt from the blobs if it falls out of step.
+    Each thread reads through its own connection, so concurrent readers do
+    not block each other or the single writer. Matrix scans share a
+    reader/writer lock and only wait for the moment a writer applies its
+    rows, not for its database transaction.
+    """
+
+    # Blob rows read per batch when rebuilding a matrix
+    REBUILD_BATCH = 4096
+
+    def __init__(self, db_path: str = "./chroma_data/vector_store.db"):
+        self.db_path = db_path
+        # Serializes writers; _matrix_lock guards the matrices against scans
+        self._write_lock = threading.Lock()
+        self._matrix_lock = ReadWriteLock()
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self.matrices: Dict[str, MappedEmbeddingMatrix] = {}
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(
+            # FTS5 rows point at pk; an implicit rowid could be renumbered by VACUUM
+            "CREATE TABLE IF NOT EXISTS records ("
+            "pk INTEGER PRIMARY KEY, "
+            "collection TEXT NOT NULL, id TEXT NOT NULL, created_at TEXT NOT NULL, "
+            "document TEXT NOT NULL, metadata TEXT NOT NULL, vector BLOB, "
+            "UNIQUE (collection, id));"
+            "CREATE INDEX IF NOT EXISTS records_created ON records (collection, created_at, id);"
+            "CREATE VIRTUAL TABLE IF NOT EXISTS records_fts USING fts5("
+            "document, content='records', content_rowid='pk');"
+            "CREATE TRIGGER IF NOT EXISTS records_ai AFTER INSERT ON records BEGIN "
+            "INSERT INTO records_fts (rowid, document) VALUES (new.pk, new.document); END;"
+            "CREATE TRIGGER IF NOT EXISTS records_ad AFTER DELETE ON records BEGIN "
+            "INSERT INTO records_fts (records_fts, rowid, document) "
+            "VALUES ('delete', old.pk, old.document); END;"
+            # Version is bumped with every write and stamped on the embedding matrix;
+            # size is the record count, so neither check scans the records
+            "CREATE TABLE IF NOT EXISTS collections ("
+            "name TEXT PRIMARY KEY, version INTEGER NOT NULL, size INTEGER NOT NULL);"
+        )
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        """This thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    @staticmethod
+    def _to_record(row) -> Dict[str, Any]:
+        return {"id": row[0], "document": row[1], "metadata": json.loads(row[2])}
+
+    def _matrix_path(self, name: str) -> str:
+        return f"{os.path.splitext(self.db_path)[0]}.{safe_name(name)}"
+
+    def _collection_state(self, conn: sqlite3.Connection, name: str) -> Tuple[int, int]:
+        """
+        A collection's (version, size), creating its row if missing. Only then are
+        the records counted, for collections written before the row existed.
+        """
+        row = conn.execute("SELECT version, size FROM collections WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            conn.execute("INSERT INTO collections (name, version, size) "
+                         "SELECT ?, 1, COUNT(*) FROM records WHERE collection = ?", (name, name))
+            row = conn.execute("SELECT version, size FROM collections WHERE name = ?", (name,)).fetchone()
+        return row
+
+    def _record_write(self, conn: sqlite3.Connection, name: str, added: int) -> int:
+        """Advance a collection's version and size inside the caller's transaction."""
+        conn.execute("UPDATE collections SET version = version + 1, size = size + ? WHERE name = ?",
+                     (added, name))
+        return conn.execute("SELECT version FROM collections WHERE name = ?", (name,)).fetchone()[0]
+
+    def open_collection(self, name: str):
+        """
+        Open the collection's embedding matrix, rebuilding it from the blobs unless
+        it is stamped with the collection's current write version.
+        """
+        with self._write_lock:
+            if name in self.matrices:
+                return
+            conn = self._connection()
+            version, size = self._collection_state(conn, name)
+            conn.commit()
+            matrix = MappedEmbeddingMatrix(self._matrix_path(name))
+            if matrix.version != version or len(matrix) != size:
+                matrix.version = 0
+                matrix.clear()
+                rows = self._connection().execute(
+                    "SELECT id, vector FROM records WHERE collection = ? AND vector IS NOT NULL", (name,)
+                )
+                while True:
+                    batch = rows.fetchmany(self.REBUILD_BATCH)
+                    if not batch:
+                        break
+                    for record_id, blob in batch:
+                        matrix.add(record_id, np.frombuffer(blob, dtype=np.float32))
+                matrix.version = version
+                matrix.flush()
+                logger.info(f"Rebuilt {name} embedding matrix ({len(matrix)} rows)")
+            self.matrices[name] = matrix
+
+    def _begin_matrix_write(self, name: str) -> Optional[MappedEmbeddingMatrix]:
+        """Mark the collection's matrix as mid-change, so a crash before it is restamped forces a rebuild."""
+        matrix = self.matrices.get(name)
+        if matrix is not None:
+            matrix.version = 0
+        return matrix
+
+    def count(self, name: str) -> int:
+        row = self._connection().execute(
+            "SELECT size FROM collections WHERE name = ?", (name,)
+        ).fetchone()
+        if row is not None:
+            return row[0]
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM records WHERE collection = ?", (name,)
+        ).fetchone()[0]
+
+    def _row(self, name: str, record: Dict[str, Any], vector: np.ndarray) -> tuple:
+        metadata = record.get("metadata", {})
+        blob = np.asarray(vector, dtype=np.float32).tobytes() if vector is not None else None
+        return (name, record["id"], metadata.get("created_at", ""), record.get("document", ""),
+                json.dumps(metadata, ensure_ascii=False), blob)
+
+    def put(self, name: str, record: Dict[str, Any], vector: np.ndarray):
+        self.put_many(name, [record], [vector])
+
+    def put_many(self, name: str, records: List[Dict[str, Any]], vectors):
+        for record in records:
+            MappedEmbeddingMatrix.check_id(record["id"])
+        rows = [self._row(name, record, vector) for record, vector in zip(records, vectors)]
+        conn = self._connection()
+        with self._write_lock:
+            matrix = self._begin_matrix_write(name)
+            self._collection_state(conn, name)
+            # Replace = delete + insert, so the FTS triggers stay in step
+            replaced = conn.executemany("DELETE FROM records WHERE collection = ? AND id = ?",
+                                        [(row[0], row[1]) for row in rows]).rowcount
+            conn.executemany(
+                "INSERT INTO records (collection, id, created_at, document, metadata, vector) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+            version = self._record_write(conn, name, len(rows) - replaced)
+            conn.commit()
+
+            if matrix is not None:
+                with self._matrix_lock.write():
+                    for record, vector in zip(records, vectors):
+                        vector = np.asarray(vector, dtype=np.float32)
+                        if not len(matrix) and matrix.dim not in (None, vector.shape[0]):
+                            matrix.reset(vector.shape[0])
+                        matrix.remove(record["id"])
+                        matrix.add(record["id"], vector)
+                    matrix.version = version
+
+    def get(self, name: str, record_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(
+            "SELECT id, document, metadata FROM records WHERE collection = ? AND id = ?",
+            (name, record_id)
+        ).fetchone()
+        return self._to_record(row) if row else None
+
+    def delete(self, name: str, record_id: str) -> bool:
+        conn = self._connection()
+        with self._write_lock:
+            matrix = self._begin_matrix_write(name)
+            self._collection_state(conn, name)
+            cursor = conn.execute("DELETE FROM records WHERE collection = ? AND id = ?",
+                                  (name, record_id))
+            version = self._record_write(conn, name, -cursor.rowcount)
+            conn.commit()
+            if matrix is not None:
+                with self._matrix_lock.write():
+                    matrix.remove(record_id)
+                    matrix.version = version
+        return cursor.rowcount > 0
+
+    def clear(self, name: str) -> bool:
+        conn = self._connection()
+        with self._write_lock:
+            matrix = self._begin_matrix_write(name)
+            self._collection_state(conn, name)
+            deleted = conn.execute("DELETE FROM records WHERE collection = ?", (name,)).rowcount
+            version = self._record_write(conn, name, -deleted)
+            conn.commit()
+            if matrix is not None:
+                with self._matrix_lock.write():
+                    matrix.clear()
+                    matrix.version = version
+        return True
+
+    def history(self, name: str, limit: int, before: Optional[str] = None,
+                after: Optional[str] = None) -> List[Dict[str, Any]]:
+        if limit <= 0:
+            return []
+        conn = self._connection()
+        cursor = after if after is not None else before
+        bound: tuple = ()
+        if cursor is not None:
+            row = conn.execute("SELECT created_at FROM records WHERE collection = ? AND id = ?",
+                               (name, cursor)).fetchone()
+            if row:
+                bound = (row[0], cursor)
+            elif is_timestamp(cursor):
+                # Timestamps bound every record created at that instant
+                bound = (cursor, "" if after is None else "\uffff")
+            else:
+                return []
+
+        if after is not None:
+            rows = conn.execute(
+                "SELECT id, document, metadata FROM records WHERE collection = ? "
+                "AND (created_at, id) > (?, ?) ORDER BY created_at, id LIMIT ?",
+                (name, *bound, limit)
+            ).fetchall()
+            rows.reverse()
+        elif bound:
+            rows = conn.execute(
+                "SELECT id, document, metadata FROM records WHERE collection = ? "
+                "AND (created_at, id) < (?, ?) ORDER BY created_at DESC, id DESC LIMIT ?",
+                (name, *bound, limit)
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                "SELECT id, document, metadata FROM records WHERE collection = ? "
+                "ORDER BY created_at DESC, id DESC LIMIT ?",
+                (name, limit)
+            ).fetchall()
+        return [self._to_record(row) for row in rows]
+
+    def get_many(self, name: str, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        rows = self._connection().execute(
+            f"SELECT id, document, metadata FROM records WHERE collection = ? AND id IN ({placeholders})",
+            (name, *ids)
+        ).fetchall()
+        return {row[0]: self._to_record(row) for row in rows}
+
+    def vectors(self, name: str) -> Tuple[List[str], np.ndarray]:
+        matrix = self.matrices[name]
+        with self._matrix_lock.read():
+            return matrix.ids, np.array(matrix.vectors[:len(matrix)]) if len(matrix) else np.zeros((0, 0), dtype=np.float32)
+
+    def vector_search(self, name: str, query: np.ndarray, k: int) -> List[Tuple[Dict[str, Any], float]]:
+        # Writers swap rows in place, so score and decode ids under a read lock;
+        # scans run side by side and only exclude a writer applying its rows
+        matrix = self.matrices.get(name)
+        with self._matrix_lock.read():
+            if matrix is None or not len(matrix) or query.shape[0] != matrix.dim:
+                return []
+            matches = matrix.search(query, k)
+        records = self.get_many(name, [record_id for record_id, _ in matches])
+        return [(records[record_id], similarity) for record_id, similarity in matches
+                if record_id in records]
+
+    def text_search(self, name: str, query: str, k: int) -> List[Tuple[Dict[str, Any], float]]:
+        terms = tokenize(query)
+        if not terms or k <= 0:
+            return []
+        match = " OR ".join(f'"{term}"' for term in terms)
+        rows = self._connection().execute(
+            "SELECT r.id, r.document, r.metadata, bm25(records_fts) AS rank "
+            "FROM records_fts JOIN records r ON r.pk = records_fts.rowid "
+            "WHERE records_fts MATCH ? AND r.collection = ? ORDER BY rank LIMIT ?",
+            (match, name, k)
+        ).fetchall()
+        # FTS5's bm25() is negated so that lower sorts first
+        return [(self._to_record(row), -row[3]) for row in rows]
+
+    def close(self):
+        with self._write_lock, self._matrix_lock.write():
+            for matrix in self.matrices.values():
+                matrix.close()
+            self.matrices = {}
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
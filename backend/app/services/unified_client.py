@@ -1,14 +1,30 @@
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, AsyncIterator
+import asyncio
 import logging
 import re
+import time
+
+from starlette.concurrency import run_in_threadpool
 
 # Stability AI for image generation (PRIMARY)
-from app.services.stabilityai_client import StabilityAIImageClient, generate_image as stability_generate_image
+from app.services.stabilityai_client import StabilityAIImageClient
+from app.services.image_cache import ImageCache
+from app.services.prompt_cache import PromptCache
+from app.services.singleflight import SingleFlight
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.bulkhead import BulkheadFull, Bulkheads, parse_bulkhead_limits
+from app.services import deadline
+from app.services.deadline import DeadlineExceeded
+from app.services.errors import ProviderError, QuotaExceededError, RateLimitError
+from app.services.provider_router import ProviderRouter
+from app.services.hedging import Hedger
 
 # Text generation clients
 from app.services.groq_client import GroqClient
 from app.services.openai_client import OpenAIClient
 from app.services.ollama_client import OllamaClient
+from app.services.http_transport import close_http_clients
+from app.services.rate_limiter import rate_limiter_stats
 from app.config import settings
 
 logger = logging.getLogger(__name__)
@@ -16,60 +32,18 @@ logger = logging.getLogger(__name__)
 
 def is_quota_error(error: Exception) -> bool:
     """
-    Check if the error is a quota/rate-limit error (429, 403, or resource exhausted).
+    Check if the error is a quota/rate-limit error (429, 402, or exhausted quota).
     """
-    error_str = str(error).lower()
-    
-    # Check for 429 (rate limit) errors
-    if "429" in error_str:
-        return True
-    
-    # Check for quota exceeded messages
-    if "quota" in error_str and ("exceeded" in error_str or "exhausted" in error_str):
-        return True
-    
-    # Check for resource exhausted
-    if "resource_exhausted" in error_str:
-        return True
-    
-    # Check for 403 forbidden (API key issues)
-    if "403" in error_str:
-        return True
-    
-    # Check for billing/quota related messages
-    if "billing" in error_str or "plan" in error_str:
-        return True
-    
-    return False
+    return isinstance(error, (RateLimitError, QuotaExceededError))
 
 
 def is_retryable_error(error: Exception) -> bool:
     """
     Check if the error is retryable (temporary failure, not permanent).
+    Timeouts, connection failures, 5xx and rate limits are; quota exhaustion,
+    auth failures, bad requests and untyped errors are not.
     """
-    error_str = str(error).lower()
-    
-    # Quota errors are retryable (with different provider)
-    if is_quota_error(error):
-        return True
-    
-    # Timeout errors are retryable
-    if "timeout" in error_str or "timed out" in error_str:
-        return True
-    
-    # Service unavailable
-    if "503" in error_str or "unavailable" in error_str:
-        return True
-    
-    # Rate limiting
-    if "rate limit" in error_str:
-        return True
-    
-    # Connection errors for local Ollama
-    if "cannot connect" in error_str or "connection" in error_str:
-        return True
-    
-    return False
+    return isinstance(error, ProviderError) and error.retryable
 
 
 class UnifiedClient:
@@ -87,6 +61,25 @@ class UnifiedClient:
         
         # Image generation client
         self.stability_client = None
+        self.image_cache = None
+        
+        # Coalesce identical in-flight calls for opted-in methods
+        self.singleflight = SingleFlight()
+        self.singleflight_methods = {
+            m.strip() for m in settings.singleflight_methods.split(",") if m.strip()
+        }
+        
+        # Cache for prompt enhancement results
+        self.prompt_cache = None
+        if settings.prompt_cache_enabled:
+            try:
+                self.prompt_cache = PromptCache(
+                    settings.prompt_cache_path,
+                    ttl_seconds=settings.prompt_cache_ttl_seconds,
+                    max_entries=settings.prompt_cache_max_entries
+                )
+            except Exception as e:
+                logger.warning(f"Prompt cache not available: {e}")
         
         # Initialize Ollama client (local, no API key needed) - PRIMARY for text
         try:
@@ -114,12 +107,62 @@ class UnifiedClient:
         # Initialize Stability AI for image generation - PRIMARY
         if settings.stability_api_key:
             try:
-                self.stability_client = StabilityAIImageClient(api_key=settings.stability_api_key)
+                if settings.image_cache_enabled:
+                    self.image_cache = ImageCache(
+                        settings.image_cache_db_path,
+                        max_entries=settings.image_cache_max_entries
+                    )
+                self.stability_client = StabilityAIImageClient(
+                    api_key=settings.stability_api_key,
+                    out_dir=settings.image_dir,
+                    url_prefix=settings.image_url_prefix,
+                    http2=settings.stability_http2,
+                    cache=self.image_cache
+                )
                 logger.info("Stability AI client initialized (PRIMARY for images)")
             except Exception as e:
                 logger.error(f"Failed to initialize Stability AI client: {e}")
         else:
             logger.warning("STABILITY_API_KEY not configured - image generation will not work")
+        
+        # Adaptive ordering of text providers by observed latency and error rate
+        self.router = None
+        if settings.router_enabled:
+            self.router = ProviderRouter(
+                alpha=settings.router_ewma_alpha,
+                explore_fraction=settings.router_explore_fraction,
+                preferred=settings.preferred_provider.lower(),
+                preferred_bias=settings.router_preferred_bias
+            )
+        
+        # Hedged requests for latency-critical text methods
+        self.hedge_methods = {
+            m.strip() for m in settings.hedge_methods.split(",") if m.strip()
+        }
+        self.hedger = Hedger(
+            percentile=settings.hedge_percentile,
+            min_delay=settings.hedge_min_delay,
+            default_delay=settings.hedge_default_delay
+        )
+        
+        # Concurrency caps per provider (and optionally per provider.method)
+        self.bulkheads = Bulkheads(
+            parse_bulkhead_limits(settings.bulkhead_limits),
+            queue_timeout=settings.bulkhead_queue_timeout
+        )
+        
+        # Circuit breakers per text provider, with background health probes where available
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        for provider in ("ollama", "groq", "openai"):
+            client = self._text_client(provider)
+            if client:
+                self.breakers[provider] = CircuitBreaker(
+                    provider,
+                    failure_threshold=settings.breaker_failure_threshold,
+                    reset_timeout=settings.breaker_reset_timeout,
+                    probe=getattr(client, "health_check", None),
+                    probe_interval=settings.breaker_probe_interval
+                )
     
     def _extract_response(self, result: Any, method_name: str) -> Any:
         """
@@ -138,7 +181,7 @@ class UnifiedClient:
             # Check for success field
             if not result.get("success", True):
                 error_msg = result.get("error", "Unknown error")
-                raise Exception(error_msg)
+                raise result.get("exception") or Exception(error_msg)
             
             # Try to extract the response based on method name
             if method_name == "chat":
@@ -156,13 +199,8 @@ class UnifiedClient:
         # Return as-is for other types
         return result
     
-    def _try_text_providers(self, method_name: str, *args, **kwargs) -> Any:
-        """
-        Try each text provider in order until one succeeds.
-        Falls back to next provider on quota/rate-limit errors.
-        """
-        errors = []
-        
+    def _provider_order(self) -> List[str]:
+        """Get the static text provider order from the preferred provider setting."""
         # Get preferred provider from settings
         preferred = getattr(settings, 'preferred_provider', 'ollama').lower()
         logger.info(f"Preferred text provider: {preferred}")
@@ -180,66 +218,121 @@ class UnifiedClient:
             provider_order = ["ollama", "groq", "openai"]
         
         logger.info(f"Text provider order: {provider_order}")
+        return provider_order
+    
+    def _routed_order(self, method_name: str) -> List[str]:
+        """Order the configured text providers for a method, adaptively if the router is on."""
+        providers = [p for p in self._provider_order() if self._text_client(p)]
+        if not self.router:
+            return providers
+        ordered = self.router.order(method_name, providers)
+        if ordered != providers:
+            logger.info(f"Routed order for {method_name}: {ordered}")
+        return ordered
+    
+    def _text_client(self, provider: str) -> Any:
+        """Get the configured client for a text provider, or None."""
+        return {
+            "ollama": self.ollama_client,
+            "groq": self.groq_client,
+            "openai": self.openai_client
+        }.get(provider)
+    
+    async def _call_text_provider(self, provider: str, method_name: str, *args, **kwargs) -> Any:
+        """Run a text method on one provider and extract its response."""
+        if provider == "ollama":
+            # Ollama returns raw string, just return it
+            return await getattr(self.ollama_client, method_name)(*args, **kwargs)
+        
+        # Map method names for OpenAI/Groq
+        client = self._text_client(provider)
+        mapped_method = "generate_chat_response" if method_name == "chat" else method_name
+        client_method = getattr(client, mapped_method)
+        
+        # Only pass the first argument (messages for chat)
+        if mapped_method == "generate_chat_response":
+            result = await client_method(args[0] if args else [])
+        elif mapped_method == "generate_narrative":
+            result = await client_method(args[0] if args else "", kwargs.get("context"))
+        elif mapped_method == "enhance_prompt":
+            result = await client_method(args[0] if args else "")
+        else:
+            result = await client_method(*args, **kwargs)
+        
+        # Extract response from OpenAI/Groq format
+        return self._extract_response(result, method_name)
+    
+    def _record_outcome(self, provider: str, error: Optional[Exception] = None,
+                        method_name: Optional[str] = None, latency: Optional[float] = None):
+        """Feed a call outcome into the router's averages and the provider's circuit breaker."""
+        if isinstance(error, DeadlineExceeded):
+            # Our budget ran out; says nothing about the provider's health
+            breaker = self.breakers.get(provider)
+            if breaker:
+                breaker.release()
+            return
+        if self.router and method_name and latency is not None:
+            self.router.record(provider, method_name, latency, error is None)
+        breaker = self.breakers.get(provider)
+        if not breaker:
+            return
+        if error is None:
+            breaker.record_success()
+        elif is_retryable_error(error):
+            breaker.record_failure()
+        else:
+            breaker.release()
+    
+    def _circuit_allows(self, provider: str) -> bool:
+        """Whether the provider's circuit lets a request through."""
+        breaker = self.breakers.get(provider)
+        return breaker.allow_request() if breaker else True
+    
+    async def _try_text_providers(self, method_name: str, *args, **kwargs) -> Any:
+        """
+        Try each text provider in routed order until one succeeds.
+        Falls back to next provider on quota/rate-limit errors.
+        Providers with an open circuit are skipped without a request.
+        """
+        if method_name in self.hedge_methods:
+            return await self._hedge_text_providers(method_name, *args, **kwargs)
+        
+        errors = []
+        
+        provider_order = self._routed_order(method_name)
         
         for provider in provider_order:
+            if not self._text_client(provider):
+                continue
+            
+            deadline.check()
+            if not self._circuit_allows(provider):
+                logger.info(f"Skipping {provider} for {method_name}: circuit open")
+                errors.append(f"{provider}: circuit open")
+                continue
+            
+            started = time.perf_counter()
             try:
-                result = None
-                
-                if provider == "openai" and self.openai_client:
-                    # Map method names for OpenAI
-                    mapped_method = method_name
-                    if method_name == "chat":
-                        mapped_method = "generate_chat_response"
-                    client_method = getattr(self.openai_client, mapped_method, None)
-                    if client_method:
-                        logger.info(f"Trying {provider} for {method_name}")
-                        # Only pass the first argument (messages for chat)
-                        if mapped_method == "generate_chat_response":
-                            result = client_method(args[0] if args else [])
-                        elif mapped_method == "generate_narrative":
-                            result = client_method(args[0] if args else "", kwargs.get("context"))
-                        elif mapped_method == "enhance_prompt":
-                            result = client_method(args[0] if args else "")
-                        else:
-                            result = client_method(*args, **kwargs)
-                        
-                        # Extract response from OpenAI format
-                        extracted = self._extract_response(result, method_name)
-                        logger.info(f"{provider} succeeded for {method_name}")
-                        return extracted
-                
-                elif provider == "ollama" and self.ollama_client:
-                    client_method = getattr(self.ollama_client, method_name, None)
-                    if client_method:
-                        logger.info(f"Trying {provider} for {method_name}")
-                        result = client_method(*args, **kwargs)
-                        # Ollama returns raw string, just return it
-                        logger.info(f"{provider} succeeded for {method_name}")
-                        return result
+                logger.info(f"Trying {provider} for {method_name}")
+                async with self.bulkheads.slot(provider, method_name):
+                    result = await self._call_text_provider(provider, method_name, *args, **kwargs)
+                self._record_outcome(provider, None, method_name, time.perf_counter() - started)
+                logger.info(f"{provider} succeeded for {method_name}")
+                return result
                 
-                elif provider == "groq" and self.groq_client:
-                    # Map method names for Groq
-                    mapped_method = method_name
-                    if method_name == "chat":
-                        mapped_method = "generate_chat_response"
-                    client_method = getattr(self.groq_client, mapped_method, None)
-                    if client_method:
-                        logger.info(f"Trying {provider} for {method_name}")
-                        # Only pass the first argument (messages for chat)
-                        if mapped_method == "generate_chat_response":
-                            result = client_method(args[0] if args else [])
-                        elif mapped_method == "generate_narrative":
-                            result = client_method(args[0] if args else "", kwargs.get("context"))
-                        elif mapped_method == "enhance_prompt":
-                            result = client_method(args[0] if args else "")
-                        else:
-                            result = client_method(*args, **kwargs)
-                        
-                        # Extract response from Groq format
-                        extracted = self._extract_response(result, method_name)
-                        logger.info(f"{provider} succeeded for {method_name}")
-                        return extracted
-                        
+            except asyncio.CancelledError:
+                self.breakers[provider].release()
+                raise
+            except BulkheadFull as e:
+                # Local back-pressure, not a provider failure: move on without recording it
+                self.breakers[provider].release()
+                logger.warning(f"Skipping {provider} for {method_name}: {e}")
+                errors.append(f"{provider}: {e}")
+                continue
+            except DeadlineExceeded:
+                # No time left for this or any other provider
+                self.breakers[provider].release()
+                raise
             except Exception as e:
                 error_msg = str(e)
                 is_quota = is_quota_error(e)
@@ -252,6 +345,7 @@ class UnifiedClient:
                 elif not is_retryable:
                     logger.warning(f"Non-retryable error from {provider}. Will try next provider.")
                 
+                self._record_outcome(provider, e, method_name, time.perf_counter() - started)
                 errors.append(f"{provider}: {error_msg}")
                 
                 # Continue to next provider
@@ -262,7 +356,202 @@ class UnifiedClient:
         logger.error(error_msg)
         raise Exception(error_msg)
     
-    def generate_narrative(self, prompt: str, context: Optional[str] = None) -> str:
+    async def _timed_text_call(self, provider: str, method_name: str, *args, **kwargs) -> Any:
+        """Call one provider, feeding its outcome to the breaker, router and hedger."""
+        started = time.perf_counter()
+        try:
+            async with self.bulkheads.slot(provider, method_name):
+                result = await self._call_text_provider(provider, method_name, *args, **kwargs)
+        except (asyncio.CancelledError, BulkheadFull):
+            self.breakers[provider].release()
+            raise
+        except Exception as e:
+            self._record_outcome(provider, e, method_name, time.perf_counter() - started)
+            raise
+        latency = time.perf_counter() - started
+        self._record_outcome(provider, None, method_name, latency)
+        self.hedger.record_latency(provider, method_name, latency)
+        return result
+    
+    async def _hedge_text_providers(self, method_name: str, *args, **kwargs) -> Any:
+        """
+        Call providers in routed order, hedging on slowness.
+        If the running provider has not answered within its percentile delay,
+        the next provider is started too; the first success wins and the
+        other call is cancelled. A failure starts the next provider at once.
+        """
+        self.hedger.note_call(method_name)
+        remaining = iter(self._routed_order(method_name))
+        pending: Dict[asyncio.Task, str] = {}
+        hedges = set()
+        can_hedge = True
+        errors = []
+        
+        def launch() -> bool:
+            for provider in remaining:
+                if not self._circuit_allows(provider):
+                    errors.append(f"{provider}: circuit open")
+                    continue
+                logger.info(f"Trying {provider} for {method_name}")
+                task = asyncio.ensure_future(
+                    self._timed_text_call(provider, method_name, *args, **kwargs)
+                )
+                pending[task] = provider
+                return True
+            return False
+        
+        try:
+            launch()
+            while pending:
+                timeout = None
+                if can_hedge and len(pending) == 1 and not hedges:
+                    timeout = self.hedger.delay(next(iter(pending.values())), method_name)
+                
+                done, _ = await asyncio.wait(pending, timeout=timeout,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    before = set(pending)
+                    if launch():
+                        hedges.update(set(pending) - before)
+                        self.hedger.note_hedge(method_name)
+                        logger.info(f"Hedging {method_name} after {timeout:.2f}s")
+                    else:
+                        can_hedge = False
+                    continue
+                
+                for task in done:
+                    provider = pending.pop(task)
+                    if isinstance(task.exception(), DeadlineExceeded):
+                        raise task.exception()
+                    if task.exception() is None:
+                        if task in hedges:
+                            self.hedger.note_hedge_win(method_name)
+                        logger.info(f"{provider} succeeded for {method_name}")
+                        return task.result()
+                    logger.warning(f"{provider} failed for {method_name}: {task.exception()}")
+                    errors.append(f"{provider}: {task.exception()}")
+                
+                if not pending:
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+        
+        error_msg = f"All providers failed for {method_name}: {'; '.join(errors)}"
+        logger.error(error_msg)
+        raise Exception(error_msg)
+    
+    def _open_text_stream(self, provider: str, method_name: str, *args, **kwargs) -> Optional[AsyncIterator[str]]:
+        """Open a token stream for a method on a provider, or None if unsupported."""
+        if provider == "ollama" and self.ollama_client:
+            if method_name == "chat":
+                return self.ollama_client.chat_stream(args[0] if args else [], kwargs.get("context"))
+            if method_name == "generate_narrative":
+                return self.ollama_client.generate_narrative_stream(args[0] if args else "", kwargs.get("context"))
+        elif provider == "groq" and self.groq_client:
+            if method_name == "chat":
+                return self.groq_client.generate_chat_response_stream(args[0] if args else [])
+            if method_name == "generate_narrative":
+                return self.groq_client.generate_narrative_stream(args[0] if args else "", kwargs.get("context"))
+        elif provider == "openai" and self.openai_client:
+            # OpenAI client has no streaming path; relay the full response as one chunk
+            async def single_chunk():
+                yield await self._call_text_provider(provider, method_name, *args, **kwargs)
+            return single_chunk()
+        return None
+    
+    async def _stream_text_providers(self, method_name: str, providers: List[str], 
+                                     *args, **kwargs) -> AsyncIterator[str]:
+        """
+        Stream tokens from the first provider that produces one.
+        Falls back to the next provider on any error before the first token;
+        errors after streaming has started are raised to the caller.
+        """
+        errors = []
+        
+        for provider in providers:
+            if not self._text_client(provider):
+                continue
+            
+            if not self._circuit_allows(provider):
+                logger.info(f"Skipping {provider} for streaming {method_name}: circuit open")
+                errors.append(f"{provider}: circuit open")
+                continue
+            
+            stream = self._open_text_stream(provider, method_name, *args, **kwargs)
+            if stream is None:
+                self.breakers[provider].release()
+                continue
+            
+            # The slot is held for the whole stream, not just the first token
+            try:
+                held = await self.bulkheads.acquire(provider, method_name)
+            except BulkheadFull as e:
+                self.breakers[provider].release()
+                logger.warning(f"Skipping {provider} for streaming {method_name}: {e}")
+                errors.append(f"{provider}: {e}")
+                continue
+            except asyncio.CancelledError:
+                self.breakers[provider].release()
+                raise
+            
+            try:
+                try:
+                    logger.info(f"Trying {provider} for streaming {method_name}")
+                    first = await stream.__anext__()
+                except StopAsyncIteration:
+                    self._record_outcome(provider)
+                    return
+                except asyncio.CancelledError:
+                    self.breakers[provider].release()
+                    raise
+                except Exception as e:
+                    logger.warning(f"{provider} failed for streaming {method_name}: {e}")
+                    self._record_outcome(provider, e)
+                    errors.append(f"{provider}: {e}")
+                    continue
+                
+                self._record_outcome(provider)
+                logger.info(f"{provider} started streaming {method_name}")
+                try:
+                    yield first
+                    async for token in stream:
+                        deadline.check()
+                        yield token
+                finally:
+                    await stream.aclose()
+                return
+            finally:
+                self.bulkheads.release(held)
+        
+        error_msg = f"All providers failed for {method_name}: {'; '.join(errors) or 'no streaming provider available'}"
+        logger.error(error_msg)
+        raise Exception(error_msg)
+    
+    def stream_chat(self, messages: List[Dict[str, str]], context: Optional[str] = None) -> AsyncIterator[str]:
+        """Stream a chat response token by token, with provider fallback before the first token."""
+        return self._stream_text_providers("chat", self._routed_order("chat"), messages, context=context)
+    
+    def stream_narrative(self, prompt: str, context: Optional[str] = None) -> AsyncIterator[str]:
+        """Stream an automotive narrative token by token using Groq, like generate_narrative."""
+        if not self.groq_client:
+            raise Exception("Groq API key not configured. Please set GROQ_API_KEY in .env")
+        return self._stream_text_providers("generate_narrative", ["groq"], prompt, context=context)
+    
+    async def _coalesce(self, method_name: str, fn, *args, **kwargs) -> Any:
+        """
+        Run fn, sharing one in-flight call among identical concurrent requests if opted in.
+        Each caller's wait is bounded by its own request deadline. The shared call
+        runs without one, so it is not cut short by whichever caller started it;
+        it keeps running while any waiter remains.
+        """
+        if method_name not in self.singleflight_methods:
+            return await deadline.run(fn(*args, **kwargs))
+        key = SingleFlight.make_key(method_name, *args, **kwargs)
+        return await deadline.run(self.singleflight.do(
+            method_name, key, lambda: deadline.unbounded(fn(*args, **kwargs))))
+    
+    async def generate_narrative(self, prompt: str, context: Optional[str] = None) -> str:
         """
         Generate an automotive narrative using Groq only.
         
@@ -273,29 +562,50 @@ class UnifiedClient:
         Returns:
             Generated narrative text
         """
+        return await self._coalesce("generate_narrative", self._generate_narrative, prompt, context)
+    
+    async def _generate_narrative(self, prompt: str, context: Optional[str] = None) -> str:
         # Use Groq directly for narrative generation - no fallback to Ollama
         if not self.groq_client:
             raise Exception("Groq API key not configured. Please set GROQ_API_KEY in .env")
         
+        if not self._circuit_allows("groq"):
+            raise Exception("Narrative generation failed: Groq circuit open, provider unavailable")
+        
         try:
             logger.info(f"Generating narrative with Groq: {prompt[:50]}...")
-            result = self.groq_client.generate_narrative(prompt, context)
+            async with self.bulkheads.slot("groq", "generate_narrative"):
+                result = await self.groq_client.generate_narrative(prompt, context)
             
             if result.get("success"):
                 narrative = result.get("response", "")
                 logger.info(f"Narrative generated successfully: {len(narrative)} chars")
+                self._record_outcome("groq")
                 return narrative
             else:
                 error = result.get("error", "Unknown error")
                 logger.error(f"Groq narrative generation failed: {error}")
-                raise Exception(error)
+                raise result.get("exception") or Exception(error)
                 
+        except (asyncio.CancelledError, DeadlineExceeded):
+            # Not a provider failure; let the deadline reach the middleware unchanged
+            self.breakers["groq"].release()
+            raise
+        except BulkheadFull as e:
+            self.breakers["groq"].release()
+            raise Exception(f"Narrative generation failed: {str(e)}")
+        except ProviderError as e:
+            self._record_outcome("groq", e)
+            logger.error(f"Narrative generation error: {str(e)}")
+            raise
         except Exception as e:
+            self._record_outcome("groq", e)
             logger.error(f"Narrative generation error: {str(e)}")
             raise Exception(f"Narrative generation failed: {str(e)}")
     
-    def generate_image(self, prompt: str, size: str = "1024x1024", 
-                      quality: str = "standard", style: str = "vivid") -> str:
+    async def generate_image(self, prompt: str, size: str = "1024x1024", 
+                             quality: str = "standard", style: str = "vivid",
+                             seed: Optional[int] = None) -> str:
         """
         Generate an image using Stability AI.
         
@@ -304,10 +614,18 @@ class UnifiedClient:
             size: Image size (passed for compatibility)
             quality: Image quality (passed for compatibility)
             style: Image style (passed for compatibility)
+            seed: Optional explicit seed for reproducible (and cacheable) results
             
         Returns:
             Image URL or error message
         """
+        return await self._coalesce("generate_image", self._generate_image, prompt, size, quality, style, seed)
+    
+    async def _generate_image(self, prompt: str, size: str, quality: str, style: str,
+                              seed: Optional[int]) -> str:
+        if not self.stability_client:
+            raise Exception("Image generation failed: STABILITY_API_KEY not configured")
+        
         try:
             logger.info(f"Generating image with Stability AI: {prompt[:50]}...")
             
@@ -319,12 +637,14 @@ class UnifiedClient:
                 except:
                     pass
             
-            # Use Stability AI for image generation
-            result = stability_generate_image(
-                prompt=prompt,
-                width=width,
-                height=height
-            )
+            # Use the long-lived Stability AI client
+            async with self.bulkheads.slot("stability", "generate_image"):
+                result = await self.stability_client.generate_image(
+                    prompt=prompt,
+                    width=width,
+                    height=height,
+                    seed=seed
+                )
             
             if result.get("success"):
                 image_url = result.get("image_url")
@@ -333,19 +653,38 @@ class UnifiedClient:
             else:
                 error = result.get("error", "Unknown error")
                 logger.error(f"Stability AI image generation failed: {error}")
-                raise Exception(error)
+                raise result.get("exception") or Exception(error)
                 
+        except (DeadlineExceeded, ProviderError):
+            raise
         except Exception as e:
             logger.error(f"Image generation error: {str(e)}")
             raise Exception(f"Image generation failed: {str(e)}")
     
-    def enhance_prompt(self, prompt: str) -> str:
+    async def enhance_prompt(self, prompt: str) -> str:
         """Enhance a prompt."""
+        return await self._coalesce("enhance_prompt", self._enhance_prompt, prompt)
+    
+    async def _enhance_prompt(self, prompt: str) -> str:
         # Use local enhancement if no API keys available
         if not self.openai_client and not self.ollama_client and not self.groq_client:
             return self._local_enhance(prompt)
         
-        return self._try_text_providers("enhance_prompt", prompt)
+        if not self.prompt_cache:
+            return await self._try_text_providers("enhance_prompt", prompt)
+        
+        cache_key = PromptCache.make_key(prompt)
+        enhanced = self.prompt_cache.get_memory(cache_key)
+        if enhanced is None:
+            enhanced = await run_in_threadpool(self.prompt_cache.get_disk, cache_key)
+        if enhanced is not None:
+            logger.info(f"Prompt cache hit: {prompt[:50]}...")
+            return enhanced
+        
+        enhanced = await self._try_text_providers("enhance_prompt", prompt)
+        if enhanced:
+            await run_in_threadpool(self.prompt_cache.put, cache_key, enhanced)
+        return enhanced
     
     def _local_enhance(self, prompt: str) -> str:
         """Local prompt enhancement without API calls."""
@@ -368,6 +707,31 @@ class UnifiedClient:
         
         return f"{prompt}, {', '.join(selected)}"
     
-    def chat(self, messages: List[Dict[str, str]], context: Optional[str] = None) -> str:
+    async def chat(self, messages: List[Dict[str, str]], context: Optional[str] = None) -> str:
         """Chat with the AI."""
-        return self._try_text_providers("chat", messages, context=context)
+        return await self._coalesce("chat", self._try_text_providers, "chat", messages, context=context)
+    
+    def metrics(self) -> Dict[str, Any]:
+        """Runtime metrics for caches and upstream calls."""
+        return {
+            "image_cache": self.image_cache.stats() if self.image_cache else None,
+            "prompt_cache": self.prompt_cache.stats() if self.prompt_cache else None,
+            "singleflight": self.singleflight.stats(),
+            "circuit_breakers": {name: b.stats() for name, b in self.breakers.items()},
+            "router": self.router.stats() if self.router else None,
+            "hedging": self.hedger.stats() if self.hedge_methods else None,
+            "rate_limits": rate_limiter_stats(),
+            "bulkheads": self.bulkheads.stats()
+        }
+    
+    async def aclose(self):
+        """Release pooled provider connections."""
+        if self.stability_client:
+            await self.stability_client.aclose()
+        if self.prompt_cache:
+            self.prompt_cache.close()
+        if self.image_cache:
+            self.image_cache.close()
+        for breaker in self.breakers.values():
+            breaker.close()
+        await close_http_clients()
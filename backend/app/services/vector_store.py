@@ -1,57 +1,542 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Callable, Optional, Tuple
+import bisect
 import logging
 import uuid
 import json
 import os
+import threading
+import time
 from datetime import datetime
 from pathlib import Path
 
+import numpy as np
+
+from app.services.ann_index import IVFIndex
+from app.services.bm25 import BM25Index
+from app.services.embedding_matrix import MappedEmbeddingMatrix
+from app.services.embeddings import HashingEmbedder
+from app.services.record_log import RecordLog
+from app.services.storage_backend import StorageBackend, is_timestamp, safe_name
+
 logger = logging.getLogger(__name__)
 
-class VectorStore:
-    """In-memory vector store with JSON file persistence for storing automotive generations."""
+
+class HistoryIndex:
+    """
+    Record ids kept in (created_at, id) order for one collection.
+    New records carry the latest timestamp, so inserts are appends; a page
+    next to either end or to a known key is a bisect plus a slice.
+    """
     
-    def __init__(self, persist_dir: str = "./chroma_data"):
-        self.persist_dir = persist_dir
-        self.collections: Dict[str, List[Dict]] = {}
-        self._ensure_persist_dir()
+    def __init__(self, records: Optional[List[Dict]] = None):
+        self.keys: List[Tuple[str, str]] = sorted(
+            (self.key(r), r["id"]) for r in records or []
+        )
+        self.created: Dict[str, str] = {
+            record_id: created_at for created_at, record_id in self.keys
+        }
     
-    def _ensure_persist_dir(self):
-        """Create persist directory if it doesn't exist."""
-        Path(self.persist_dir).mkdir(parents=True, exist_ok=True)
+    def __len__(self) -> int:
+        return len(self.keys)
+    
+    @staticmethod
+    def key(record: Dict) -> str:
+        return record.get("metadata", {}).get("created_at", "")
+    
+    def add(self, record: Dict):
+        entry = (self.key(record), record["id"])
+        if not self.keys or entry >= self.keys[-1]:
+            self.keys.append(entry)
+        else:
+            bisect.insort(self.keys, entry)
+        self.created[record["id"]] = entry[0]
+    
+    def remove(self, record_id: str) -> bool:
+        created_at = self.created.pop(record_id, None)
+        if created_at is None:
+            return False
+        position = bisect.bisect_left(self.keys, (created_at, record_id))
+        del self.keys[position]
+        return True
+    
+    def _position(self, cursor: str, side: str) -> Optional[int]:
+        """Index bounding a cursor (a record id or an ISO timestamp), or None if unknown."""
+        created_at = self.created.get(cursor)
+        if created_at is not None:
+            return bisect.bisect_left(self.keys, (created_at, cursor))
+        if not is_timestamp(cursor):
+            return None
+        # Timestamps bound every record created at that instant
+        if side == "before":
+            return bisect.bisect_left(self.keys, (cursor, ""))
+        return bisect.bisect_right(self.keys, (cursor, "\uffff"))
+    
+    def page(self, limit: int, before: Optional[str] = None,
+             after: Optional[str] = None) -> List[str]:
+        """
+        Record ids newest first: the latest `limit`, the `limit` just older
+        than `before`, or the `limit` just newer than `after`.
+        """
+        if limit <= 0:
+            return []
+        if after is not None:
+            start = self._position(after, "after")
+            if start is None:
+                return []
+            if after in self.created:
+                start += 1
+            return [record_id for _, record_id in reversed(self.keys[start:start + limit])]
+        
+        end = len(self.keys)
+        if before is not None:
+            end = self._position(before, "before")
+            if end is None:
+                return []
+        return [record_id for _, record_id in reversed(self.keys[max(end - limit, 0):end])]
+
+
+class LogBackend(StorageBackend):
+    """
+    In-memory collections with append-only log persistence. Embeddings live in
+    memory-mapped matrices and keyword search in a BM25 inverted index, both
+    reconciled against the log at startup.
+    """
     
-    def _get_file_path(self, collection_name: str) -> str:
-        """Get the file path for a collection's data."""
-        # Sanitize collection name for filename
-        safe_name = "".join(c for c in collection_name if c.isalnum() or c in "_-")
-        return os.path.join(self.persist_dir, f"{safe_name}.json")
+    # Compact once a log holds at least this many dead entries...
+    COMPACTION_MIN_DEAD = 64
+    # ...and dead entries outnumber live records by this ratio
+    COMPACTION_RATIO = 1.0
+    
+    def __init__(self, persist_dir: str, embed: Callable[[List[str]], np.ndarray]):
+        """
+        Args:
+            persist_dir: Directory holding one log per collection
+            embed: Embeds documents when a collection is loaded
+        """
+        self.persist_dir = persist_dir
+        self.embed = embed
+        self.collections: Dict[str, List[Dict]] = {}
+        self.matrices: Dict[str, MappedEmbeddingMatrix] = {}
+        self.record_index: Dict[str, Dict[str, Dict]] = {}
+        self.history_index: Dict[str, HistoryIndex] = {}
+        self.lexical_index: Dict[str, BM25Index] = {}
+        self.logs: Dict[str, RecordLog] = {}
+        self._compacting: set = set()
+        self._lock = threading.RLock()
     
     def _load_collection(self, collection_name: str) -> List[Dict]:
-        """Load collection from file if it exists."""
-        file_path = self._get_file_path(collection_name)
-        if os.path.exists(file_path):
+        """Load collection by replaying its record log, migrating a legacy JSON file if present."""
+        log = RecordLog(log_path(self.persist_dir, collection_name))
+        self.logs[collection_name] = log
+        
+        legacy_path = json_path(self.persist_dir, collection_name)
+        if not log.exists() and os.path.exists(legacy_path):
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                with open(legacy_path, 'r', encoding='utf-8') as f:
+                    records = json.load(f)
+                log.compact(records)
+                os.replace(legacy_path, f"{legacy_path}.migrated")
+                logger.info(f"Migrated collection {collection_name} to record log ({len(records)} records)")
+                return records
             except Exception as e:
-                logger.warning(f"Error loading collection {collection_name}: {e}")
+                logger.warning(f"Error migrating collection {collection_name}: {e}")
+                return []
+        
+        try:
+            return log.replay()
+        except Exception as e:
+            logger.warning(f"Error loading collection {collection_name}: {e}")
         return []
     
-    def _save_collection(self, collection_name: str):
-        """Save collection to file."""
-        file_path = self._get_file_path(collection_name)
+    def _append_log(self, collection_name: str, entry: Dict[str, Any]) -> bool:
+        """
+        Persist one mutation and schedule compaction when the log gets sparse.
+        
+        Returns:
+            Whether the entry was written
+        """
+        log = self.logs[collection_name]
         try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(self.collections.get(collection_name, []), f, indent=2, ensure_ascii=False)
+            log.append(entry)
         except Exception as e:
-            logger.error(f"Error saving collection {collection_name}: {e}")
+            logger.error(f"Error writing collection {collection_name}: {e}")
+            return False
+        
+        live = len(self.collections.get(collection_name, []))
+        dead = log.entry_count - live
+        if dead >= self.COMPACTION_MIN_DEAD and dead >= live * self.COMPACTION_RATIO:
+            self._schedule_compaction(collection_name)
+        return True
+    
+    def _log_applied(self, name: str, written: bool):
+        """Stamp the matrix with the log size it now matches (left dirty if the write failed)."""
+        if written:
+            self.matrices[name].version = self.logs[name].size()
+    
+    def _schedule_compaction(self, collection_name: str):
+        """Compact a collection's log on a background thread."""
+        with self._lock:
+            if collection_name in self._compacting:
+                return
+            self._compacting.add(collection_name)
+            log = self.logs[collection_name]
+            snapshot = list(self.collections.get(collection_name, []))
+            offset = log.size()
+        
+        def run():
+            try:
+                log.compact(snapshot, since_offset=offset)
+                with self._lock:
+                    # Same records, new log size: restamp so the next open stays O(1)
+                    matrix = self.matrices.get(collection_name)
+                    if matrix is not None and matrix.version:
+                        matrix.version = log.size()
+                    self._save_lexical_index(collection_name)
+            except Exception as e:
+                logger.error(f"Error compacting collection {collection_name}: {e}")
+            finally:
+                with self._lock:
+                    self._compacting.discard(collection_name)
+        
+        threading.Thread(target=run, name=f"compact-{collection_name}", daemon=True).start()
+    
+    def _build_matrix(self, name: str):
+        """
+        Open the collection's mapped embedding matrix and build its id and history
+        indexes. A matrix stamped with the current log size is used as is (O(1)).
+        Otherwise it is reconciled: only records missing from the matrix (e.g.
+        written before a crash) are embedded and rows for records no longer in
+        the log are dropped.
+        """
+        records = self.collections.get(name, [])
+        self.record_index[name] = {r["id"]: r for r in records}
+        self.history_index[name] = HistoryIndex(records)
+        
+        matrix = self.matrices.get(name)
+        if matrix is None:
+            matrix = MappedEmbeddingMatrix(matrix_path(self.persist_dir, name))
+            self.matrices[name] = matrix
+        
+        log_size = self.logs[name].size()
+        if matrix.version == log_size and len(matrix) == len(records):
+            return
+        
+        matrix.version = 0
+        stored = matrix.ids
+        for record_id in set(stored) - self.record_index[name].keys():
+            matrix.remove(record_id)
+        missing = [r for r in records if r["id"] not in matrix.rows]
+        if missing:
+            vectors = self.embed([r.get("document", "") for r in missing])
+            if matrix.dim is not None and vectors.shape[1] != matrix.dim:
+                # The embedder changed, so every stored vector is stale
+                matrix.reset(vectors.shape[1])
+                missing = records
+                vectors = self.embed([r.get("document", "") for r in missing])
+            for record, vector in zip(missing, vectors):
+                matrix.add(record["id"], vector)
+            logger.info(f"Embedded {len(missing)} records missing from {name} matrix")
+        matrix.version = log_size
+        matrix.flush()
+    
+    def _build_lexical_index(self, name: str):
+        """
+        Load the collection's BM25 snapshot if it was taken at the current end of
+        the log, otherwise re-tokenize every record.
+        """
+        records = self.collections.get(name, [])
+        index = BM25Index.load(bm25_path(self.persist_dir, name), version=self.logs[name].size())
+        if index is None or len(index) != len(records):
+            index = BM25Index()
+            for record in records:
+                index.add(record["id"], record.get("document", ""))
+            if records:
+                logger.info(f"Rebuilt BM25 index for {name} ({len(records)} records)")
+        self.lexical_index[name] = index
+    
+    def open_collection(self, name: str):
+        with self._lock:
+            if name not in self.collections:
+                self.collections[name] = self._load_collection(name)
+                self._build_matrix(name)
+                self._build_lexical_index(name)
+    
+    def count(self, name: str) -> int:
+        return len(self.collections.get(name, []))
+    
+    def put(self, name: str, record: Dict[str, Any], vector: np.ndarray):
+        MappedEmbeddingMatrix.check_id(record["id"])
+        with self._lock:
+            matrix = self.matrices[name]
+            if not len(matrix) and matrix.dim not in (None, vector.shape[0]):
+                matrix.reset(vector.shape[0])
+            matrix.version = 0
+            self.collections[name].append(record)
+            self.record_index[name][record["id"]] = record
+            self.history_index[name].add(record)
+            self.lexical_index[name].add(record["id"], record.get("document", ""))
+            matrix.add(record["id"], vector)
+            
+            # Append to the record log
+            self._log_applied(name, self._append_log(name, {"op": "put", "record": record}))
+    
+    def get(self, name: str, record_id: str) -> Optional[Dict[str, Any]]:
+        return self.record_index.get(name, {}).get(record_id)
+    
+    def vectors(self, name: str) -> Tuple[List[str], np.ndarray]:
+        with self._lock:
+            matrix = self.matrices[name]
+            return matrix.ids, np.array(matrix.vectors[:len(matrix)]) if len(matrix) else np.zeros((0, 0), dtype=np.float32)
+    
+    def delete(self, name: str, record_id: str) -> bool:
+        with self._lock:
+            records = self.collections.get(name, [])
+            
+            # Find and remove record
+            new_records = [r for r in records if r.get("id") != record_id]
+            
+            if len(new_records) < len(records):
+                self.collections[name] = new_records
+                self.matrices[name].version = 0
+                self.matrices[name].remove(record_id)
+                self.record_index[name].pop(record_id, None)
+                self.history_index[name].remove(record_id)
+                self.lexical_index[name].remove(record_id)
+                self._log_applied(name, self._append_log(name, {"op": "del", "id": record_id}))
+                return True
+        return False
+    
+    def clear(self, name: str) -> bool:
+        with self._lock:
+            if name in self.collections:
+                self.collections[name] = []
+                self.matrices[name].version = 0
+                self.matrices[name].clear()
+                self._build_matrix(name)
+                self.lexical_index[name] = BM25Index()
+                self._log_applied(name, self._append_log(name, {"op": "clear"}))
+                return True
+        return False
+    
+    def history(self, name: str, limit: int, before: Optional[str] = None,
+                after: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            records_by_id = self.record_index[name]
+            page = self.history_index[name].page(limit, before=before, after=after)
+            return [records_by_id[record_id] for record_id in page]
+    
+    def vector_search(self, name: str, query: np.ndarray, k: int) -> List[Tuple[Dict[str, Any], float]]:
+        # Held so a concurrent delete cannot swap rows between scoring and id lookup
+        with self._lock:
+            matrix = self.matrices[name]
+            if not len(matrix) or query.shape[0] != matrix.dim:
+                return []
+            records_by_id = self.record_index[name]
+            return [(records_by_id[record_id], similarity)
+                    for record_id, similarity in matrix.search(query, k)]
+    
+    def text_search(self, name: str, query: str, k: int) -> List[Tuple[Dict[str, Any], float]]:
+        """BM25 ranking over the postings of the query terms only."""
+        with self._lock:
+            index = self.lexical_index.get(name)
+            if index is None:
+                return []
+            records_by_id = self.record_index[name]
+            return [(records_by_id[record_id], score)
+                    for record_id, score in index.search(query, k)]
+    
+    def _save_lexical_index(self, name: str):
+        """Snapshot a BM25 index, stamped with the log size it reflects (caller holds the lock)."""
+        index = self.lexical_index.get(name)
+        if index is None:
+            return
+        try:
+            index.save(bm25_path(self.persist_dir, name), version=self.logs[name].size())
+        except Exception as e:
+            logger.warning(f"Error saving BM25 index for {name}: {e}")
+    
+    def close(self):
+        with self._lock:
+            for name in self.lexical_index:
+                self._save_lexical_index(name)
+        for log in self.logs.values():
+            log.close()
+        for matrix in self.matrices.values():
+            matrix.close()
+
+
+def log_path(persist_dir: str, collection_name: str) -> str:
+    """Path of a collection's append-only record log."""
+    return os.path.join(persist_dir, f"{safe_name(collection_name)}.log")
+
+
+def matrix_path(persist_dir: str, collection_name: str) -> str:
+    """File prefix of a collection's memory-mapped embedding matrix."""
+    return os.path.join(persist_dir, f"{safe_name(collection_name)}.embeddings")
+
+
+def bm25_path(persist_dir: str, collection_name: str) -> str:
+    """Path of a collection's BM25 index snapshot."""
+    return os.path.join(persist_dir, f"{safe_name(collection_name)}.bm25.json")
+
+
+def json_path(persist_dir: str, collection_name: str) -> str:
+    """Path of a collection's legacy JSON snapshot."""
+    return os.path.join(persist_dir, f"{safe_name(collection_name)}.json")
+
+
+class VectorStore:
+    """Vector store for automotive generations over a pluggable storage backend."""
+    
+    def __init__(self, persist_dir: str = "./chroma_data", embedder=None, image_store=None,
+                 backend: Optional[StorageBackend] = None, ann_min_records: int = 0,
+                 ann_nlist: int = 0, ann_nprobe: int = 0, ann_rebuild_fraction: float = 0.2,
+                 ann_target_recall: float = 0.9):
+        """
+        Args:
+            persist_dir: Data directory (record logs, and the SQLite file by default)
+            embedder: Document embedder (default: HashingEmbedder)
+            image_store: Offloads inline images out of records
+            backend: Record storage (default: LogBackend in persist_dir)
+            ann_min_records: Collection size at which vector search switches to an
+                IVF index (0: always search exactly)
+            ann_nlist: IVF lists (0: about 4 * sqrt(n))
+            ann_nprobe: IVF lists scanned per query by default (0: tuned at
+                build time to reach ann_target_recall)
+            ann_rebuild_fraction: Rebuild an index in the background once inserts
+                plus deletes since its build exceed this fraction of its size
+            ann_target_recall: recall@10 against exact search that a tuned nprobe reaches
+        """
+        self.persist_dir = persist_dir
+        self.image_store = image_store
+        self.embedder = embedder or HashingEmbedder()
+        self._ensure_persist_dir()
+        self.backend = backend or LogBackend(persist_dir, self._embed)
+        self._opened: set = set()
+        self._lock = threading.Lock()
+        
+        self.ann_min_records = ann_min_records
+        self.ann_nlist = ann_nlist
+        self.ann_nprobe = ann_nprobe
+        self.ann_rebuild_fraction = ann_rebuild_fraction
+        self.ann_target_recall = ann_target_recall
+        self.ann: Dict[str, IVFIndex] = {}
+        # Mutations seen while a collection's index is being (re)built, replayed onto it
+        self._ann_pending: Dict[str, List[tuple]] = {}
+        self._ann_lock = threading.Lock()
+    
+    def _ensure_persist_dir(self):
+        """Create persist directory if it doesn't exist."""
+        Path(self.persist_dir).mkdir(parents=True, exist_ok=True)
+    
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts, returning zero vectors if the embedder fails."""
+        try:
+            return self.embedder.embed(texts)
+        except Exception as e:
+            logger.warning(f"Embedding failed, storing zero vectors: {e}")
+            return np.zeros((len(texts), self.embedder.dim or 1), dtype=np.float32)
+    
+    def _import_log(self, name: str):
+        """
+        Copy a collection's record log (or legacy JSON) into an empty non-log backend.
+        The log is then renamed to .migrated, so records later deleted or cleared
+        from the backend are not imported again on the next start.
+        """
+        if isinstance(self.backend, LogBackend) or self.backend.count(name):
+            return
+        source_path = log_path(self.persist_dir, name)
+        if not (os.path.exists(source_path) or os.path.exists(json_path(self.persist_dir, name))):
+            return
+        source = LogBackend(self.persist_dir, self._embed)
+        source.open_collection(name)
+        records = source.collections[name]
+        if records:
+            matrix = source.matrices[name]
+            vectors = matrix.vectors[[matrix.rows[r["id"]] for r in records]]
+            self.backend.put_many(name, records, vectors)
+            logger.info(f"Imported {len(records)} records of {name} into {type(self.backend).__name__}")
+        source.close()
+        if os.path.exists(source_path):
+            os.replace(source_path, f"{source_path}.migrated")
     
     def get_or_create_collection(self, name: str) -> str:
         """Get or create a collection for storing embeddings."""
-        if name not in self.collections:
-            self.collections[name] = self._load_collection(name)
+        with self._lock:
+            if name not in self._opened:
+                self._import_log(name)
+                self.backend.open_collection(name)
+                self._opened.add(name)
+                self._ann_maybe_build(name)
         return name
     
+    def _ann_maybe_build(self, name: str):
+        """Start a background (re)build of a collection's IVF index if one is due."""
+        if self.ann_min_records <= 0:
+            return
+        with self._ann_lock:
+            if name in self._ann_pending:
+                return
+            current = self.ann.get(name)
+            if current is None:
+                if self.backend.count(name) < self.ann_min_records:
+                    return
+            elif not current.needs_rebuild():
+                return
+            self._ann_pending[name] = []
+        
+        def run():
+            started = time.monotonic()
+            index = IVFIndex(self.ann_nlist, self.ann_nprobe, self.ann_rebuild_fraction,
+                             self.ann_target_recall)
+            try:
+                # Copied here, off the request thread. Writes made since the pending
+                # list opened are replayed as well; a replayed add of a copied record
+                # only duplicates an entry, which search() de-duplicates
+                if current is None:
+                    ids, vectors = self.backend.vectors(name)
+                else:
+                    with self._ann_lock:
+                        ids, vectors = current.live_items()
+                index.build(ids, vectors)
+            except Exception as e:
+                logger.error(f"Error building ANN index for {name}: {e}")
+                with self._ann_lock:
+                    self._ann_pending.pop(name, None)
+                return
+            
+            with self._ann_lock:
+                pending = self._ann_pending.pop(name, [])
+                if any(op[0] == "clear" for op in pending):
+                    return
+                for op in pending:
+                    if op[0] == "add":
+                        index.add(op[1], op[2])
+                    else:
+                        index.remove(op[1])
+                self.ann[name] = index
+            logger.info(f"Built ANN index for {name}: {len(ids)} vectors, "
+                        f"{len(index.lists)} lists in {time.monotonic() - started:.1f}s")
+        
+        threading.Thread(target=run, name=f"ann-{name}", daemon=True).start()
+    
+    def _ann_update(self, name: str, op: tuple):
+        """Apply ("add", id, vector), ("del", id) or ("clear",) to a collection's index."""
+        if self.ann_min_records <= 0:
+            return
+        with self._ann_lock:
+            if name in self._ann_pending:
+                self._ann_pending[name].append(op)
+            index = self.ann.get(name)
+            if index is not None:
+                if op[0] == "add":
+                    index.add(op[1], op[2])
+                elif op[0] == "del":
+                    index.remove(op[1])
+                else:
+                    self.ann.pop(name)
+        self._ann_maybe_build(name)
+    
     def add_generation(self, collection_name: str, prompt: str, narrative: str, 
                        image_url: str, metadata: Optional[Dict] = None) -> str:
         """
@@ -74,6 +559,12 @@ class VectorStore:
             # Generate a unique ID
             record_id = str(uuid.uuid4())
             
+            # Keep inline images out of the record; store a reference instead
+            if self.image_store and image_url and image_url.startswith("data:"):
+                filename = self.image_store.save_data_url(image_url)
+                if filename:
+                    image_url = self.image_store.url_for(filename)
+            
             # Create document combining prompt and narrative
             document = f"Prompt: {prompt}\n\nNarrative: {narrative}"
             
@@ -93,11 +584,9 @@ class VectorStore:
                 "metadata": meta
             }
             
-            # Add to collection
-            self.collections[collection_name].append(record)
-            
-            # Save to file
-            self._save_collection(collection_name)
+            vector = self._embed([document])[0]
+            self.backend.put(collection_name, record, vector)
+            self._ann_update(collection_name, ("add", record_id, vector))
             
             logger.info(f"Added generation record: {record_id}")
             return record_id
@@ -107,15 +596,19 @@ class VectorStore:
             raise
     
     def search_similar(self, collection_name: str, query: str, 
-                       n_results: int = 5) -> List[Dict[str, Any]]:
+                       n_results: int = 5, mode: str = "vector",
+                       nprobe: Optional[int] = None) -> List[Dict[str, Any]]:
         """
         Search for similar generations based on a query.
-        Uses simple text matching for now.
+        Large collections are searched through their IVF index once it is built.
         
         Args:
             collection_name: Name of the collection
             query: Search query
             n_results: Number of results to return
+            mode: "vector" ranks by cosine similarity between embeddings;
+                "text" ranks by keyword relevance
+            nprobe: IVF lists to scan (higher: better recall, slower); default from settings
             
         Returns:
             List of similar records with their metadata
@@ -124,51 +617,50 @@ class VectorStore:
             # Ensure collection exists
             self.get_or_create_collection(collection_name)
             
-            records = self.collections.get(collection_name, [])
+            if mode == "text":
+                # Map relevance onto a distance so lower still means better
+                matches = [(record, 1.0 / (1.0 + score))
+                           for record, score in self.backend.text_search(collection_name, query, n_results)]
+            else:
+                query_vector = self._embed([query])[0]
+                index = self.ann.get(collection_name)
+                if index is not None and index.centroids.shape[1] == query_vector.shape[0]:
+                    # Inserts grow the lists in place, so scan them under the lock
+                    with self._ann_lock:
+                        hits = index.search(query_vector, n_results, nprobe)
+                    records = self.backend.get_many(collection_name, [record_id for record_id, _ in hits])
+                    scored = [(records[record_id], similarity) for record_id, similarity in hits
+                              if record_id in records]
+                else:
+                    scored = self.backend.vector_search(collection_name, query_vector, n_results)
+                matches = [(record, 1.0 - similarity)  # Lower is more similar
+                           # Skip records with no similarity to the query
+                           for record, similarity in scored
+                           if similarity > 0]
             
-            if not records:
-                return []
-            
-            # Simple text-based scoring (in production, use proper embeddings)
-            query_lower = query.lower()
-            scored_records = []
-            
-            for record in records:
-                doc_lower = record.get("document", "").lower()
-                # Calculate simple similarity score
-                score = 0
-                
-                # Check if query terms appear in document
-                query_terms = query_lower.split()
-                for term in query_terms:
-                    if term in doc_lower:
-                        score += 1
-                
-                # Add to results with distance (inverse of score)
-                if score > 0:
-                    scored_records.append({
-                        "id": record["id"],
-                        "document": record.get("document"),
-                        "metadata": record.get("metadata"),
-                        "distance": 1.0 / (1.0 + score)  # Lower is more similar
-                    })
-            
-            # Sort by distance (lower is more similar)
-            scored_records.sort(key=lambda x: x["distance"])
-            
-            return scored_records[:n_results]
+            return [{
+                "id": record["id"],
+                "document": record.get("document"),
+                "metadata": record.get("metadata"),
+                "distance": distance
+            } for record, distance in matches]
             
         except Exception as e:
             logger.error(f"Error searching similar: {str(e)}")
             return []
     
-    def get_history(self, collection_name: str, limit: int = 20) -> List[Dict[str, Any]]:
+    def get_history(self, collection_name: str, limit: int = 20,
+                    before: Optional[str] = None, after: Optional[str] = None) -> List[Dict[str, Any]]:
         """
-        Get generation history.
+        Get generation history, newest first.
+        Pages come from the backend's time-ordered index, so a page costs
+        O(limit + log n) however deep into the history it is.
         
         Args:
             collection_name: Name of the collection
             limit: Maximum number of records to return
+            before: Only records older than this record id or ISO timestamp
+            after: Only records newer than this record id or ISO timestamp
             
         Returns:
             List of generation records
@@ -177,21 +669,9 @@ class VectorStore:
             # Ensure collection exists
             self.get_or_create_collection(collection_name)
             
-            records = self.collections.get(collection_name, [])
-            
-            if not records:
-                return []
-            
-            # Sort by created_at descending
-            sorted_records = sorted(
-                records,
-                key=lambda x: x.get("metadata", {}).get("created_at", ""),
-                reverse=True
-            )
-            
             # Format output
             history = []
-            for record in sorted_records[:limit]:
+            for record in self.backend.history(collection_name, limit, before=before, after=after):
                 history.append({
                     "id": record["id"],
                     "metadata": record.get("metadata", {}),
@@ -216,17 +696,11 @@ class VectorStore:
             True if successful, False otherwise
         """
         try:
-            records = self.collections.get(collection_name, [])
-            
-            # Find and remove record
-            new_records = [r for r in records if r.get("id") != record_id]
-            
-            if len(new_records) < len(records):
-                self.collections[collection_name] = new_records
-                self._save_collection(collection_name)
+            self.get_or_create_collection(collection_name)
+            if self.backend.delete(collection_name, record_id):
+                self._ann_update(collection_name, ("del", record_id))
                 logger.info(f"Deleted record: {record_id}")
                 return True
-            
             return False
             
         except Exception as e:
@@ -244,12 +718,23 @@ class VectorStore:
             True if successful, False otherwise
         """
         try:
-            if collection_name in self.collections:
-                self.collections[collection_name] = []
-                self._save_collection(collection_name)
+            if collection_name in self._opened and self.backend.clear(collection_name):
+                self._ann_update(collection_name, ("clear",))
                 logger.info(f"Cleared collection: {collection_name}")
                 return True
             return False
         except Exception as e:
             logger.error(f"Error clearing collection: {str(e)}")
             return False
+    
+    def ann_stats(self) -> Dict[str, Any]:
+        """IVF index stats per collection."""
+        with self._ann_lock:
+            stats = {name: index.stats() for name, index in self.ann.items()}
+            for name in self._ann_pending:
+                stats.setdefault(name, {})["building"] = True
+        return stats
+    
+    def close(self):
+        """Release backend files and connections."""
+        self.backend.close()
@@ -0,0 +1,99 @@
+"""
+Benchmark the IVF index against exact search.
+
+Builds an index over synthetic clustered unit vectors (or real embeddings
+from a .npy file), then reports recall@k against brute-force search and
+per-query latency for a range of nprobe values, plus the default nprobe
+the index tuned for itself at build time.
+
+Usage:
+    python bench_ann.py --n 1000000 --dim 512 --k 10
+    python bench_ann.py --vectors embeddings.npy --nprobe 1 4 8 16 32
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.ann_index import IVFIndex  # noqa: E402
+from app.services.embedding_matrix import top_k  # noqa: E402
+
+
+def synthetic_vectors(n: int, dim: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    """Unit vectors scattered around random cluster centres, like topical embeddings."""
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, 100000):
+        stop = min(start + 100000, n)
+        labels = rng.integers(clusters, size=stop - start)
+        vectors[start:stop] = centres[labels] + 2.0 * rng.standard_normal((stop - start, dim))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def percentile_ms(samples, q: float) -> float:
+    return float(np.percentile(samples, q) * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=200000, help="Vectors to index")
+    parser.add_argument("--dim", type=int, default=512, help="Embedding dimension")
+    parser.add_argument("--clusters", type=int, default=1000, help="Clusters in the synthetic data")
+    parser.add_argument("--vectors", help=".npy file of unit-length embeddings to use instead")
+    parser.add_argument("--queries", type=int, default=200, help="Queries to time")
+    parser.add_argument("--k", type=int, default=10, help="Results per query")
+    parser.add_argument("--nlist", type=int, default=0, help="IVF lists (0: about 4 * sqrt(n))")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32, 64])
+    parser.add_argument("--target-recall", type=float, default=0.9, help="Recall@10 the default nprobe is tuned for")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    if args.vectors:
+        vectors = np.load(args.vectors, mmap_mode="r").astype(np.float32)
+        queries = vectors[rng.choice(len(vectors), size=args.queries, replace=False)]
+    else:
+        # Held-out queries from the same clusters as the data, not copies of indexed rows
+        vectors = synthetic_vectors(args.n + args.queries, args.dim, args.clusters, rng)
+        vectors, queries = vectors[:args.n], vectors[args.n:]
+    ids = [str(i) for i in range(len(vectors))]
+
+    print(f"{len(vectors)} vectors x {vectors.shape[1]} dims, {args.queries} queries, k={args.k}")
+
+    started = time.perf_counter()
+    index = IVFIndex(nlist=args.nlist, target_recall=args.target_recall, rng=rng)
+    index.build(ids, vectors)
+    print(f"Build: {time.perf_counter() - started:.1f}s, {len(index.lists)} lists, "
+          f"default nprobe {index.nprobe} (tuned for recall@10 {args.target_recall})")
+
+    exact = []
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        exact.append({ids[i] for i in top_k(vectors @ query, args.k)})
+        timings.append(time.perf_counter() - started)
+    print(f"{'exact':>10}  recall@{args.k} 1.000  p50 {percentile_ms(timings, 50):7.2f} ms"
+          f"  p95 {percentile_ms(timings, 95):7.2f} ms")
+
+    for nprobe in [None] + args.nprobe:
+        hits = 0
+        timings = []
+        for query, truth in zip(queries, exact):
+            started = time.perf_counter()
+            results = index.search(query, args.k, nprobe=nprobe)
+            timings.append(time.perf_counter() - started)
+            hits += len(truth & {record_id for record_id, _ in results})
+        recall = hits / (len(queries) * args.k)
+        label = "default" if nprobe is None else f"nprobe {nprobe}"
+        print(f"{label:>10}  recall@{args.k} {recall:.3f}  p50 {percentile_ms(timings, 50):7.2f} ms"
+              f"  p95 {percentile_ms(timings, 95):7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import threading
+import time
+
+import numpy as np
+
+from app.services.ann_index import IVFIndex
+from app.services.embedding_matrix import top_k
+from app.services.vector_store import VectorStore
+
+
+def clustered(n, dim, clusters, rng):
+    centres = rng.standard_normal((clusters, dim))
+    vectors = centres[rng.integers(clusters, size=n)] + 0.3 * rng.standard_normal((n, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def recall(index, vectors, queries, k=10):
+    hits = 0
+    for query in queries:
+        truth = {str(i) for i in top_k(vectors @ query, k)}
+        hits += len(truth.intersection(record_id for record_id, _ in index.search(query, k)))
+    return hits / (len(queries) * k)
+
+
+def test_tuned_nprobe_reaches_target_recall_on_unseen_queries():
+    rng = np.random.default_rng(0)
+    data = clustered(5100, 32, 50, rng)
+    vectors, queries = data[:5000], data[5000:]
+    index = IVFIndex(target_recall=0.9, rng=np.random.default_rng(1))
+    index.build([str(i) for i in range(len(vectors))], vectors)
+    assert 1 <= index.nprobe <= len(index.lists)
+    assert recall(index, vectors, queries) >= 0.85
+
+    fixed = IVFIndex(nprobe=3, rng=np.random.default_rng(1))
+    fixed.build([str(i) for i in range(len(vectors))], vectors)
+    assert fixed.nprobe == 3
+
+
+def test_inserts_tombstones_and_rebuild_drift():
+    rng = np.random.default_rng(0)
+    vectors = clustered(1000, 16, 10, rng)
+    index = IVFIndex(nprobe=1000, rebuild_fraction=0.1, rng=rng)
+    index.build([str(i) for i in range(len(vectors))], vectors)
+    index.add("new", vectors[0])
+    index.remove("0")
+    assert [record_id for record_id, _ in index.search(vectors[0], 1)] == ["new"]
+    assert len(index) == 1000
+    assert not index.needs_rebuild()
+    for i in range(1, 100):
+        index.remove(str(i))
+    assert index.needs_rebuild()
+    ids, live = index.live_items()
+    assert len(ids) == len(live) == 901 and "0" not in ids
+
+
+def wait_for_index(store, name, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while name not in store.ann and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return store.ann.get(name)
+
+
+def test_store_builds_off_the_request_thread_and_searches_safely(tmp_path):
+    store = VectorStore(str(tmp_path), ann_min_records=200)
+    for i in range(199):
+        store.add_generation("c", f"red sports car {i}", f"narrative {i % 7}", "/img.png")
+
+    copied_on = []
+    vectors = store.backend.vectors
+
+    def recording_vectors(name):
+        copied_on.append(threading.current_thread())
+        return vectors(name)
+
+    store.backend.vectors = recording_vectors
+    store.add_generation("c", "blue touring car", "narrative", "/img.png")
+    index = wait_for_index(store, "c")
+    assert index is not None
+    assert copied_on and threading.main_thread() not in copied_on
+
+    # Searches scan the lists while inserts keep growing them; search_similar
+    # logs failures and returns no results, so an empty page is an error
+    empty = []
+
+    def search():
+        for _ in range(200):
+            if not store.search_similar("c", "red sports car", n_results=5):
+                empty.append(True)
+
+    searcher = threading.Thread(target=search)
+    searcher.start()
+    for i in range(200):
+        store.add_generation("c", f"green estate car {i}", "narrative", "/img.png")
+    searcher.join()
+    assert empty == []
+    results = store.search_similar("c", "blue touring car", n_results=1)
+    assert results[0]["metadata"]["prompt"] == "blue touring car"
+    store.close()
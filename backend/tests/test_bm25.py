@@ -0,0 +1,84 @@
+import time
+
+import numpy as np
+
+from app.services import bm25, embeddings
+from app.services.bm25 import BM25Index
+from app.services.vector_store import LogBackend, bm25_path
+
+
+def test_readding_a_document_drops_its_old_postings():
+    index = BM25Index()
+    index.add("a", "red ferrari")
+    index.add("a", "blue porsche")
+    assert index.search("ferrari", 5) == []
+    assert [doc_id for doc_id, _ in index.search("porsche", 5)] == ["a"]
+    assert set(index.postings) == {"blue", "porsche"}
+    assert index.total_length == 2
+
+    assert index.remove("a")
+    assert not index.remove("a")
+    assert index.postings == {} and len(index) == 0
+
+
+def test_ranking_matches_whole_tokens_and_favours_rare_terms():
+    index = BM25Index()
+    index.add("a", "red car red car")
+    index.add("b", "carbon fibre car")
+    index.add("c", "red carbon bonnet")
+    assert {doc_id for doc_id, _ in index.search("car", 5)} == {"a", "b"}
+    assert [doc_id for doc_id, _ in index.search("bonnet car", 1)] == ["c"]
+    assert index.search("", 5) == [] and index.search("car", 0) == []
+
+
+def test_shares_the_embedders_tokenizer():
+    assert bm25.tokenize is embeddings.tokenize
+    assert embeddings.tokenize("Café Škoda 東京 Straße") == ["café", "škoda", "東京", "strasse"]
+
+
+def test_non_ascii_queries_match():
+    index = BM25Index()
+    index.add("a", "Škoda Octavia parked outside a café")
+    index.add("b", "Toyota in 東京")
+    index.add("c", "BMW on the Autobahn")
+    assert [doc_id for doc_id, _ in index.search("škoda", 5)] == ["a"]
+    assert [doc_id for doc_id, _ in index.search("CAFÉ", 5)] == ["a"]
+    assert [doc_id for doc_id, _ in index.search("東京", 5)] == ["b"]
+
+
+def test_snapshot_round_trip_keeps_documents_removable(tmp_path, monkeypatch):
+    path = str(tmp_path / "c.bm25.json")
+    index = BM25Index()
+    index.add("a", "red ferrari")
+    index.add("b", "red porsche")
+    index.save(path, version=7)
+    assert BM25Index.load(path, version=8) is None
+    loaded = BM25Index.load(path, version=7)
+
+    # Postings from another tokenizer are not trusted
+    monkeypatch.setattr(BM25Index, "FORMAT", BM25Index.FORMAT + 1)
+    assert BM25Index.load(path, version=7) is None
+    assert loaded.remove("a")
+    assert loaded.postings == {"red": {"b": 1}, "porsche": {"b": 1}}
+    assert [doc_id for doc_id, _ in loaded.search("red", 5)] == ["b"]
+
+
+def test_log_backend_snapshots_index_after_compaction(tmp_path, monkeypatch):
+    monkeypatch.setattr(LogBackend, "COMPACTION_MIN_DEAD", 4)
+    embed = lambda documents: np.ones((len(documents), 3), dtype=np.float32)
+    backend = LogBackend(str(tmp_path), embed)
+    backend.open_collection("c")
+    for i in range(6):
+        backend.put("c", {"id": f"id{i}", "document": f"car {i}", "metadata": {}}, np.ones(3, dtype=np.float32))
+    for i in range(5):
+        backend.delete("c", f"id{i}")
+
+    path = bm25_path(str(tmp_path), "c")
+    deadline = time.monotonic() + 5
+    while (backend._compacting or BM25Index.load(path, version=backend.logs["c"].size()) is None) \
+            and time.monotonic() < deadline:
+        time.sleep(0.01)
+    snapshot = BM25Index.load(path, version=backend.logs["c"].size())
+    assert snapshot is not None
+    assert list(snapshot.lengths) == ["id5"]
+    backend.close()
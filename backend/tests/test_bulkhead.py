@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from app.services.bulkhead import Bulkhead, BulkheadFull, acquire_within
+
+
+def test_acquire_within_never_leaks_permits():
+    async def main():
+        semaphore = asyncio.Semaphore(2)
+
+        async def worker(i):
+            try:
+                # Timeouts close to the hold time make timeout/acquire races likely
+                await acquire_within(semaphore, 0.001 * (i % 3))
+            except asyncio.TimeoutError:
+                return
+            await asyncio.sleep(0.001)
+            semaphore.release()
+
+        for _ in range(20):
+            await asyncio.gather(*(worker(i) for i in range(50)))
+        await asyncio.sleep(0.01)
+        return semaphore._value
+
+    assert asyncio.run(main()) == 2
+
+
+def test_acquire_within_returns_permit_when_cancelled():
+    async def main():
+        semaphore = asyncio.Semaphore(1)
+        await semaphore.acquire()
+        waiter = asyncio.ensure_future(acquire_within(semaphore, 10))
+        await asyncio.sleep(0)
+        # The permit becomes available in the same step the waiter is cancelled
+        semaphore.release()
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.sleep(0)
+        return semaphore._value
+
+    assert asyncio.run(main()) == 1
+
+
+def test_bulkhead_rejects_when_queue_full_and_on_timeout():
+    async def main():
+        bulkhead = Bulkhead("p", max_concurrent=1, max_queue=1, queue_timeout=0.01)
+        await bulkhead.acquire()
+        queued = asyncio.ensure_future(bulkhead.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(BulkheadFull):
+            await bulkhead.acquire()
+        with pytest.raises(BulkheadFull):
+            await queued
+        bulkhead.release()
+        await bulkhead.acquire()
+        bulkhead.release()
+        return bulkhead.stats()
+
+    stats = asyncio.run(main())
+    assert stats["rejected"] == 2
+    assert stats["admitted"] == 2
@@ -0,0 +1,156 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from app.services.embedding_matrix import MappedEmbeddingMatrix, top_k
+from app.services.vector_store import LogBackend, log_path, matrix_path
+
+
+def unit(values):
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_top_k_orders_best_first():
+    scores = np.array([0.1, 0.9, 0.5, 0.7], dtype=np.float32)
+    assert list(top_k(scores, 2)) == [1, 3]
+    assert list(top_k(scores, 10)) == [1, 3, 2, 0]
+
+
+def test_matrix_add_remove_search_and_reopen(tmp_path):
+    path = str(tmp_path / "m")
+    matrix = MappedEmbeddingMatrix(path, capacity=2)
+    matrix.add("a", unit([1, 0, 0]))
+    matrix.add("b", unit([0, 1, 0]))
+    matrix.add("c", unit([1, 1, 0]))  # grows past the initial capacity
+    assert matrix.remove("a")
+    assert not matrix.remove("a")
+    matrix.version = 7
+    assert [record_id for record_id, _ in matrix.search(unit([1, 0.1, 0]), 2)] == ["c", "b"]
+    matrix.close()
+
+    reopened = MappedEmbeddingMatrix(path)
+    assert len(reopened) == 2
+    assert sorted(reopened.ids) == ["b", "c"]
+    assert reopened.version == 7
+    assert reopened.dim == 3
+
+
+def test_matrix_discards_files_with_another_dimension_or_format(tmp_path):
+    path = str(tmp_path / "m")
+    matrix = MappedEmbeddingMatrix(path)
+    matrix.add("a", unit([1, 0, 0]))
+    matrix.close()
+    assert len(MappedEmbeddingMatrix(path, dim=4)) == 0
+
+    # A header without the magic number (e.g. an older layout) is not trusted
+    with open(f"{path}.ids", "r+b") as f:
+        f.write(np.array([1, 3, 0, 0], dtype=np.uint64).tobytes())
+    assert len(MappedEmbeddingMatrix(path)) == 0
+
+
+def test_check_id_rejects_unstorable_ids():
+    MappedEmbeddingMatrix.check_id("0" * MappedEmbeddingMatrix.ID_BYTES)
+    with pytest.raises(ValueError):
+        MappedEmbeddingMatrix.check_id("0" * (MappedEmbeddingMatrix.ID_BYTES + 1))
+    with pytest.raises(ValueError):
+        MappedEmbeddingMatrix.check_id("café")
+
+
+class CountingEmbedder:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, documents):
+        self.calls += len(documents)
+        return np.stack([unit([len(d) % 7 + 1, 1, 2]) for d in documents])
+
+
+def open_backend(tmp_path, embed):
+    backend = LogBackend(str(tmp_path), embed)
+    backend.open_collection("c")
+    return backend
+
+
+def test_log_backend_reopen_is_constant_time(tmp_path, monkeypatch):
+    embed = CountingEmbedder()
+    backend = open_backend(tmp_path, embed)
+    for i in range(5):
+        record = {"id": f"id{i}", "document": "x" * i, "metadata": {}}
+        backend.put("c", record, embed([record["document"]])[0])
+    backend.delete("c", "id1")
+    backend.close()
+    embed.calls = 0
+
+    # A matrix stamped with the current log size is trusted without decoding its ids
+    def fail(self):
+        raise AssertionError("ids decoded on open")
+    monkeypatch.setattr(MappedEmbeddingMatrix, "ids", property(fail))
+    backend = open_backend(tmp_path, embed)
+    assert embed.calls == 0
+    assert len(backend.matrices["c"]) == 4
+    backend.close()
+
+
+def test_log_backend_reconciles_after_interrupted_write(tmp_path):
+    embed = CountingEmbedder()
+    backend = open_backend(tmp_path, embed)
+    for i in range(3):
+        record = {"id": f"id{i}", "document": "doc", "metadata": {}}
+        backend.put("c", record, embed([record["document"]])[0])
+    backend.close()
+
+    # Simulate a crash after the matrix changed but before the log caught up
+    matrix = MappedEmbeddingMatrix(matrix_path(str(tmp_path), "c"))
+    matrix.remove("id0")
+    matrix.add("ghost", unit([1, 0, 0]))
+    matrix.version = 0
+    matrix.close()
+
+    embed.calls = 0
+    backend = open_backend(tmp_path, embed)
+    assert sorted(backend.matrices["c"].ids) == ["id0", "id1", "id2"]
+    assert embed.calls == 1
+    backend.close()
+
+
+def test_log_backend_rejects_bad_id_before_persisting(tmp_path):
+    embed = CountingEmbedder()
+    backend = open_backend(tmp_path, embed)
+    record = {"id": "x" * 40, "document": "doc", "metadata": {}}
+    with pytest.raises(ValueError):
+        backend.put("c", record, embed(["doc"])[0])
+    assert backend.count("c") == 0
+    assert backend.get("c", record["id"]) is None
+    backend.close()
+    assert not os.path.exists(log_path(str(tmp_path), "c")) or \
+        os.path.getsize(log_path(str(tmp_path), "c")) == 0
+
+
+def test_log_backend_search_is_safe_during_deletes(tmp_path):
+    rng = np.random.default_rng(0)
+    backend = LogBackend(str(tmp_path), CountingEmbedder())
+    backend.open_collection("c")
+    for i in range(300):
+        backend.put("c", {"id": f"id{i}", "document": "", "metadata": {}}, unit(rng.standard_normal(16)))
+
+    errors = []
+
+    def search():
+        queries = np.random.default_rng(1)
+        try:
+            for _ in range(200):
+                for record, _ in backend.vector_search("c", unit(queries.standard_normal(16)), 10):
+                    assert record["id"].startswith("id")
+        except Exception as e:
+            errors.append(e)
+
+    searcher = threading.Thread(target=search)
+    searcher.start()
+    for i in range(0, 300, 2):
+        backend.delete("c", f"id{i}")
+    searcher.join()
+    backend.close()
+    assert errors == []
@@ -0,0 +1,59 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.errors import ProviderError
+from app.services.groq_client import GroqClient
+from app.services.rate_limiter import RateLimiter
+from app.services.retry import RetryPolicy
+
+
+def make_client(handler):
+    client = GroqClient(api_key="test")
+    client.http = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url=client.base_url)
+    client.retry = RetryPolicy(max_attempts=3, base_delay=0)
+    client.limiter = RateLimiter("groq", tokens_per_minute=6000)
+    return client
+
+
+def unavailable(request):
+    return httpx.Response(503, json={"error": {"message": "overloaded"}})
+
+
+def unreachable(request):
+    raise httpx.ConnectError("refused", request=request)
+
+
+@pytest.mark.parametrize("handler", [unavailable, unreachable])
+def test_failed_attempts_refund_their_reservation(handler):
+    client = make_client(handler)
+    result = asyncio.run(client.generate_chat_response([{"role": "user", "content": "hi"}]))
+    assert not result["success"]
+    # Three attempts each reserved ~500 tokens; all of it comes back
+    assert client.limiter.tokens.tokens > 5900
+
+
+@pytest.mark.parametrize("handler", [unavailable, unreachable])
+def test_failed_stream_refunds_its_reservation(handler):
+    client = make_client(handler)
+
+    async def consume():
+        async for _ in client.generate_chat_response_stream([{"role": "user", "content": "hi"}]):
+            pass
+
+    with pytest.raises(ProviderError):
+        asyncio.run(consume())
+    assert client.limiter.tokens.tokens > 5900
+
+
+def test_successful_call_settles_reported_usage():
+    def ok(request):
+        return httpx.Response(200, json={
+            "choices": [{"message": {"content": "hello"}}],
+            "usage": {"total_tokens": 1000}
+        })
+
+    client = make_client(ok)
+    assert asyncio.run(client.generate_chat_response([{"role": "user", "content": "hi"}]))["success"]
+    assert 4990 < client.limiter.tokens.tokens < 5100
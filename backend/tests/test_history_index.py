@@ -0,0 +1,82 @@
+import pytest
+
+from app.services.storage_backend import SQLiteBackend
+from app.services.vector_store import HistoryIndex, VectorStore
+
+
+def record(record_id, created_at):
+    return {"id": record_id, "metadata": {"created_at": created_at}}
+
+
+@pytest.fixture
+def index():
+    # Two records share a timestamp; ties are ordered by id
+    return HistoryIndex([
+        record("c", "2024-01-03T00:00:00"),
+        record("a", "2024-01-01T00:00:00"),
+        record("b2", "2024-01-02T00:00:00"),
+        record("b1", "2024-01-02T00:00:00"),
+        record("d", "2024-01-04T00:00:00"),
+    ])
+
+
+def test_latest_page_is_newest_first(index):
+    assert index.page(3) == ["d", "c", "b2"]
+    assert index.page(10) == ["d", "c", "b2", "b1", "a"]
+    assert index.page(0) == []
+
+
+def test_before_and_after_record_cursors_exclude_the_cursor(index):
+    assert index.page(2, before="c") == ["b2", "b1"]
+    assert index.page(2, before="b2") == ["b1", "a"]
+    assert index.page(2, after="b1") == ["c", "b2"]
+    assert index.page(5, after="c") == ["d"]
+    assert index.page(2, before="a") == []
+
+
+def test_timestamp_cursors_bound_every_record_at_that_instant(index):
+    assert index.page(5, before="2024-01-02T00:00:00") == ["a"]
+    assert index.page(5, after="2024-01-02T00:00:00") == ["d", "c"]
+    assert index.page(5, before="2024-01-02T12:00:00") == ["b2", "b1", "a"]
+
+
+def test_unknown_cursor_returns_empty_page(index):
+    assert index.page(5, before="missing") == []
+    assert index.page(5, after="missing") == []
+
+
+def test_add_and_remove_keep_order(index):
+    index.add(record("e", "2024-01-05T00:00:00"))
+    index.add(record("a0", "2023-12-31T00:00:00"))
+    assert index.remove("c")
+    assert not index.remove("c")
+    assert index.page(10) == ["e", "d", "b2", "b1", "a", "a0"]
+    assert index.page(10, before="c") == []
+
+
+@pytest.mark.parametrize("backend", ["log", "sqlite"])
+def test_store_pages_cover_history_exactly_once(tmp_path, backend):
+    store = VectorStore(
+        str(tmp_path),
+        backend=SQLiteBackend(str(tmp_path / "store.db")) if backend == "sqlite" else None
+    )
+    ids = [store.add_generation("c", f"prompt {i}", "narrative", "/img.png") for i in range(23)]
+    store.delete_record("c", ids[5])
+    live = [record_id for record_id in ids if record_id != ids[5]]
+    # Newest first by (created_at, id), which is insertion order unless timestamps tie
+    expected = sorted(live, key=lambda record_id: (
+        store.backend.get("c", record_id)["metadata"]["created_at"], record_id), reverse=True)
+
+    seen, cursor = [], None
+    while True:
+        page = store.get_history("c", limit=5, before=cursor)
+        if not page:
+            break
+        seen.extend(item["id"] for item in page)
+        cursor = page[-1]["id"]
+    assert seen == expected
+
+    # Paging forwards from the oldest record returns the ones just newer than it
+    newer = store.get_history("c", limit=3, after=expected[-1])
+    assert [item["id"] for item in newer] == expected[-4:-1]
+    store.close()
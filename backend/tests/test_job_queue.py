@@ -0,0 +1,169 @@
+import asyncio
+
+import pytest
+
+from app.services.job_queue import FAILED, QUEUED, SUCCEEDED, JobQueue, QueueFull
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_jobs_run_in_priority_order_and_report_position(tmp_path):
+    async def main():
+        order = []
+        gate = asyncio.Event()
+
+        async def handler(payload):
+            await gate.wait()
+            order.append(payload["n"])
+            return {"n": payload["n"]}
+
+        queue = JobQueue(str(tmp_path / "jobs.db"), workers=1)
+        queue.register("test", handler)
+        await queue.start()
+        blocker = await queue.submit("test", {"n": "blocker"})
+        await asyncio.sleep(0.05)  # the single worker is now busy with the blocker
+
+        low = await queue.submit("test", {"n": "low"}, priority=0)
+        high = await queue.submit("test", {"n": "high"}, priority=5)
+        low2 = await queue.submit("test", {"n": "low2"}, priority=0)
+        positions = [queue.position(job["id"]) for job in (high, low, low2, blocker)]
+
+        gate.set()
+        async for job in queue.subscribe(low2["id"]):
+            last = job
+        await queue.stop()
+        return order, positions, last
+
+    order, positions, last = run(main())
+    assert order == ["blocker", "high", "low", "low2"]
+    assert positions == [0, 1, 2, None]
+    assert last["status"] == SUCCEEDED
+    assert last["result"] == {"n": "low2"}
+
+
+def test_submit_rejects_beyond_max_pending(tmp_path):
+    async def main():
+        gate = asyncio.Event()
+
+        async def handler(payload):
+            await gate.wait()
+            return {}
+
+        queue = JobQueue(str(tmp_path / "jobs.db"), workers=1, max_pending=2)
+        queue.register("test", handler)
+        await queue.start()
+        await queue.submit("test", {})
+        await asyncio.sleep(0.05)  # running jobs do not count as pending
+        await queue.submit("test", {})
+        await queue.submit("test", {})
+        with pytest.raises(QueueFull):
+            await queue.submit("test", {})
+        # Concurrent submits cannot overshoot the limit either
+        gate.set()
+        await asyncio.sleep(0.05)
+        results = await asyncio.gather(*(queue.submit("test", {}) for _ in range(5)),
+                                       return_exceptions=True)
+        await queue.stop()
+        return results
+
+    results = run(main())
+    assert sum(isinstance(r, QueueFull) for r in results) == 3
+
+
+def test_failed_jobs_and_restart_recovery(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+
+    async def first_run():
+        async def fail(payload):
+            raise ValueError("boom")
+
+        async def hang(payload):
+            await asyncio.sleep(3600)
+
+        queue = JobQueue(db_path, workers=1)
+        queue.register("fail", fail)
+        queue.register("hang", hang)
+        await queue.start()
+        failed = await queue.submit("fail", {})
+        async for job in queue.subscribe(failed["id"]):
+            failed = job
+        running = await queue.submit("hang", {})
+        queued = await queue.submit("hang", {}, priority=1)
+        await asyncio.sleep(0.05)
+        await queue.stop()
+        return failed, running["id"], queued["id"]
+
+    failed, running_id, queued_id = run(first_run())
+    assert failed["status"] == FAILED
+    assert failed["error"] == "boom"
+
+    async def second_run():
+        # No workers, so recovered jobs stay queued where we can inspect them
+        queue = JobQueue(db_path, workers=0)
+        queue.register("hang", lambda payload: asyncio.sleep(3600))
+        await queue.start()
+        statuses = [(await queue.get(job_id))["status"] for job_id in (running_id, queued_id)]
+        positions = [queue.position(job_id) for job_id in (queued_id, running_id)]
+        await queue.stop()
+        return statuses, positions
+
+    statuses, positions = run(second_run())
+    assert statuses == [QUEUED, QUEUED]
+    assert positions == [0, 1]
+
+
+def test_workers_drain_many_jobs_in_priority_order(tmp_path):
+    async def main():
+        order = []
+        gate = asyncio.Event()
+
+        async def handler(payload):
+            await gate.wait()
+            order.append((payload["priority"], payload["n"]))
+            return {}
+
+        queue = JobQueue(str(tmp_path / "jobs.db"), workers=1, max_pending=1000)
+        queue.register("test", handler)
+        await queue.start()
+        await queue.submit("test", {"priority": 9, "n": -1})
+        await asyncio.sleep(0.05)  # the single worker is now busy
+        jobs = [await queue.submit("test", {"priority": n % 4, "n": n}, priority=n % 4)
+                for n in range(200)]
+        positions = sorted(queue.position(job["id"]) for job in jobs)
+        gate.set()
+        while len(order) < len(jobs) + 1:
+            await asyncio.sleep(0.01)
+        await queue.stop()
+        return positions, order[1:]
+
+    positions, order = run(main())
+    assert positions == list(range(200))
+    assert order == sorted(order, key=lambda item: (-item[0], item[1]))
+
+
+def test_start_prunes_finished_jobs_past_retention(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+
+    async def main():
+        async def handler(payload):
+            return {}
+
+        queue = JobQueue(db_path, workers=1, retention=3600)
+        queue.register("test", handler)
+        await queue.start()
+        old, recent = await queue.submit("test", {}), await queue.submit("test", {})
+        async for _ in queue.subscribe(recent["id"]):
+            pass
+        await queue.stop()
+
+        queue = JobQueue(db_path, workers=0, retention=3600)
+        queue._update(old["id"], finished_at=1.0)
+        queue.register("test", handler)
+        await queue.start()
+        kept = [await queue.get(job["id"]) is not None for job in (old, recent)]
+        await queue.stop()
+        return kept
+
+    assert run(main()) == [False, True]
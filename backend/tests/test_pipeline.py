@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app, get_unified_client, get_vector_store
+from app.services import deadline
+from app.services.deadline import DeadlineExceeded
+from app.services.pipeline import Stage, run_pipeline
+
+
+def test_failed_stage_skips_dependents_but_not_siblings():
+    async def fail(_):
+        raise ValueError("boom")
+
+    async def value(_):
+        return 1
+
+    result = asyncio.run(run_pipeline([
+        Stage("a", fail),
+        Stage("b", value),
+        Stage("c", value, depends_on=["a"])
+    ]))
+    assert result.results == {"b": 1}
+    assert result.errors == {"a": "boom", "c": "Skipped: a failed"}
+
+
+def test_deadline_aborts_the_pipeline_and_cancels_other_stages():
+    cancelled = []
+
+    async def expire(_):
+        raise DeadlineExceeded("Request deadline exceeded")
+
+    async def slow(_):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def after(_):
+        raise AssertionError("ran after the deadline")
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(run_pipeline([
+            Stage("expire", expire),
+            Stage("slow", slow),
+            Stage("after", after, depends_on=["expire"])
+        ]))
+    assert cancelled == [True]
+
+
+class SlowClient:
+    def __init__(self):
+        self.images = 0
+
+    async def generate_narrative(self, prompt, context=None):
+        return await deadline.run(asyncio.sleep(5, "narrative"))
+
+    async def enhance_prompt(self, prompt):
+        return await deadline.run(asyncio.sleep(5, prompt))
+
+    async def generate_image(self, **kwargs):
+        self.images += 1
+        return "/api/images/x.png"
+
+
+@pytest.fixture
+def slow_client():
+    client = SlowClient()
+    app.dependency_overrides[get_unified_client] = lambda: client
+    app.dependency_overrides[get_vector_store] = lambda: None
+    yield client
+    app.dependency_overrides.clear()
+
+
+def test_generate_returns_504_when_its_budget_runs_out(slow_client):
+    response = TestClient(app).post(
+        "/api/generate",
+        json={"prompt": "a red car", "enhance_prompt": True},
+        headers={"X-Request-Timeout": "0.2"}
+    )
+    assert response.status_code == 504
+    assert slow_client.images == 0
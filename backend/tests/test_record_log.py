@@ -0,0 +1,81 @@
+import json
+
+from app.services.record_log import RecordLog
+
+
+def put(record_id, document="doc"):
+    return {"op": "put", "record": {"id": record_id, "document": document}}
+
+
+def write_lines(path, lines):
+    with open(path, "wb") as f:
+        f.write(b"".join(lines))
+
+
+def entry_line(entry):
+    return (json.dumps(entry) + "\n").encode("utf-8")
+
+
+def test_replay_applies_puts_deletes_and_clears(tmp_path):
+    log = RecordLog(str(tmp_path / "c.log"), fsync=False)
+    log.append(put("a"))
+    log.append(put("b"))
+    log.append({"op": "del", "id": "a"})
+    log.append(put("c"))
+    log.close()
+
+    records = RecordLog(log.path).replay()
+    assert [r["id"] for r in records] == ["b", "c"]
+
+    log.append({"op": "clear"})
+    log.append(put("d"))
+    log.close()
+    reopened = RecordLog(log.path)
+    assert [r["id"] for r in reopened.replay()] == ["d"]
+    assert reopened.entry_count == 6
+
+
+def test_torn_tail_is_truncated(tmp_path):
+    path = tmp_path / "c.log"
+    good = entry_line(put("a")) + entry_line(put("b"))
+    write_lines(path, [good, b'{"op": "put", "rec'])
+
+    log = RecordLog(str(path))
+    assert [r["id"] for r in log.replay()] == ["a", "b"]
+    assert path.read_bytes() == good
+    assert log.entry_count == 2
+
+    # Appends after recovery start on a clean line
+    log.append(put("c"))
+    log.close()
+    assert [r["id"] for r in RecordLog(str(path)).replay()] == ["a", "b", "c"]
+
+
+def test_corrupt_middle_line_is_skipped_not_truncated(tmp_path):
+    path = tmp_path / "c.log"
+    original = entry_line(put("a")) + b"\x00garbage\n" + entry_line(put("b")) + entry_line({"op": "del", "id": "a"})
+    write_lines(path, [original])
+
+    log = RecordLog(str(path))
+    assert [r["id"] for r in log.replay()] == ["b"]
+    # Later entries survive and the file is untouched
+    assert path.read_bytes() == original
+    assert log.entry_count == 4
+
+
+def test_compaction_keeps_entries_appended_after_snapshot(tmp_path):
+    log = RecordLog(str(tmp_path / "c.log"), fsync=False)
+    for i in range(10):
+        log.append(put(str(i)))
+    for i in range(9):
+        log.append({"op": "del", "id": str(i)})
+    snapshot = [{"id": "9", "document": "doc"}]
+    offset = log.size()
+    log.append(put("late"))
+
+    log.compact(snapshot, since_offset=offset)
+    log.close()
+
+    reopened = RecordLog(log.path)
+    assert [r["id"] for r in reopened.replay()] == ["9", "late"]
+    assert reopened.entry_count == 2
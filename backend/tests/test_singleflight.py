@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+
+from app.services import deadline
+from app.services.deadline import DeadlineExceeded
+from app.services.singleflight import SingleFlight
+from app.services.unified_client import UnifiedClient
+
+
+def coalescing_client():
+    # Only the pieces _coalesce uses; the real constructor sets up providers
+    client = UnifiedClient.__new__(UnifiedClient)
+    client.singleflight = SingleFlight()
+    client.singleflight_methods = {"generate_narrative"}
+    return client
+
+
+def test_coalesced_callers_each_keep_their_own_deadline():
+    async def main():
+        client = coalescing_client()
+
+        async def upstream(prompt):
+            # Retry loops and timeouts inside the shared call consult the deadline
+            await asyncio.sleep(0.1)
+            deadline.check()
+            return f"story about {prompt}"
+
+        async def call(budget):
+            token = deadline.set_deadline(budget)
+            try:
+                return await client._coalesce("generate_narrative", upstream, "a red car")
+            finally:
+                deadline.reset_deadline(token)
+
+        # The short-budget caller starts the shared call
+        short = asyncio.ensure_future(call(0.05))
+        await asyncio.sleep(0)
+        long = asyncio.ensure_future(call(5))
+        with pytest.raises(DeadlineExceeded):
+            await short
+        result = await long
+        return result, client.singleflight.stats()
+
+    result, stats = asyncio.run(main())
+    assert result == "story about a red car"
+    assert stats["methods"]["generate_narrative"] == {"calls": 2, "coalesced": 1}
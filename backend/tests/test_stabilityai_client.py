@@ -0,0 +1,23 @@
+import asyncio
+
+from app.config import settings
+from app.services import stabilityai_client
+
+
+def test_default_clients_are_kept_per_key_and_closed_on_eviction(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "image_dir", str(tmp_path))
+    monkeypatch.setattr(stabilityai_client, "DEFAULT_CLIENTS_MAX", 1)
+    monkeypatch.setattr(stabilityai_client, "_default_clients", stabilityai_client.OrderedDict())
+
+    async def main():
+        first = await stabilityai_client._get_default_client("key-a")
+        again = await stabilityai_client._get_default_client(" key-a ")
+        second = await stabilityai_client._get_default_client("key-b")
+        closed = first.http.is_closed
+        await second.aclose()
+        return first, again, second, closed
+
+    first, again, second, closed = asyncio.run(main())
+    assert again is first
+    assert second is not first and second.api_key == "key-b"
+    assert closed
@@ -0,0 +1,195 @@
+import threading
+
+import numpy as np
+import pytest
+
+from app.services.storage_backend import ReadWriteLock, SQLiteBackend, StorageBackend
+from app.services.vector_store import LogBackend, VectorStore
+
+
+def unit(values):
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def record(record_id, document, created_at="2024-01-01T00:00:00"):
+    return {"id": record_id, "document": document, "metadata": {"created_at": created_at}}
+
+
+def test_incomplete_backend_cannot_be_instantiated():
+    class Partial(StorageBackend):
+        def count(self, name):
+            return 0
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_sqlite_crud_search_and_reopen(tmp_path):
+    db_path = str(tmp_path / "store.db")
+    backend = SQLiteBackend(db_path)
+    backend.open_collection("c")
+    backend.put("c", record("a", "red car"), unit([1, 0, 0]))
+    backend.put("c", record("b", "carbon fibre"), unit([0, 1, 0]))
+    backend.put("c", record("a", "red car door"), unit([1, 0.1, 0]))  # replaces a
+    assert backend.count("c") == 2
+    assert backend.get("c", "a")["document"] == "red car door"
+    assert [r["id"] for r, _ in backend.vector_search("c", unit([1, 0, 0]), 1)] == ["a"]
+    # Whole-token matching: "car" does not match "carbon"
+    assert [r["id"] for r, _ in backend.text_search("c", "car", 5)] == ["a"]
+    backend.put("c", record("s", "Škoda outside a café in 東京"), unit([0, 0, 1]))
+    for query in ("škoda", "Café", "東京"):
+        assert [r["id"] for r, _ in backend.text_search("c", query, 5)] == ["s"]
+    backend.delete("c", "s")
+    assert backend.delete("c", "b")
+    assert not backend.delete("c", "b")
+    backend.close()
+
+    backend = SQLiteBackend(db_path)
+    backend.open_collection("c")
+    ids, vectors = backend.vectors("c")
+    assert ids == ["a"] and vectors.shape == (1, 3)
+    assert backend.clear("c")
+    assert backend.count("c") == 0
+    backend.close()
+
+
+def test_sqlite_matrix_rebuilt_when_rows_change_at_same_count(tmp_path):
+    db_path = str(tmp_path / "store.db")
+    backend = SQLiteBackend(db_path)
+    backend.open_collection("c")
+    backend.put_many("c", [record("a", ""), record("b", "")], np.stack([unit([1, 0]), unit([0, 1])]))
+    backend.close()
+
+    # Another writer that never opened the matrix swaps a row, keeping the count
+    other = SQLiteBackend(db_path)
+    other.delete("c", "a")
+    other.put("c", record("z", ""), unit([1, 1]))
+    other.close()
+
+    backend = SQLiteBackend(db_path)
+    backend.open_collection("c")
+    assert sorted(backend.vectors("c")[0]) == ["b", "z"]
+    assert [r["id"] for r, _ in backend.vector_search("c", unit([1, 1]), 1)] == ["z"]
+    backend.close()
+
+
+def test_log_collection_is_imported_into_sqlite(tmp_path):
+    store = VectorStore(str(tmp_path))
+    ids = [store.add_generation("c", f"prompt {i}", "narrative", "/img.png") for i in range(3)]
+    store.close()
+    assert isinstance(store.backend, LogBackend)
+
+    store = VectorStore(str(tmp_path), backend=SQLiteBackend(str(tmp_path / "store.db")))
+    store.get_or_create_collection("c")
+    assert store.backend.count("c") == 3
+    assert sorted(store.backend.vectors("c")[0]) == sorted(ids)
+    store.close()
+
+
+def test_imported_log_is_not_imported_again_after_clear(tmp_path):
+    store = VectorStore(str(tmp_path))
+    store.add_generation("c", "prompt", "narrative", "/img.png")
+    store.close()
+
+    db_path = str(tmp_path / "store.db")
+    store = VectorStore(str(tmp_path), backend=SQLiteBackend(db_path))
+    store.get_or_create_collection("c")
+    assert store.backend.count("c") == 1
+    assert store.clear_collection("c")
+    store.close()
+
+    store = VectorStore(str(tmp_path), backend=SQLiteBackend(db_path))
+    store.get_or_create_collection("c")
+    assert store.backend.count("c") == 0
+    store.close()
+
+
+def test_text_search_survives_vacuum(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "store.db"))
+    backend.open_collection("c")
+    for i in range(20):
+        backend.put("c", record(f"id{i}", f"car number{i}"), unit([1, i + 1]))
+    for i in range(0, 20, 2):
+        backend.delete("c", f"id{i}")
+    conn = backend._connection()
+    # VACUUM may renumber implicit rowids, so FTS rows must point at a declared key
+    assert "content_rowid='pk'" in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE name = 'records_fts'").fetchone()[0]
+    conn.execute("VACUUM")
+    assert [r["id"] for r, _ in backend.text_search("c", "number7", 5)] == ["id7"]
+    backend.delete("c", "id7")
+    assert backend.text_search("c", "number7", 5) == []
+    assert len(backend.text_search("c", "car", 20)) == 9
+    backend.close()
+
+
+def test_read_write_lock_shares_reads_and_excludes_writes():
+    lock = ReadWriteLock()
+    both_reading = threading.Barrier(2, timeout=5)
+    events = []
+
+    def reader():
+        with lock.read():
+            both_reading.wait()  # only passes if two readers hold the lock at once
+            events.append("read")
+
+    readers = [threading.Thread(target=reader) for _ in range(2)]
+    with lock.write():
+        for thread in readers:
+            thread.start()
+        events.append("write")
+    for thread in readers:
+        thread.join()
+    assert events == ["write", "read", "read"]
+
+
+def test_sqlite_search_is_safe_during_deletes(tmp_path):
+    rng = np.random.default_rng(0)
+    backend = SQLiteBackend(str(tmp_path / "store.db"))
+    backend.open_collection("c")
+    backend.put_many("c", [record(f"id{i}", "") for i in range(300)],
+                     np.stack([unit(rng.standard_normal(16)) for _ in range(300)]))
+    errors = []
+
+    def search():
+        queries = np.random.default_rng(1)
+        try:
+            for _ in range(100):
+                for found, _ in backend.vector_search("c", unit(queries.standard_normal(16)), 10):
+                    assert found["id"].startswith("id")
+        except Exception as e:
+            errors.append(e)
+
+    searchers = [threading.Thread(target=search) for _ in range(2)]
+    for thread in searchers:
+        thread.start()
+    for i in range(0, 300, 2):
+        backend.delete("c", f"id{i}")
+    for thread in searchers:
+        thread.join()
+    assert errors == []
+    assert sorted(backend.vectors("c")[0]) == sorted(f"id{i}" for i in range(1, 300, 2))
+    backend.close()
+
+
+def test_sqlite_count_is_stored_and_reopen_does_not_count_rows(tmp_path):
+    db_path = str(tmp_path / "store.db")
+    backend = SQLiteBackend(db_path)
+    backend.open_collection("c")
+    backend.put_many("c", [record("a", ""), record("b", "")], np.stack([unit([1, 0]), unit([0, 1])]))
+    backend.put("c", record("a", "again"), unit([1, 1]))  # a replace does not change the count
+    assert backend.count("c") == 2
+    backend.delete("c", "a")
+    backend.delete("c", "missing")
+    assert backend.count("c") == 1
+    backend.close()
+
+    backend = SQLiteBackend(db_path)
+    statements = []
+    backend._connection().set_trace_callback(statements.append)
+    backend.open_collection("c")
+    assert backend.count("c") == 1
+    assert not any("COUNT(" in statement for statement in statements)
+    assert backend.clear("c") and backend.count("c") == 0
+    backend.close()
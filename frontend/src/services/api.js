@@ -72,14 +72,70 @@ export const chat = async (messages, context = null) => {
   return api.post('/chat', { messages, context });
 };
 
+// Stream Server-Sent Events from a POST endpoint.
+// Calls onToken for each token; resolves with the full text when done.
+const streamSSE = async (path, body, onToken) => {
+  const response = await fetch(`${API_BASE_URL}${path}`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json', Accept: 'text/event-stream' },
+    body: JSON.stringify(body),
+  });
+  if (!response.ok) {
+    throw new Error(`Stream request failed: ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let text = '';
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const raw = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+
+      let event = 'message';
+      let data = '';
+      for (const line of raw.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) data += line.slice(5).trim();
+      }
+      const payload = data ? JSON.parse(data) : {};
+
+      if (event === 'error') throw new Error(payload.error);
+      if (event === 'done') return text;
+      if (payload.token) {
+        text += payload.token;
+        onToken?.(payload.token, text);
+      }
+    }
+  }
+  return text;
+};
+
+// Stream Chat
+export const streamChat = async (messages, context = null, onToken) => {
+  return streamSSE('/chat/stream', { messages, context }, onToken);
+};
+
+// Stream Narrative
+export const streamNarrative = async (prompt, context = null, onToken) => {
+  return streamSSE('/narrative/stream', { prompt, context }, onToken);
+};
+
 // Enhance Prompt
 export const enhancePrompt = async (prompt) => {
   return api.post('/prompt/enhance', { prompt });
 };
 
-// Get History
-export const getHistory = async (limit = 20) => {
-  return api.get(`/history?limit=${limit}`);
+// Get History (pass a response's next_cursor as before to page back)
+export const getHistory = async (limit = 20, before = null) => {
+  return api.get('/history', { params: { limit, ...(before && { before }) } });
 };
 
 // Search Similar
@@ -92,4 +148,49 @@ export const deleteHistoryItem = async (recordId) => {
   return api.delete(`/history/${recordId}`);
 };
 
+// Queue an image generation; resolves with the job (id and status) immediately
+export const submitImageJob = async (prompt, options = {}, priority = 0) => {
+  const {
+    size = '1024x1024',
+    quality = 'standard',
+    style = 'vivid',
+    enhance_prompt = true,
+  } = options;
+  return api.post(`/jobs/image?priority=${priority}`, {
+    prompt,
+    size,
+    quality,
+    style,
+    enhance_prompt,
+  });
+};
+
+// Get Job status (and result once finished)
+export const getJob = async (jobId) => {
+  return api.get(`/jobs/${jobId}`);
+};
+
+// Follow a job's status changes; calls onUpdate with each job state and
+// resolves with the final one.
+export const watchJob = (jobId, onUpdate) => {
+  return new Promise((resolve, reject) => {
+    const source = new EventSource(`${API_BASE_URL}/jobs/${jobId}/events`);
+    const handle = (event) => {
+      const job = JSON.parse(event.data);
+      onUpdate?.(job);
+      if (job.status === 'succeeded' || job.status === 'failed') {
+        source.close();
+        resolve(job);
+      }
+    };
+    ['queued', 'running', 'succeeded', 'failed'].forEach((name) =>
+      source.addEventListener(name, handle)
+    );
+    source.onerror = () => {
+      source.close();
+      reject(new Error('Job event stream failed'));
+    };
+  });
+};
+
 export default api;